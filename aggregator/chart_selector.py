@@ -1,6 +1,16 @@
+import re
 from typing import List, Dict, Any, Tuple, Optional
 from decimal import Decimal
-from core.schemas import ChartData, KPI
+from config import settings
+from core.schemas import ChartData, ChartSeries, KPI
+from aggregator.column_profiler import ResultProfile, profile_columns
+from aggregator.time_series import shape_time_series
+
+OTHER_LABEL = "Other"
+
+# Column-name words of non-additive metrics. Summing an average or a
+# rate across groups is meaningless, so these never get an "Other" bucket.
+NON_ADDITIVE_HINTS = ("avg", "average", "mean", "rate", "pct", "percent", "ratio", "min", "max")
 
 
 # ---------------------------------------------------------------------------
@@ -44,13 +54,106 @@ def _make_title(label_col: str, state: Optional[dict]) -> str:
     return base
 
 
+def _name_tokens(col: str) -> List[str]:
+    """Lower-cased camelCase / snake_case words: 'AvgDaysToClose' → avg, days, to, close."""
+    return [t.lower() for t in re.findall(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+", col)]
+
+
+def _is_additive(col: str) -> bool:
+    """Heuristic: can this value column be summed across groups?"""
+    # Whole words only: 'CorporateTickets' is not a rate, 'TerminalCount' not a min.
+    return not any(token in NON_ADDITIVE_HINTS for token in _name_tokens(col))
+
+
+def _as_number(val: Any) -> Any:
+    return float(val) if isinstance(val, Decimal) else val
+
+
+def _bucket_top_n(
+    labels: List[str],
+    values: List[Any],
+    top_n: int,
+    true_total: Any = None
+) -> Tuple[List[str], List[Any]]:
+    """
+    Keeps the `top_n` largest labels (in their original order) and folds the
+    rest into a single "Other" value.
+
+    `true_total` is the grand total across ALL groups from the companion
+    totals query, when the rows were capped. It makes "Other" cover the
+    groups the cap cut off, too. Without it, "Other" is the sum of the
+    remaining rows.
+    """
+    if top_n <= 0 or len(labels) <= top_n:
+        return labels, values
+
+    ranked = sorted(range(len(values)), key=lambda i: values[i] or 0, reverse=True)
+    keep = set(ranked[:top_n])
+    top_labels = [label for i, label in enumerate(labels) if i in keep]
+    top_values = [value for i, value in enumerate(values) if i in keep]
+
+    if true_total is not None:
+        other = _as_number(true_total) - sum(top_values)
+    else:
+        other = sum(value for i, value in enumerate(values) if i not in keep and value)
+
+    if other > 0:
+        top_labels.append(OTHER_LABEL)
+        top_values.append(other)
+    return top_labels, top_values
+
+
+def _pivot_stacked(
+    profile: ResultProfile,
+    x_col: str,
+    series_col: str,
+    value_col: str
+) -> Tuple[List[str], List[ChartSeries], List[Any]]:
+    """
+    Pivots long-format (x, series, value) rows into a dense matrix.
+
+    Labels and series names keep their first-seen (SQL ORDER BY) order.
+    Missing (x, series) cells are 0; duplicate cells are summed.
+
+    Returns (labels, series, totals) where totals[i] is the stack height
+    for labels[i].
+    """
+    labels = profile[x_col].ordered_labels
+    series_names = profile[series_col].ordered_labels
+    x_index = {label: i for i, label in enumerate(labels)}
+    s_index = {name: i for i, name in enumerate(series_names)}
+
+    matrix = [[0] * len(labels) for _ in series_names]
+    for x, name, value in zip(profile[x_col].values, profile[series_col].values, profile[value_col].values):
+        if not _is_number(value):
+            continue
+        matrix[s_index[str(name)]][x_index[str(x)]] += float(value) if isinstance(value, Decimal) else value
+
+    totals = [sum(column) for column in zip(*matrix)] if matrix else [0] * len(labels)
+
+    # Long X axis: keep the top N stacks, fold the rest into "Other".
+    top_n = settings.CHART_TOP_N
+    if 0 < top_n < len(labels) and _is_additive(value_col):
+        ranked = sorted(range(len(totals)), key=lambda i: totals[i], reverse=True)
+        keep = sorted(ranked[:top_n])
+        rest = [i for i in range(len(labels)) if i not in set(keep)]
+        labels = [labels[i] for i in keep] + [OTHER_LABEL]
+        matrix = [[row[i] for i in keep] + [sum(row[i] for i in rest)] for row in matrix]
+        totals = [totals[i] for i in keep] + [sum(totals[i] for i in rest)]
+
+    series = [ChartSeries(name=name, values=row) for name, row in zip(series_names, matrix)]
+    return labels, series, totals
+
+
 # ---------------------------------------------------------------------------
 # MAIN SELECTOR
 # ---------------------------------------------------------------------------
 
 def determine_visuals(
     rows: List[Dict[str, Any]],
-    state: Optional[dict] = None
+    state: Optional[dict] = None,
+    profile: Optional[ResultProfile] = None,
+    true_totals: Optional[Dict[str, Any]] = None
 ) -> Tuple[List[KPI], List[ChartData]]:
     """
     Analyses the SQL result set shape and determines the appropriate
@@ -59,13 +162,18 @@ def determine_visuals(
     Scenarios handled:
       1 row,  1 col  → single KPI card
       N rows, 1 col  → multi-value KPI list (e.g. list of statuses)
-      N rows, 2 cols → line (date label) / pie (≤5 items) / bar (default)
-      N rows, 3 cols → stacked bar signal (pivot done on React side)
+      N rows, 2 cols → line (date label, gap-filled) / pie (≤5 items) / bar (default)
+      N rows, 3 cols → stacked bar, pivoted into series arrays
+      Categorical charts keep the top CHART_TOP_N labels + an "Other" bucket.
       N rows, N cols → raw table fallback (no chart, just data)
 
     Args:
-        rows:  List of dicts from the DB, already capped at MAX_ROWS_LIMIT.
-        state: Active search state — used for context-aware chart titles.
+        rows:    List of dicts from the DB, already capped at MAX_ROWS_LIMIT.
+        state:   Active search state — used for context-aware chart titles.
+        profile: Column profile of `rows` (built here if not supplied) —
+                 labels, values and types are read from it, not the dicts.
+        true_totals: Grand totals across all groups (see db/summary_totals.py)
+                 when the rows were capped; sizes the "Other" bucket exactly.
 
     Returns:
         (kpis, charts) — both may be empty if the data shape doesn't fit
@@ -77,19 +185,21 @@ def determine_visuals(
     kpis: List[KPI] = []
     charts: List[ChartData] = []
 
-    sample = rows[0]
-    columns = list(sample.keys())
+    if profile is None:
+        profile = profile_columns(rows)
+
+    columns = profile.columns
     num_cols = len(columns)
 
     # ------------------------------------------------------------------
     # SCENARIO 1: Single number — global KPI card
     # e.g. SELECT COUNT(*) AS Count FROM corporate_tickets
     # ------------------------------------------------------------------
-    if len(rows) == 1 and num_cols == 1 and _is_number(sample[columns[0]]):
+    if len(rows) == 1 and num_cols == 1 and profile[columns[0]].first_is_number:
         col = columns[0]
         kpis.append(KPI(
             label=col.replace("_", " ").title(),
-            value=sample[col]
+            value=profile.first_value(col)
         ))
         return kpis, charts
 
@@ -100,11 +210,9 @@ def determine_visuals(
     # ------------------------------------------------------------------
     if num_cols == 1:
         col = columns[0]
-        for row in rows:
-            kpis.append(KPI(
-                label=col.replace("_", " ").title(),
-                value=row[col]
-            ))
+        label = col.replace("_", " ").title()
+        for value in profile[col].values:
+            kpis.append(KPI(label=label, value=value))
         return kpis, charts
 
     # ------------------------------------------------------------------
@@ -116,26 +224,32 @@ def determine_visuals(
         col1, col2 = columns[0], columns[1]
 
         # Identify label vs value column
-        if _is_number(sample[col2]):
+        if profile[col2].first_is_number:
             label_col, value_col = col1, col2
-        elif _is_number(sample[col1]):
+        elif profile[col1].first_is_number:
             label_col, value_col = col2, col1
         else:
             # Both columns are strings — can't draw a meaningful chart,
             # fall through to raw table
             return kpis, charts
 
-        labels = [str(row[label_col]) for row in rows]
-        values = [row[value_col] for row in rows]
+        labels = [str(v) for v in profile[label_col].values]
+        values = profile[value_col].chart_values()
         title = _make_title(label_col, state)
 
         # Chart type decision
-        if _looks_like_date(sample[label_col]):
+        if _looks_like_date(profile.first_value(label_col)):
             chart_type = "line"
-        elif len(rows) <= 5:
-            chart_type = "pie"
+            # Chronological order, zero-filled gaps, bounded point count.
+            shaped = shape_time_series(labels, values, additive=_is_additive(value_col))
+            if shaped is not None:
+                labels, values = shaped
         else:
-            chart_type = "bar"
+            # Time series keep every point; categories fold their long tail.
+            if _is_additive(value_col):
+                true_total = true_totals.get(value_col) if true_totals else None
+                labels, values = _bucket_top_n(labels, values, settings.CHART_TOP_N, true_total)
+            chart_type = "pie" if len(labels) <= 5 else "bar"
 
         charts.append(ChartData(
             type=chart_type,
@@ -150,13 +264,13 @@ def determine_visuals(
         return kpis, charts
 
     # ------------------------------------------------------------------
-    # SCENARIO 4: Three columns — stacked bar signal
+    # SCENARIO 4: Three columns — stacked bar
     # e.g. SELECT CompanyName, Status, COUNT(*) AS Count
     #      GROUP BY CompanyName, Status
     #
-    # The backend does NOT perform the pivot — React handles that because
-    # it already has the logic and the full dataset. We just need to signal
-    # the correct chart type and tell React which columns play which role.
+    # The backend performs the pivot: labels are the X-axis values, `series`
+    # holds one value list per stack key aligned with the labels, and
+    # `values` holds each bar's total. React draws it without raw_data.
     #
     # Convention: col1 = X axis (grouping), col2 = series/stack key,
     # col3 = numeric value.
@@ -165,17 +279,18 @@ def determine_visuals(
         col1, col2, col3 = columns[0], columns[1], columns[2]
 
         # Validate the third column is numeric — if not, fall through to table
-        if not _is_number(sample[col3]):
+        if not profile[col3].first_is_number:
             return kpis, charts
 
-        labels = list({str(row[col1]) for row in rows})  # unique X-axis values
+        labels, series, totals = _pivot_stacked(profile, col1, col2, col3)
         title = _make_title(f"{col1} by {col2}", state)
 
         charts.append(ChartData(
             type="stacked_bar",
             title=title,
             labels=labels,
-            values=[],          # React builds this from raw_data via the pivot
+            values=totals,      # Stack height per label
+            series=series,      # One aligned value list per stack key
             x_key=col1,         # X axis grouping column
             series_key=col2,    # Stack/series column
             y_key=col3          # Numeric value column
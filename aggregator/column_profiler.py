@@ -0,0 +1,106 @@
+"""
+aggregator/column_profiler.py
+
+One profiling pass per result set, shared by chart selection and KPI cards.
+"""
+
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import List, Dict, Any, Optional, Tuple
+
+def _is_number(val: Any) -> bool:
+    return isinstance(val, (int, float, Decimal))
+
+
+class ColumnProfile:
+    """
+    Everything the aggregator needs to know about one result column.
+
+    Values, sums and labels are computed on first access and then cached, so
+    a column the chart/KPI code never looks at is never transposed.
+    """
+
+    def __init__(self, name: str, rows: List[Dict[str, Any]]):
+        self.name = name
+        self._rows = rows
+        self._values: Optional[List[Any]] = None
+        self._sum: Optional[Tuple[Any, int]] = None
+        self._labels: Optional[List[str]] = None
+
+    @property
+    def values(self) -> List[Any]:
+        if self._values is None:
+            name = self.name
+            self._values = [row.get(name) for row in self._rows]
+        return self._values
+
+    @property
+    def first_is_number(self) -> bool:
+        # The chart/KPI heuristics have always keyed off rows[0]'s type,
+        # so this keeps their behaviour identical.
+        return _is_number(self._rows[0].get(self.name))
+
+    @property
+    def numeric_sum(self) -> Any:
+        return self._numeric_totals()[0]
+
+    @property
+    def numeric_count(self) -> int:
+        return self._numeric_totals()[1]
+
+    @property
+    def ordered_labels(self) -> List[str]:
+        """Distinct values as strings, in first-seen (i.e. SQL ORDER BY) order."""
+        if self._labels is None:
+            self._labels = list(dict.fromkeys(str(v) for v in self.values))
+        return self._labels
+
+    @property
+    def distinct_count(self) -> int:
+        return len(self.ordered_labels)
+
+    def chart_values(self) -> List[Any]:
+        """
+        Values ready for ChartData: Decimals (AVG / ROUND results from MySQL)
+        become floats up front, in one pass.
+        """
+        values = self.values
+        if not values or not isinstance(values[0], Decimal):
+            return values
+        return [float(v) if isinstance(v, Decimal) else v for v in values]
+
+    def _numeric_totals(self) -> Tuple[Any, int]:
+        if self._sum is None:
+            numbers = [v for v in self.values if _is_number(v)]
+            self._sum = (sum(numbers), len(numbers))
+        return self._sum
+
+
+@dataclass
+class ResultProfile:
+    row_count: int
+    columns: List[str]
+    by_name: Dict[str, ColumnProfile]
+
+    def __getitem__(self, name: str) -> ColumnProfile:
+        return self.by_name[name]
+
+    def first_value(self, name: str) -> Any:
+        return self.by_name[name]._rows[0].get(name)
+
+
+def profile_columns(rows: List[Dict[str, Any]]) -> Optional[ResultProfile]:
+    """
+    Single profile of a result set, shared by chart_selector and summarizer
+    so neither has to re-iterate the row dicts.
+
+    Each column is transposed into a value list at most once, the first time
+    anyone asks for it; numeric sums and ordered distinct labels are derived
+    from that same list. Returns None for an empty result.
+    """
+    if not rows:
+        return None
+
+    columns = list(rows[0].keys())
+    by_name = {col: ColumnProfile(col, rows) for col in columns}
+    return ResultProfile(row_count=len(rows), columns=columns, by_name=by_name)
@@ -1,6 +1,7 @@
 from typing import List, Dict, Any, Optional
 from core.schemas import QueryResponse
 from aggregator.chart_selector import determine_visuals
+from aggregator.column_profiler import profile_columns
 from aggregator.summarizer import build_summary_kpis
 from aggregator.response_formatter import build_response
 
@@ -12,13 +13,22 @@ def format_response(
     state: Optional[dict] = None,
     suggested_actions: Optional[List[str]] = None,
     limit_reached: bool = False,
-    sql_error: str = ""
+    sql_error: str = "",
+    cache_age_seconds: Optional[float] = None,
+    total_count: Optional[int] = None,
+    result_id: Optional[str] = None,
+    next_cursor: Optional[str] = None,
+    raw_data_format: str = "records",
+    include_raw_data: bool = True,
+    true_totals: Optional[Dict[str, Any]] = None,
+    derived_from: Optional[str] = None
 ) -> QueryResponse:
     """
     Main entry point for the aggregator layer. Called by app.py after
     DB execution succeeds and the LLM summary has been generated.
 
     Orchestration order:
+      0. column_profiler → one pass over the rows: types, sums, labels
       1. chart_selector  → determine chart type(s) from data shape
       2. summarizer      → build KPI cards (row count, totals, limit warning)
       3. response_formatter → assemble final QueryResponse
@@ -31,13 +41,24 @@ def format_response(
         suggested_actions: Smart Pills from app.py
         limit_reached:     True if row count hit the hard cap
         sql_error:         Non-empty string if DB execution failed
+        cache_age_seconds: Age of the result if served from the result cache (0 = fresh)
+        total_count:       Exact match count for detail intent (rows is the preview)
+        result_id:         Detail intent: handle for the paging endpoint
+        next_cursor:       Detail intent: cursor for the page after the preview
+        raw_data_format:   'records', 'rows' or 'columns' — layout negotiated by the client
+        include_raw_data:  False drops raw_data from charted summary responses
+        true_totals:       Summary intent, capped rows: grand totals across all groups
+        derived_from:      Detail intent: result_id the rows were filtered from in memory
     """
     if suggested_actions is None:
         suggested_actions = []
 
+    # 0. Profile the result once — chart selection and KPIs both read from it
+    profile = profile_columns(rows) if intent == "summary" else None
+
     # 1. Determine charts (only meaningful for summary intent)
     kpis_from_chart, charts = (
-        determine_visuals(rows, state=state)
+        determine_visuals(rows, state=state, profile=profile, true_totals=true_totals)
         if intent == "summary" and rows
         else ([], [])
     )
@@ -47,7 +68,10 @@ def format_response(
         rows,
         intent=intent,
         state=state,
-        limit_reached=limit_reached
+        limit_reached=limit_reached,
+        total_count=total_count,
+        profile=profile,
+        true_totals=true_totals
     )
 
     # Merge: summarizer KPIs come first (row count context),
@@ -63,5 +87,11 @@ def format_response(
         charts=charts,
         state=state,
         suggested_actions=suggested_actions,
-        sql_error=sql_error
+        sql_error=sql_error,
+        cache_age_seconds=cache_age_seconds,
+        result_id=result_id,
+        next_cursor=next_cursor,
+        raw_data_format=raw_data_format,
+        include_raw_data=include_raw_data,
+        derived_from=derived_from
     )
\ No newline at end of file
@@ -1,5 +1,29 @@
-from typing import List, Dict, Any, Optional
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, Tuple
 from core.schemas import QueryResponse
+from core.serialization import pre_encode
+
+
+def to_raw_data_layout(
+    rows: List[Dict[str, Any]],
+    raw_data_format: str = "records"
+) -> Tuple[list, Optional[List[str]]]:
+    """
+    Re-shapes row dicts into the negotiated raw_data layout.
+
+    Returns (raw_data, columns). For 'records' the rows are returned untouched
+    and columns is None; for 'rows' / 'columns' the column names are sent once
+    instead of being repeated on every row.
+    """
+    if raw_data_format == "records" or not rows:
+        return rows, (None if raw_data_format == "records" else [])
+
+    columns = list(rows[0].keys())
+    if raw_data_format == "rows":
+        return [[row.get(col) for col in columns] for row in rows], columns
+
+    # columns: one value list per column, in `columns` order
+    return [[row.get(col) for row in rows] for col in columns], columns
 
 
 def build_response(
@@ -11,7 +35,13 @@ def build_response(
     state: Optional[dict],
     suggested_actions: List[str],
     sql_error: str = "",
-    status: str = "success"
+    status: str = "success",
+    cache_age_seconds: Optional[float] = None,
+    result_id: Optional[str] = None,
+    next_cursor: Optional[str] = None,
+    raw_data_format: str = "records",
+    include_raw_data: bool = True,
+    derived_from: Optional[str] = None
 ) -> QueryResponse:
     """
     Single assembly point for all QueryResponse objects in the happy path.
@@ -22,6 +52,17 @@ def build_response(
     Error and edge-case responses (zero data, vague search, security block)
     are still built inline in app.py since they short-circuit before reaching
     the aggregator. This formatter only handles the successful data path.
+
+    The data-path responses use model_construct(): every piece was produced
+    by our own code (KPI / ChartData are already validated models), so
+    re-validating hundreds of raw_data rows would be pure overhead. Their
+    chart/KPI blocks are JSON-encoded here, off the event loop, and spliced
+    into the response body by core/serialization.py.
+
+    With include_raw_data=False a charted summary response omits raw_data:
+    the charts carry everything needed to draw them, and the full rows stay
+    reachable through result_id. Uncharted results (plain tables) and detail
+    results always keep their rows.
     """
     if sql_error:
         return QueryResponse(
@@ -40,23 +81,44 @@ def build_response(
             state=state
         )
 
+    # "As of" timestamp for the rows — now for a fresh read, earlier for a cache hit.
+    data_as_of = None
+    if cache_age_seconds is not None:
+        data_as_of = (datetime.utcnow() - timedelta(seconds=cache_age_seconds)).isoformat()
+
+    raw_data, columns = to_raw_data_layout(rows, raw_data_format)
+
     if intent == "summary":
-        return QueryResponse(
+        if not include_raw_data and charts:
+            raw_data, columns = [], None
+        return pre_encode(QueryResponse.model_construct(
             status=status,
             summary=summary_text,
             kpis=kpis,
             charts=charts,
-            raw_data=rows,
+            raw_data=raw_data,
+            raw_data_format=raw_data_format,
+            columns=columns,
             suggested_actions=suggested_actions,
-            state=state
-        )
+            state=state,
+            data_as_of=data_as_of,
+            cache_age_seconds=cache_age_seconds,
+            result_id=result_id
+        ))
 
     # detail
-    return QueryResponse(
+    return pre_encode(QueryResponse.model_construct(
         status=status,
         summary=summary_text,
         kpis=kpis,
-        raw_data=rows,
+        raw_data=raw_data,
+        raw_data_format=raw_data_format,
+        columns=columns,
         suggested_actions=suggested_actions,
-        state=state
-    )
\ No newline at end of file
+        state=state,
+        data_as_of=data_as_of,
+        cache_age_seconds=cache_age_seconds,
+        result_id=result_id,
+        next_cursor=next_cursor,
+        derived_from=derived_from
+    ))
\ No newline at end of file
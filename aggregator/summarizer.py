@@ -1,6 +1,8 @@
 from typing import List, Dict, Any, Optional
 from decimal import Decimal
 from core.schemas import KPI
+from aggregator.column_profiler import ResultProfile, profile_columns
+from rules.sql_validator import TOTALS_GROUP_COUNT_COLUMN
 
 
 def _is_number(val: Any) -> bool:
@@ -11,13 +13,17 @@ def build_summary_kpis(
     rows: List[Dict[str, Any]],
     intent: str,
     state: Optional[dict] = None,
-    limit_reached: bool = False
+    limit_reached: bool = False,
+    total_count: Optional[int] = None,
+    profile: Optional[ResultProfile] = None,
+    true_totals: Optional[Dict[str, Any]] = None
 ) -> List[KPI]:
     """
     Produces a small list of summary KPI cards to sit above the main chart
     or table — giving the user instant at-a-glance metrics.
 
-    For summary intent: total grouped rows, sum of numeric column if present.
+    For summary intent: ticket total (or group count when the result has no
+                        count column), sum of numeric column if present.
     For detail intent:  record count, limit-reached flag if capped.
 
     Args:
@@ -25,6 +31,11 @@ def build_summary_kpis(
         intent:        'summary' or 'detail'.
         state:         Active search state (used for contextual labelling).
         limit_reached: True if row count hit the hard cap — surfaces a warning KPI.
+        total_count:   Exact match count for detail intent (rows is only a preview).
+        profile:       Column profile of `rows` shared with chart_selector; sums are
+                       read from it instead of re-iterating the rows.
+        true_totals:   Summary intent, capped rows: grand totals across all groups
+                       from the companion totals query — used instead of row sums.
 
     Returns:
         List of KPI objects. May be empty if nothing meaningful to surface.
@@ -37,32 +48,36 @@ def build_summary_kpis(
     ticket_label = "PPM Tickets" if "ppm" in domain.lower() else "Tickets"
 
     if intent == "summary":
-        # Total number of grouped rows (e.g. number of distinct statuses/companies)
-        kpis.append(KPI(
-            label=f"Total {ticket_label}",
-            value=_total_count(rows)
-        ))
+        if profile is None:
+            profile = profile_columns(rows)
+
+        # Ticket total — only when the result actually carries a count.
+        # Otherwise (e.g. AvgDaysToClose by status) show the number of
+        # groups under its own label rather than passing it off as tickets.
+        ticket_total = _total_count(profile, true_totals)
+        if ticket_total is not None:
+            kpis.append(KPI(label=f"Total {ticket_label}", value=ticket_total))
+        else:
+            kpis.append(KPI(label="Groups", value=_group_count(profile, true_totals)))
 
         # If there's a numeric column that isn't already the count,
         # surface its sum as a second KPI (e.g. sum of AvgDaysToClose)
-        sample = rows[0]
-        columns = list(sample.keys())
+        columns = profile.columns
         if len(columns) == 2:
             col1, col2 = columns
-            value_col = col2 if _is_number(sample[col2]) else (col1 if _is_number(sample[col1]) else None)
+            value_col = col2 if profile[col2].first_is_number else (col1 if profile[col1].first_is_number else None)
             if value_col and value_col.lower() not in ("count", "total"):
-                total_val = sum(
-                    row[value_col] for row in rows
-                    if _is_number(row.get(value_col))
-                )
+                total_val = profile[value_col].numeric_sum
+                if true_totals and true_totals.get(value_col) is not None:
+                    total_val = true_totals[value_col]
                 kpis.append(KPI(
                     label=f"Total {value_col.replace('_', ' ').title()}",
                     value=round(total_val, 1)
                 ))
 
     else:
-        # Detail mode — just the record count
-        count = len(rows)
+        # Detail mode — the exact match count, not just the preview size
+        count = total_count if total_count is not None else len(rows)
         kpis.append(KPI(
             label=f"{ticket_label} Retrieved",
             value=count
@@ -79,16 +94,31 @@ def build_summary_kpis(
     return kpis
 
 
-def _total_count(rows: List[Dict[str, Any]]) -> int:
+def _total_count(profile: ResultProfile, true_totals: Optional[Dict[str, Any]] = None) -> Optional[int]:
     """
-    Attempts to sum any column named 'Count' or 'Total' in the rows.
-    Falls back to len(rows) if no such column exists.
+    Sum of any column named 'Count' or 'Total', taken from the profile, or
+    None when the result has no such column — the row count is a number of
+    groups, not of tickets.
+
+    When the rows were capped, true_totals (grand totals across every group)
+    replaces the profile sum, so the KPI isn't silently limited to the first
+    500 groups.
     """
-    sample = rows[0]
-    for col in sample.keys():
+    true_totals = true_totals or {}
+    for col in profile.columns:
         if col.lower() in ("count", "total"):
             try:
-                return int(sum(row[col] for row in rows if _is_number(row.get(col))))
+                if true_totals.get(col) is not None:
+                    return int(true_totals[col])
+                return int(profile[col].numeric_sum)
             except (TypeError, ValueError):
                 pass
-    return len(rows)
\ No newline at end of file
+    return None
+
+
+def _group_count(profile: ResultProfile, true_totals: Optional[Dict[str, Any]] = None) -> int:
+    """Number of groups, across every group when the rows were capped."""
+    true_totals = true_totals or {}
+    if true_totals.get(TOTALS_GROUP_COUNT_COLUMN) is not None:
+        return int(true_totals[TOTALS_GROUP_COUNT_COLUMN])
+    return profile.row_count
@@ -0,0 +1,233 @@
+"""
+aggregator/time_series.py
+
+Shapes TIME_TREND results for line charts.
+
+Trend queries group by a period label such as LEFT(CreatedDate, 7) AS
+TimePeriod, so the raw rows have two problems for a line chart:
+
+  - Periods with zero tickets are missing, and the line silently bridges
+    the gap. Missing buckets are filled with 0.
+  - A multi-year daily trend sends hundreds of points. The series is
+    re-bucketed to a coarser grain (day → month → year) until it fits
+    TIME_SERIES_MAX_POINTS. If it still doesn't fit, it is downsampled with
+    Largest-Triangle-Three-Buckets, which keeps the visual peaks and troughs.
+
+Zero-filling and re-bucketing both assume the values can be summed (counts,
+totals). For averages and rates only the chronological sort and the LTTB
+downsampling apply.
+"""
+
+import re
+from datetime import date
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import settings
+
+GRAIN_DAY = "day"
+GRAIN_MONTH = "month"
+GRAIN_YEAR = "year"
+
+_COARSER = {GRAIN_DAY: GRAIN_MONTH, GRAIN_MONTH: GRAIN_YEAR}
+
+_DAY_RE = re.compile(r"^(\d{4})-(\d{1,2})-(\d{1,2})")       # 2025-01-15, 2025-01-15 10:30:00
+_MONTH_RE = re.compile(r"^(\d{4})-(\d{1,2})$")               # 2025-01
+_MONTH_SLASH_RE = re.compile(r"^(\d{1,2})/(\d{4})$")         # 01/2025
+_YEAR_RE = re.compile(r"^(\d{4})$")                          # 2025
+
+
+# ---------------------------------------------------------------------------
+# PERIOD PARSING
+# ---------------------------------------------------------------------------
+
+def parse_period(label: Any) -> Optional[Tuple[str, date]]:
+    """
+    Parses a period label into (grain, first day of the period).
+    Returns None for anything that isn't a recognised period format.
+    """
+    text = str(label).strip()
+    try:
+        m = _DAY_RE.match(text)
+        if m:
+            return GRAIN_DAY, date(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+        m = _MONTH_RE.match(text)
+        if m:
+            return GRAIN_MONTH, date(int(m.group(1)), int(m.group(2)), 1)
+        m = _MONTH_SLASH_RE.match(text)
+        if m:
+            return GRAIN_MONTH, date(int(m.group(2)), int(m.group(1)), 1)
+        m = _YEAR_RE.match(text)
+        if m:
+            return GRAIN_YEAR, date(int(m.group(1)), 1, 1)
+    except ValueError:
+        # e.g. month 13 — not a real date
+        return None
+    return None
+
+
+def format_period(d: date, grain: str) -> str:
+    if grain == GRAIN_DAY:
+        return d.isoformat()
+    if grain == GRAIN_MONTH:
+        return f"{d.year:04d}-{d.month:02d}"
+    return f"{d.year:04d}"
+
+
+def _truncate(d: date, grain: str) -> date:
+    if grain == GRAIN_MONTH:
+        return date(d.year, d.month, 1)
+    if grain == GRAIN_YEAR:
+        return date(d.year, 1, 1)
+    return d
+
+
+def _span(start: date, end: date, grain: str) -> int:
+    """Number of buckets from start to end inclusive at `grain`."""
+    if grain == GRAIN_DAY:
+        return (end - start).days + 1
+    if grain == GRAIN_MONTH:
+        return (end.year - start.year) * 12 + (end.month - start.month) + 1
+    return end.year - start.year + 1
+
+
+def _next_period(d: date, grain: str) -> date:
+    if grain == GRAIN_DAY:
+        return date.fromordinal(d.toordinal() + 1)
+    if grain == GRAIN_MONTH:
+        return date(d.year + (d.month == 12), d.month % 12 + 1, 1)
+    return date(d.year + 1, 1, 1)
+
+
+# ---------------------------------------------------------------------------
+# RE-BUCKETING & GAP FILLING
+# ---------------------------------------------------------------------------
+
+def _rebucket(points: Dict[date, Any], grain: str) -> Dict[date, Any]:
+    merged: Dict[date, Any] = {}
+    for d, value in points.items():
+        key = _truncate(d, grain)
+        merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+def _fill_gaps(points: Dict[date, Any], grain: str) -> List[Tuple[date, Any]]:
+    start, end = min(points), max(points)
+    filled = []
+    current = start
+    while current <= end:
+        filled.append((current, points.get(current, 0)))
+        current = _next_period(current, grain)
+    return filled
+
+
+# ---------------------------------------------------------------------------
+# DOWNSAMPLING
+# ---------------------------------------------------------------------------
+
+def lttb(points: List[Tuple[float, float]], threshold: int) -> List[int]:
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+
+    Returns the indices of the `threshold` points to keep. The first and
+    last points are always kept. Each bucket in between contributes the
+    point that forms the largest triangle with the previously kept point
+    and the average of the next bucket.
+    """
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    kept = [0]
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0
+
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+
+        # Average of the next bucket (or the last point for the final bucket)
+        next_start = end
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        if next_start >= next_end:
+            next_start, next_end = n - 1, n
+        span = next_end - next_start
+        avg_x = sum(points[j][0] for j in range(next_start, next_end)) / span
+        avg_y = sum(points[j][1] for j in range(next_start, next_end)) / span
+
+        ax, ay = points[a]
+        best, best_area = start, -1.0
+        for j in range(start, min(end, n - 1)):
+            bx, by = points[j]
+            area = abs((ax - avg_x) * (by - ay) - (ax - bx) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        kept.append(best)
+        a = best
+
+    kept.append(n - 1)
+    return kept
+
+
+# ---------------------------------------------------------------------------
+# PUBLIC ENTRY POINT
+# ---------------------------------------------------------------------------
+
+def shape_time_series(
+    labels: List[Any],
+    values: List[Any],
+    additive: bool = True,
+    max_points: Optional[int] = None
+) -> Optional[Tuple[List[str], List[Any]]]:
+    """
+    Sorts, gap-fills, re-buckets and downsamples a period-labelled series.
+
+    Args:
+        labels:     Period labels from the grouping column.
+        values:     Numeric values aligned with labels.
+        additive:   True for counts/totals. Enables zero-filling and
+                    re-bucketing, which sum values.
+        max_points: Point budget (defaults to TIME_SERIES_MAX_POINTS).
+
+    Returns:
+        (labels, values) ready for a line chart, or None if the labels aren't
+        all parseable periods of one grain. The caller then keeps the series
+        as-is.
+    """
+    if max_points is None:
+        max_points = settings.TIME_SERIES_MAX_POINTS
+    if not labels:
+        return None
+
+    grain = None
+    points: Dict[date, Any] = {}
+    for label, value in zip(labels, values):
+        parsed = parse_period(label)
+        if parsed is None:
+            return None
+        label_grain, d = parsed
+        if grain is None:
+            grain = label_grain
+        elif label_grain != grain:
+            return None
+        value = float(value) if isinstance(value, Decimal) else (value or 0)
+        # Duplicate periods (e.g. datetime labels within one day) are summed
+        # for counts. For averages the last one wins.
+        points[d] = points.get(d, 0) + value if additive else value
+
+    if additive:
+        # Coarsen until the full, gap-filled span fits the budget.
+        start, end = min(points), max(points)
+        while grain in _COARSER and _span(start, end, grain) > max_points:
+            grain = _COARSER[grain]
+            points = _rebucket(points, grain)
+            start, end = _truncate(start, grain), _truncate(end, grain)
+        series = _fill_gaps(points, grain)
+    else:
+        series = sorted(points.items())
+
+    if max_points >= 3 and len(series) > max_points:
+        keep = lttb([(d.toordinal(), float(v)) for d, v in series], max_points)
+        series = [series[i] for i in keep]
+
+    return [format_period(d, grain) for d, _ in series], [v for _, v in series]
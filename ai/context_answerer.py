@@ -0,0 +1,428 @@
+"""
+ai/context_answerer.py
+
+Answers questions about the result already on screen, locally and exactly.
+
+"Is this from 2025?", "How many did you just fetch?" and "Which company is
+filtered?" are questions about the previous response, not new queries. The
+router used to answer them with an LLM that only saw a summary of the
+filters, never the result, so counts were guessed.
+
+After every data response a compact ResultDigest is stored on the session:
+row count, exact total, active filters, chart labels and their values. Two
+entry points use it:
+
+  - answer_context_question(..., strict=True) runs BEFORE the router. It
+    only fires on whole-question phrasings that point at the current view
+    ("how many did you just fetch?", "is this from ...", "which filters are
+    applied?"), and never when the question adds a filter or time window or
+    names a dimension the result isn't filtered on ("how many records are
+    there for Reliance this month?" is a new query). A hit costs no LLM call
+    at all. Top-N questions never match here.
+  - answer_context_question(..., strict=False) runs when the router has
+    classified the turn as CONTEXT_QUESTION. It accepts looser phrasings.
+    Top-N is only read off the chart when the question asks about the
+    chart's own dimension and adds no filter or time window. The router's
+    own response_text is only used when the digest can't answer.
+
+Counts are only stated when the result carries one (a Count/Total column,
+true totals, or detail rows). A count question about a breakdown without
+one goes to SQL (count_not_in_result).
+
+A digest is only trusted while the session state still matches the state
+that produced it. After a zero-data turn or a clarification the state has
+moved on and the digest is ignored.
+"""
+
+import re
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from ai.panel_templates import as_list, timeframe_like_patterns
+from ai.prefetcher import state_fingerprint
+from aggregator.chart_selector import OTHER_LABEL
+from config import settings
+
+# State keys shown to the user as filters, in display order.
+_FILTER_LABELS = (
+    ("company_name", "Company"),
+    ("branch_name", "Branch"),
+    ("timeframe", "Timeframe"),
+    ("status", "Status"),
+    ("priority", "Priority"),
+    ("service_type", "Service"),
+)
+
+_MONTH_NAMES = (
+    "January", "February", "March", "April", "May", "June", "July",
+    "August", "September", "October", "November", "December",
+)
+
+
+@dataclass
+class ChartDigest:
+    title: str
+    type: str
+    x_key: Optional[str]
+    labels: List[str]
+    values: List[float]
+    # True when labels were cut to CONTEXT_DIGEST_MAX_LABELS or the chart
+    # already folded its tail into "Other": "lowest" can't be answered.
+    truncated: bool = False
+
+
+@dataclass
+class ResultDigest:
+    state_fingerprint: str
+    intent: str
+    domain: str
+    filters: Dict[str, Any]
+    row_count: Optional[int] = None          # rows in this response's raw_data
+    total_count: Optional[int] = None        # exact match count / ticket total
+    charts: List[ChartDigest] = field(default_factory=list)
+    data_as_of: Optional[str] = None
+    suggested_actions: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> Optional["ResultDigest"]:
+        if not data:
+            return None
+        try:
+            charts = [ChartDigest(**c) for c in data.get("charts") or []]
+            return cls(**{**data, "charts": charts})
+        except TypeError:
+            return None
+
+
+# ---------------------------------------------------------------------------
+# DIGEST
+# ---------------------------------------------------------------------------
+
+def _raw_row_count(response) -> Optional[int]:
+    raw = response.raw_data or []
+    if response.raw_data_format == "columns":
+        return len(raw[0]) if raw else None
+    return len(raw) if raw else None
+
+
+def _kpi_total(response) -> Optional[int]:
+    # build_summary_kpis() puts the ticket total / exact match count first.
+    # It only emits "Total ... Tickets" when the result has a Count/Total
+    # column (or true totals); a breakdown without one has a "Groups" KPI
+    # instead, and no ticket total is recorded.
+    for kpi in response.kpis or []:
+        label = getattr(kpi, "label", "")
+        if label.endswith("Retrieved") or (label.startswith("Total") and "Tickets" in label):
+            if isinstance(kpi.value, (int, float)):
+                return int(kpi.value)
+    return None
+
+
+def build_digest(response, state: Optional[Dict[str, Any]]) -> Optional[ResultDigest]:
+    """
+    Digest of a data response, or None for anything else (clarifications,
+    router replies, zero-data and error responses carry no data_as_of).
+    """
+    if response.status != "success" or response.data_as_of is None:
+        return None
+
+    state = state or {}
+    max_labels = settings.CONTEXT_DIGEST_MAX_LABELS
+    charts = []
+    for chart in response.charts or []:
+        labels = [str(label) for label in chart.labels]
+        charts.append(ChartDigest(
+            title=chart.title,
+            type=chart.type,
+            x_key=chart.x_key,
+            labels=labels[:max_labels],
+            values=[float(v) for v in chart.values[:max_labels]],
+            truncated=len(labels) > max_labels or OTHER_LABEL in labels,
+        ))
+
+    return ResultDigest(
+        state_fingerprint=state_fingerprint(state),
+        intent=state.get("intent") or "detail",
+        domain=state.get("domain") or "corporate_tickets",
+        filters={key: state.get(key) for key, _ in _FILTER_LABELS if state.get(key)},
+        row_count=_raw_row_count(response),
+        total_count=_kpi_total(response),
+        charts=charts,
+        data_as_of=response.data_as_of,
+        suggested_actions=list(response.suggested_actions or []),
+    )
+
+
+# ---------------------------------------------------------------------------
+# QUESTION PATTERNS
+# ---------------------------------------------------------------------------
+
+# Strict patterns match the WHOLE question: anything trailing ("... for
+# Reliance this month") makes it a possible new query.
+_VIEW = r"(this|these|that|those|the) (list|table|result|results|chart|view|data)"
+_COUNT_STRICT = re.compile(
+    r"^how many( tickets| rows| results| records| entries)? (did|have) you (just )?"
+    r"(fetch|find|found|return|show|get|pull|retrieve)(e?d)?( here| just now)?\s*\??$"
+    r"|^how many( tickets| rows| results| records| entries)? (are|is) (there )?"
+    r"(shown|listed|here|on (the )?screen|in " + _VIEW + r"|(in )?(this|these|that|those))\s*\??$"
+)
+_COUNT_LOOSE = re.compile(r"\bhow many\b|\b(count|total|number of (rows|results|tickets|records))\b")
+
+_FILTERS_STRICT = re.compile(
+    r"^(what|which) (filters?|criteria) (are|is) (currently )?(applied|active|on|set|used|selected)"
+    r"( (here|now|to " + _VIEW + r"|on " + _VIEW + r"))?\s*\??$"
+    r"|^(what|which) (company|companies|branch|branches|location|city|status|priority|timeframe|"
+    r"period|date range|month|year|service) (is|are) (filtered|selected|applied)\s*\??$"
+    r"|^(what|which) (filters?|company|branch|location|status|priority|timeframe|period|date range|service) "
+    r"am i (looking at|seeing)\s*\??$"
+)
+_FILTERS_LOOSE = re.compile(
+    r"\b(what|which)\b.*\b(filters?|company|companies|branch|location|city|status|priority|"
+    r"timeframe|period|date|month|year|service)\b"
+)
+
+_IS_THIS = re.compile(
+    r"^(is|are) (this|these|that|those|the data|this data|the result|these results)\b"
+    r"(\s+(data|result|results|tickets|list|chart))?\s+(only\s+)?(from|for|in|of|about)\s+(?P<subject>.+?)\s*\??$"
+)
+
+_TOP_LOOSE = re.compile(r"\b(top|highest|most|largest|biggest|lowest|least|fewest|smallest|peak)\b")
+_LOW_WORDS = re.compile(r"\b(lowest|least|fewest|smallest)\b")
+
+# A top-N question naming one of these asks about that dimension; it can
+# only be read off the chart when the chart is grouped by the same one.
+_DIMENSION_WORDS = (
+    ("company", re.compile(r"\b(company|companies|client|clients|customer|customers)\b")),
+    ("branch", re.compile(r"\b(branch|branches|location|locations|city|cities|site|sites)\b")),
+    ("status", re.compile(r"\b(status|statuses|state)\b")),
+    ("priority", re.compile(r"\b(priority|priorities)\b")),
+    ("service", re.compile(r"\b(service|services|service type|category|categories)\b")),
+    ("time", re.compile(r"\b(month|months|period|periods|year|years|week|weeks|day|days|quarter|quarters)\b")),
+)
+_X_KEY_DIMENSIONS = (
+    ("company", ("company", "client", "customer")),
+    ("branch", ("branch", "location", "city", "site")),
+    ("status", ("status",)),
+    ("priority", ("priority",)),
+    ("service", ("service", "category", "type")),
+    ("time", ("period", "month", "year", "date", "week", "quarter")),
+)
+# The state filter a dimension word refers to
+_DIMENSION_FILTERS = {
+    "company": "company_name", "branch": "branch_name", "status": "status",
+    "priority": "priority", "service": "service_type", "time": "timeframe",
+}
+# Words that add a filter or a time window: a new data question, not a
+# question about the chart on screen.
+_NEW_SCOPE = re.compile(
+    r"\b(this|last|next|previous|past|current) (week|month|quarter|year)\b|\b(today|yesterday)\b"
+    r"|\b(19|20)\d{2}\b|\b(" + "|".join(m.lower() for m in _MONTH_NAMES) + r")\b"
+    r"|\b(in|for|at|from|with|where|only|excluding|except)\b "
+    r"(?!(the |this |these |that |those )?(chart|table|result|results|list|data|view|screen)\b)"
+)
+
+
+# ---------------------------------------------------------------------------
+# ANSWERS
+# ---------------------------------------------------------------------------
+
+def _ticket_word(digest: ResultDigest) -> str:
+    return "PPM tickets" if "ppm" in digest.domain.lower() else "tickets"
+
+
+def _format_value(value: Any) -> str:
+    return " + ".join(as_list(value)) if isinstance(value, list) else str(value)
+
+
+def _describe_filters(digest: ResultDigest) -> str:
+    parts = [
+        f"{label}: {_format_value(digest.filters[key])}"
+        for key, label in _FILTER_LABELS if digest.filters.get(key)
+    ]
+    return ", ".join(parts)
+
+
+def _format_number(value: float) -> str:
+    return f"{int(value):,}" if float(value).is_integer() else f"{value:,.1f}"
+
+
+def _period(timeframe: Any) -> Optional[Tuple[int, Optional[int]]]:
+    """(year, month or None) for a templatable timeframe, else None."""
+    patterns = timeframe_like_patterns(timeframe)
+    if not patterns:
+        return None
+    head = patterns[0].rstrip("-%").split("-")
+    return int(head[0]), (int(head[1]) if len(head) > 1 else None)
+
+
+def _period_name(period: Tuple[int, Optional[int]]) -> str:
+    year, month = period
+    return f"{_MONTH_NAMES[month - 1]} {year}" if month else str(year)
+
+
+def count_not_in_result(query_lower: str, digest: Optional[ResultDigest]) -> bool:
+    """
+    A count question about a breakdown that carries no ticket count (e.g.
+    AvgDaysToClose by status). The answer needs SQL, not the digest.
+    """
+    return (
+        digest is not None and digest.intent == "summary" and digest.total_count is None
+        and bool(_COUNT_LOOSE.search(query_lower.strip()))
+    )
+
+
+def _answer_count(digest: ResultDigest) -> Optional[str]:
+    filters = _describe_filters(digest)
+    scope = f" for {filters}" if filters else " with no filters applied"
+    noun = _ticket_word(digest)
+
+    if digest.intent == "summary":
+        # No Count/Total column and no true totals: the group count is not a
+        # ticket count, so don't state one (count_not_in_result sends it to SQL).
+        if digest.total_count is None:
+            return None
+        groups = digest.row_count if digest.row_count is not None else (
+            len(digest.charts[0].labels) if digest.charts else None
+        )
+        text = f"This breakdown covers **{digest.total_count:,}** {noun}{scope}"
+        if groups:
+            text += f", across {groups:,} groups"
+        return text + "."
+
+    total = digest.total_count if digest.total_count is not None else digest.row_count
+    if total is None:
+        return f"The last result had no rows{scope}."
+    text = f"I fetched **{total:,}** {noun}{scope}."
+    if digest.row_count is not None and digest.row_count < total:
+        text += f" {digest.row_count:,} of them are shown; use the result link to page through the rest."
+    return text
+
+
+def _answer_filters(digest: ResultDigest) -> str:
+    domain = "PPM" if "ppm" in digest.domain.lower() else "Corporate"
+    filters = _describe_filters(digest)
+    if not filters:
+        return f"No filters are applied: you're looking at all {domain} tickets, across all dates."
+    text = f"You're looking at {domain} tickets filtered by {filters}."
+    if not digest.filters.get("timeframe"):
+        text += " There's no date filter, so every date is included."
+    return text
+
+
+def _answer_is_this(digest: ResultDigest, subject: str) -> Optional[str]:
+    subject = subject.strip().strip("?.! ").strip()
+    asked = _period(subject)
+    if asked is not None:
+        active_tf = digest.filters.get("timeframe")
+        if not active_tf:
+            return (
+                f"No. There's no date filter, so this covers all dates, not only {_period_name(asked)}. "
+                f"Ask for \"{subject}\" to narrow it down."
+            )
+        active = _period(active_tf)
+        if active is None:
+            return None  # free-text timeframe ("Q3"): can't compare deterministically
+        if active == asked:
+            return f"Yes, this result is filtered to {_period_name(active)}."
+        if active[0] == asked[0] and asked[1] is None:
+            return f"Yes. It's filtered to {_period_name(active)}, which is within {asked[0]}."
+        return f"No, this result is filtered to {_period_name(active)}, not {_period_name(asked)}."
+
+    # Not a period: match the subject against the other active filter values.
+    lowered = subject.lower()
+    for key, label in _FILTER_LABELS:
+        for value in as_list(digest.filters.get(key)):
+            if value.lower() in lowered or lowered in value.lower():
+                return f"Yes, the {label} filter is {_format_value(digest.filters[key])}."
+    return None
+
+
+def _adds_scope(query: str, digest: ResultDigest) -> bool:
+    """
+    True when the question adds a filter or time window, or names a
+    dimension the result isn't filtered on: it may be a new data question.
+    """
+    if _NEW_SCOPE.search(query):
+        return True
+    return any(
+        pattern.search(query) and not digest.filters.get(_DIMENSION_FILTERS[dimension])
+        for dimension, pattern in _DIMENSION_WORDS
+    )
+
+
+def _chart_dimension(chart: ChartDigest) -> Optional[str]:
+    x_key = (chart.x_key or "").lower()
+    for dimension, fragments in _X_KEY_DIMENSIONS:
+        if any(fragment in x_key for fragment in fragments):
+            return dimension
+    return None
+
+
+def _answer_top(digest: ResultDigest, query: str) -> Optional[str]:
+    chart = next((c for c in digest.charts if c.labels and c.values), None)
+    if chart is None:
+        return None
+    # "Which branch had the most this month?" after a company chart is a new
+    # question: only answer when it asks about the chart's own dimension and
+    # adds no filter or time window.
+    if _NEW_SCOPE.search(query):
+        return None
+    asked = [dimension for dimension, pattern in _DIMENSION_WORDS if pattern.search(query)]
+    if asked and asked != [_chart_dimension(chart)]:
+        return None
+    want_low = bool(_LOW_WORDS.search(query))
+    if want_low and chart.truncated:
+        return None
+
+    pairs = [(label, value) for label, value in zip(chart.labels, chart.values) if label != OTHER_LABEL]
+    if not pairs:
+        return None
+    pairs.sort(key=lambda pair: pair[1], reverse=not want_low)
+    label, value = pairs[0]
+    runners = ", ".join(f"{l} ({_format_number(v)})" for l, v in pairs[1:3])
+    text = f"In \"{chart.title}\", **{label}** has the {'lowest' if want_low else 'highest'} value: {_format_number(value)}."
+    if runners:
+        text += f" Next: {runners}."
+    return text
+
+
+def answer_context_question(
+    query_lower: str,
+    digest: Optional[ResultDigest],
+    state: Optional[Dict[str, Any]],
+    strict: bool = True,
+) -> Optional[str]:
+    """
+    Deterministic answer to a question about the current result, or None.
+
+    `strict` only matches phrasings that can't be a new data query; the
+    loose mode is for turns the router already classified as CONTEXT_QUESTION.
+    """
+    if digest is None or digest.state_fingerprint != state_fingerprint(state):
+        return None
+    query = query_lower.strip()
+
+    match = _IS_THIS.match(query)
+    if match:
+        return _answer_is_this(digest, match.group("subject"))
+
+    # Before the router only whole-question phrasings about the view match.
+    if strict and _adds_scope(query, digest):
+        return None
+
+    if _COUNT_STRICT.search(query) or (not strict and _COUNT_LOOSE.search(query)):
+        return _answer_count(digest)
+
+    # Top-N is never answered before the router: "which X had the most ..."
+    # is usually a new data question.
+    # A declined top-N question is not a filters question either.
+    if not strict and _TOP_LOOSE.search(query):
+        return _answer_top(digest, query)
+
+    if _FILTERS_STRICT.search(query) or (not strict and _FILTERS_LOOSE.search(query)):
+        return _answer_filters(digest)
+
+    return None
@@ -0,0 +1,257 @@
+"""
+ai/drilldown.py
+
+Answers narrowing follow-ups by filtering the previous detail result in memory.
+
+"Show open tickets for Reliance" returns 23 rows, which is the complete
+result: the exact COUNT(*) fits inside the preview. A follow-up like "only
+the closed ones" or "just Mumbai" used to cost a second LLM SQL generation
+and a DB round-trip. Yet the answer is a subset of rows the server just
+returned.
+
+Per session, the last complete detail result is remembered together with
+the state that produced it. On the next turn, after update_state(), the
+new state is compared with the remembered one. If the transition is strictly
+narrowing, the new predicate is applied in-process and the SQL/DB stages are
+skipped. Narrowing means the same domain, still detail intent, and no filter
+removed or changed except by adding one or tightening a branch list. The
+predicate uses the same case-insensitive LIKE / equality semantics the SQL
+would, so the subset is identical.
+
+Each new filter must be checkable against columns present in the rows.
+Company and location filters match several columns in SQL (CompanyName
+OR CorporateName, BranchSite OR BranchCity OR BranchState). They are only
+applied when every one of those columns is in the rows. Otherwise the
+normal pipeline runs.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from ai.panel_templates import CORPORATE_TYPES, as_list, smart_wildcard, timeframe_like_patterns
+from config import settings
+
+# State keys that are filters. Anything else (intent, dismissed_pills,
+# last_updated) is bookkeeping.
+FILTER_KEYS = ("company_name", "branch_name", "timeframe", "status", "priority", "service_type")
+
+
+@dataclass
+class RememberedResult:
+    state: Dict[str, Any]
+    rows: List[Dict[str, Any]]
+    result_id: Optional[str]
+    # Wall-clock time the rows reflect (fetch time minus any cache age)
+    data_as_of: float
+
+
+@dataclass
+class DerivedResult:
+    rows: List[Dict[str, Any]]
+    source_result_id: Optional[str]
+    # Human-readable description of the in-memory predicate, for the audit log
+    description: str
+    # Inherited from the remembered rows: filtering them doesn't make them newer
+    data_as_of: float
+
+    @property
+    def age_seconds(self) -> float:
+        return max(0.0, time.time() - self.data_as_of)
+
+
+# ---------------------------------------------------------------------------
+# LIKE SEMANTICS
+# ---------------------------------------------------------------------------
+
+def _like_regex(pattern: str) -> "re.Pattern":
+    """MySQL LIKE pattern -> compiled case-insensitive regex (full match)."""
+    parts = []
+    for ch in pattern:
+        if ch == "%":
+            parts.append(".*")
+        elif ch == "_":
+            parts.append(".")
+        else:
+            parts.append(re.escape(ch))
+    return re.compile("".join(parts), re.IGNORECASE | re.DOTALL)
+
+
+def _first_present(columns: set, *candidates: str) -> Optional[str]:
+    for name in candidates:
+        if name in columns:
+            return name
+    return None
+
+
+def _build_predicate(
+    key: str,
+    value: Any,
+    columns: set,
+    is_ppm: bool,
+) -> Optional[Tuple[List[str], List[str]]]:
+    """
+    (columns, LIKE patterns) for one filter, mirroring build_sql_prompt's
+    rules. A row passes if any column matches any pattern. Returns None if
+    the rows don't carry what's needed to evaluate the filter exactly.
+    """
+    # Status / priority are exact values (`ct.Status = 'Closed'`); a LIKE
+    # pattern without wildcards is a case-insensitive equality.
+    if key == "status":
+        col = _first_present(columns, "Status", "CurrentStatus")
+        return ([col], as_list(value)) if col else None
+
+    if key == "priority":
+        return (["Priority"], as_list(value)) if "Priority" in columns and not is_ppm else None
+
+    if key == "service_type":
+        if is_ppm:
+            return None  # routed through service report tables, not a row column
+        values = as_list(value)
+        target = "Type" if all(v.lower() in CORPORATE_TYPES for v in values) else "Service"
+        return ([target], [f"%{v}%" for v in values]) if target in columns else None
+
+    if key == "timeframe":
+        col = "PPMDate" if is_ppm else "CreatedDate"
+        patterns = timeframe_like_patterns(value)
+        if not patterns or col not in columns:
+            return None
+        return [col], patterns
+
+    if key == "branch_name":
+        needed = ["BranchSite", "BranchCity", "BranchState"]
+        if not all(c in columns for c in needed):
+            return None
+        return needed, [smart_wildcard(v) for v in as_list(value)]
+
+    if key == "company_name":
+        needed = ["CompanyName", "CorporateName"]
+        if not all(c in columns for c in needed):
+            return None
+        return needed, [f"%{v}%" for v in as_list(value)]
+
+    return None
+
+
+def _is_narrowing(previous: Dict[str, Any], new: Dict[str, Any]) -> Optional[List[str]]:
+    """
+    Returns the filter keys the new state adds or tightens, or None if the
+    transition isn't strictly narrowing.
+    """
+    if (previous.get("domain") or "corporate_tickets") != (new.get("domain") or "corporate_tickets"):
+        return None
+    if new.get("intent") != "detail":
+        return None
+
+    changed = []
+    for key in FILTER_KEYS:
+        old_val, new_val = previous.get(key), new.get(key)
+        if old_val == new_val:
+            continue
+        if not new_val:
+            return None  # a filter was removed — widening
+        if old_val:
+            # Only a branch list shrinking to a subset is still narrowing.
+            if key == "branch_name" and set(as_list(new_val)) < set(as_list(old_val)):
+                changed.append(key)
+                continue
+            return None
+        changed.append(key)
+    return changed or None
+
+
+# ---------------------------------------------------------------------------
+# PER-SESSION MEMORY
+# ---------------------------------------------------------------------------
+
+class DrillDownMemory:
+    """Bounded per-session memory of the last complete detail result."""
+
+    def __init__(self, max_sessions: int):
+        self.max_sessions = max_sessions
+        self._entries: "OrderedDict[str, RememberedResult]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def remember(
+        self,
+        session_id: Optional[str],
+        state: Dict[str, Any],
+        rows: List[Dict[str, Any]],
+        result_id: Optional[str],
+        data_as_of: Optional[float] = None,
+    ) -> None:
+        """
+        Stores a COMPLETE detail result (every matching row) for the session.
+        `data_as_of` defaults to now, i.e. rows fresh from the database.
+        """
+        if not session_id:
+            return
+        data_as_of = time.time() if data_as_of is None else data_as_of
+        with self._lock:
+            self._entries[session_id] = RememberedResult(dict(state), list(rows), result_id, data_as_of)
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_sessions:
+                self._entries.popitem(last=False)
+
+    def set_result_id(self, session_id: Optional[str], result_id: Optional[str]) -> None:
+        """Attaches the result_id once the just-remembered result has been stored."""
+        if not session_id:
+            return
+        with self._lock:
+            remembered = self._entries.get(session_id)
+            if remembered is not None and remembered.result_id is None:
+                remembered.result_id = result_id
+
+    def forget(self, session_id: Optional[str]) -> None:
+        if not session_id:
+            return
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    def narrow(self, session_id: Optional[str], new_state: Dict[str, Any]) -> Optional[DerivedResult]:
+        """
+        Filters the session's remembered rows for `new_state`, or returns None
+        when the transition isn't narrowing or can't be evaluated in memory.
+        """
+        if not session_id:
+            return None
+        with self._lock:
+            remembered = self._entries.get(session_id)
+        if remembered is None:
+            return None
+
+        changed = _is_narrowing(remembered.state, new_state)
+        if not changed:
+            return None
+
+        columns = set(remembered.rows[0].keys()) if remembered.rows else set()
+        is_ppm = "ppm" in (new_state.get("domain") or "").lower()
+
+        predicates = []
+        for key in changed:
+            predicate = _build_predicate(key, new_state.get(key), columns, is_ppm)
+            if predicate is None:
+                return None
+            cols, patterns = predicate
+            predicates.append((cols, [_like_regex(p) for p in patterns]))
+
+        rows = [
+            row for row in remembered.rows
+            if all(
+                any(rx.fullmatch(str(row.get(col) or "")) for col in cols for rx in regexes)
+                for cols, regexes in predicates
+            )
+        ]
+        description = " AND ".join(f"{key}={new_state.get(key)!r}" for key in changed)
+        return DerivedResult(
+            rows=rows,
+            source_result_id=remembered.result_id,
+            description=description,
+            data_as_of=remembered.data_as_of,
+        )
+
+
+drilldown_memory = DrillDownMemory(max_sessions=settings.DRILLDOWN_MAX_SESSIONS)
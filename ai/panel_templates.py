@@ -0,0 +1,320 @@
+"""
+ai/panel_templates.py
+
+Deterministic SQL for the standard dashboard panels, with no LLM call.
+
+The landing dashboard always asks the same three or four questions (status
+distribution, company breakdown, month trend, ...) under one search state.
+Each question has a fixed shape, so its SQL is compiled here straight from
+the state:
+
+  - The skeleton follows the rules build_sql_prompt() gives the LLM:
+    mandatory base table, LEFT JOINs before filtering, LIKE-based
+    VARCHAR date filters (typed ticket_date_facts ranges when the caller
+    says that table is current), and smart wildcards for locations.
+  - Every user-supplied value is rendered as a sqlglot string literal, so
+    quoting is always correct.
+  - The result still goes through validate_and_format_sql(), the same
+    gate as LLM-written SQL.
+
+compile_panel_sql() returns None when the state holds something the
+templates can't express faithfully (a free-text timeframe like "Q3",
+PPM service routing, PPM priority). The caller then falls back to the LLM
+pipeline for that panel only.
+"""
+
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlglot import exp
+
+from ai.prompt_builder import MIN_WILDCARD_CHARS
+from config import settings
+from rules.sql_validator import validate_and_format_sql
+
+# Panel type -> natural-language question used for the LLM fallback.
+PANEL_QUESTIONS = {
+    "status":  "Show the ticket count by status",
+    "company": "Show the ticket count by company",
+    "branch":  "Show the ticket count by branch",
+    "trend":   "Show the month wise ticket trend",
+}
+
+PANEL_TYPES = list(PANEL_QUESTIONS)
+
+# Corporate `Type` values; any other service_type is a trade in `Service`.
+CORPORATE_TYPES = {"amc", "r&m", "supply", "projects", "booking"}
+
+# Timeframe words that mean "group over all time", not "filter" (rule 14).
+GENERIC_TIMEFRAMES = {
+    "month", "monthly", "month wise", "by month", "year", "yearly",
+    "trend", "all time", "all",
+}
+
+_MONTHS = {
+    name: i
+    for i, names in enumerate(
+        [("jan", "january"), ("feb", "february"), ("mar", "march"), ("apr", "april"),
+         ("may",), ("jun", "june"), ("jul", "july"), ("aug", "august"),
+         ("sep", "sept", "september"), ("oct", "october"), ("nov", "november"),
+         ("dec", "december")],
+        start=1,
+    )
+    for name in names
+}
+
+_YEAR_RE = re.compile(r"^(\d{4})$")
+_MONTH_YEAR_RE = re.compile(r"^([a-z]+)\.?,?\s*(\d{4})?$")
+_YEAR_MONTH_RE = re.compile(r"^(\d{4})-(\d{1,2})$")
+
+
+def _lit(value: str) -> str:
+    """Renders a value as a safely quoted MySQL string literal."""
+    return exp.Literal.string(value).sql(dialect="mysql")
+
+
+def smart_wildcard(name: str) -> str:
+    """Mirrors the prompt's smart-wildcard rule for location names."""
+    name = name.strip()
+    if " " in name or len(name) < MIN_WILDCARD_CHARS:
+        return f"%{name}%"
+    return f"%{name[:MIN_WILDCARD_CHARS]}%"
+
+
+def as_list(value: Any) -> List[str]:
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return [str(v) for v in value if v]
+
+
+# ---------------------------------------------------------------------------
+# FILTER CLAUSES
+# ---------------------------------------------------------------------------
+
+def _timeframe_period(timeframe: Any) -> Optional[Tuple[Optional[int], Optional[int]]]:
+    """
+    (year, month) named by a timeframe; month is None for a whole year.
+    (None, None) means "no filter" (empty or generic grouping words) and
+    None means the timeframe can't be templated.
+    """
+    if not timeframe:
+        return None, None
+    text = str(timeframe).strip().lower()
+    if text in GENERIC_TIMEFRAMES:
+        return None, None
+
+    now = datetime.now()
+    year: Optional[int] = None
+    month: Optional[int] = None
+
+    if text == "this month":
+        year, month = now.year, now.month
+    elif text == "last month":
+        year, month = (now.year, now.month - 1) if now.month > 1 else (now.year - 1, 12)
+    elif text == "this year":
+        year = now.year
+    elif text == "last year":
+        year = now.year - 1
+    elif _YEAR_RE.match(text):
+        year = int(text)
+    elif _YEAR_MONTH_RE.match(text):
+        m = _YEAR_MONTH_RE.match(text)
+        year, month = int(m.group(1)), int(m.group(2))
+    elif _MONTH_YEAR_RE.match(text) and _MONTH_YEAR_RE.match(text).group(1) in _MONTHS:
+        m = _MONTH_YEAR_RE.match(text)
+        month = _MONTHS[m.group(1)]
+        year = int(m.group(2)) if m.group(2) else now.year
+    else:
+        return None
+
+    if month is not None and not 1 <= month <= 12:
+        return None
+    return year, month
+
+
+def timeframe_like_patterns(timeframe: Any) -> Optional[List[str]]:
+    """
+    LIKE patterns matching a timeframe on a VARCHAR date column (either
+    YYYY-MM-DD or DD-MM-YYYY form, rule 12 of the SQL prompt).
+
+    Returns [] for "no filter" (empty or generic grouping words) and None if
+    the timeframe can't be templated (the caller then uses the LLM).
+    """
+    period = _timeframe_period(timeframe)
+    if period is None:
+        return None
+    year, month = period
+    if year is None:
+        return []
+    if month is None:
+        return [f"{year}-%", f"%-{year}"]
+    return [f"{year}-{month:02d}-%", f"%-{month:02d}-{year}"]
+
+
+def timeframe_date_range(timeframe: Any) -> Optional[Tuple[str, ...]]:
+    """
+    Half-open ISO date range (start, end) of a timeframe, for the typed
+    ticket_date_facts.EventDate column. () for "no filter", None if the
+    timeframe can't be templated.
+    """
+    period = _timeframe_period(timeframe)
+    if period is None:
+        return None
+    year, month = period
+    if year is None:
+        return ()
+    if month is None:
+        return f"{year}-01-01", f"{year + 1}-01-01"
+    end_year, end_month = (year, month + 1) if month < 12 else (year + 1, 1)
+    return f"{year}-{month:02d}-01", f"{end_year}-{end_month:02d}-01"
+
+
+def _facts_timeframe_clause(timeframe: Any) -> Optional[str]:
+    """Index range on ticket_date_facts.EventDate, "" for no filter, None if it can't be templated."""
+    date_range = timeframe_date_range(timeframe)
+    if date_range is None:
+        return None
+    if not date_range:
+        return ""
+    start, end = date_range
+    return f"(tdf.EventDate >= {_lit(start)} AND tdf.EventDate < {_lit(end)})"
+
+
+def _timeframe_clause(timeframe: Any, column: str) -> Optional[str]:
+    """LIKE clause for a timeframe, "" for no filter, None if it can't be templated."""
+    patterns = timeframe_like_patterns(timeframe)
+    if patterns is None:
+        return None
+    if not patterns:
+        return ""
+    return "(" + " OR ".join(f"{column} LIKE {_lit(p)}" for p in patterns) + ")"
+
+
+def _location_clause(branch_name: Any) -> str:
+    blocks = []
+    for name in as_list(branch_name):
+        pattern = _lit(smart_wildcard(name))
+        blocks.append(
+            f"(branch.BranchSite LIKE {pattern} OR branch.BranchCity LIKE {pattern} "
+            f"OR branch.BranchState LIKE {pattern})"
+        )
+    return f"({' OR '.join(blocks)})" if blocks else ""
+
+
+def _company_clause(company_name: Any) -> str:
+    blocks = [
+        f"(corporate.CorporateName LIKE {_lit(f'%{name}%')} OR company.CompanyName LIKE {_lit(f'%{name}%')})"
+        for name in as_list(company_name)
+    ]
+    return f"({' OR '.join(blocks)})" if blocks else ""
+
+
+def _in_clause(column: str, values: Any) -> str:
+    """Equality over every selected value: one `=` or an IN list."""
+    values = as_list(values)
+    if not values:
+        return ""
+    if len(values) == 1:
+        return f"{column} = {_lit(values[0])}"
+    return f"{column} IN ({', '.join(_lit(v) for v in values)})"
+
+
+def _service_clause(service_type: Any, alias: str) -> str:
+    blocks = [
+        f"{alias}.{'Type' if service.lower() in CORPORATE_TYPES else 'Service'} LIKE {_lit(f'%{service}%')}"
+        for service in as_list(service_type)
+    ]
+    if len(blocks) > 1:
+        return f"({' OR '.join(blocks)})"
+    return blocks[0] if blocks else ""
+
+
+# ---------------------------------------------------------------------------
+# PANEL SQL
+# ---------------------------------------------------------------------------
+
+def compile_panel_sql(panel: str, state: Dict[str, Any], date_facts: bool = False) -> Optional[str]:
+    """
+    Builds validated summary SQL for one dashboard panel under `state`.
+
+    With `date_facts`, timeframe filters and the trend period read the typed
+    ticket_date_facts columns instead of LIKE / LEFT() on the VARCHAR date.
+
+    Returns the safe_sql string, or None if this panel/state combination
+    needs the LLM pipeline instead.
+    """
+    if panel not in PANEL_QUESTIONS:
+        return None
+
+    domain = (state.get("domain") or "corporate_tickets").lower()
+    is_ppm = "ppm" in domain
+    alias = "pt" if is_ppm else "ct"
+    base_table = "ppm_tickets pt" if is_ppm else "corporate_tickets ct"
+    date_col = f"{alias}.PPMDate" if is_ppm else f"{alias}.CreatedDate"
+
+    # PPM has no Priority column and routes services through report tables.
+    if is_ppm and (state.get("priority") or state.get("service_type")):
+        return None
+
+    where: List[str] = []
+    joins: List[str] = []
+
+    company = _company_clause(state.get("company_name"))
+    if company or panel == "company":
+        joins.append(f"LEFT JOIN company ON {alias}.CorporateID = company.ID")
+    if company:
+        joins.append("LEFT JOIN corporate ON company.CorporateName = corporate.ID")
+        where.append(company)
+
+    location = _location_clause(state.get("branch_name"))
+    if location or panel == "branch":
+        joins.append(f"LEFT JOIN branch ON {alias}.BranchID = branch.ID")
+    if location:
+        where.append(location)
+
+    if date_facts:
+        source = "ppm_tickets" if is_ppm else "corporate_tickets"
+        joins.append(
+            f"LEFT JOIN ticket_date_facts tdf ON tdf.SourceTable = {_lit(source)} AND tdf.TicketRowID = {alias}.ID"
+        )
+        timeframe = _facts_timeframe_clause(state.get("timeframe"))
+    else:
+        timeframe = _timeframe_clause(state.get("timeframe"), date_col)
+    if timeframe is None:
+        return None
+    if timeframe:
+        where.append(timeframe)
+
+    # Multi-valued filters match any of their values, as the LLM SQL does.
+    for clause in (
+        _in_clause(f"{alias}.Status", state.get("status")),
+        _in_clause(f"{alias}.Priority", state.get("priority")),
+        _service_clause(state.get("service_type"), alias),
+    ):
+        if clause:
+            where.append(clause)
+
+    count = f"COUNT({alias}.TicketID) AS Count"
+    if panel == "status":
+        select, group, order = f"{alias}.Status AS CurrentStatus, {count}", f"{alias}.Status", "Count DESC"
+    elif panel == "company":
+        select, group, order = f"company.CompanyName, {count}", "company.CompanyName", "Count DESC"
+    elif panel == "branch":
+        select, group, order = f"branch.BranchSite, {count}", "branch.BranchSite", "Count DESC"
+    else:  # trend
+        period = "tdf.MonthKey" if date_facts else f"LEFT({date_col}, 7)"
+        select, group, order = f"{period} AS TimePeriod, {count}", "TimePeriod", "TimePeriod ASC"
+
+    sql = f"SELECT {select} FROM {base_table} {' '.join(joins)}"
+    if where:
+        sql += f" WHERE {' AND '.join(where)}"
+    sql += f" GROUP BY {group} ORDER BY {order} LIMIT {settings.MAX_ROWS_LIMIT}"
+
+    validation = validate_and_format_sql(sql, intent="summary")
+    if not validation["is_valid"]:
+        print(f"Panel template for '{panel}' failed validation: {validation['error']}")
+        return None
+    return validation["safe_sql"]
@@ -16,13 +16,16 @@ ROW LIMIT LOGIC (key change from V4.1):
   - Detail queries: Return the total count + the 50 most recent rows.
     User sees: "Found 312 tickets. Showing the 50 most recent."
     This is honest and actionable — user can refine filters to narrow down.
+    The DB only ever returns the 50-row preview; the exact total comes from a
+    companion COUNT(*) query (see db/detail_query.py).
 """
 
 from dataclasses import dataclass
 from typing import Optional
 
 from ai.prompt_builder import build_sql_prompt
-from ai.sql_generator import generate_sql, generate_human_summary, SQL_GENERATION_FAILED
+from ai.sql_generator import generate_sql, generate_human_summary, template_summary, SQL_GENERATION_FAILED
+from core.deadline import remaining_budget
 from rules.sql_validator import validate_and_format_sql
 
 # How many rows to surface in detail mode
@@ -48,17 +51,20 @@ class SummaryResult:
 # SQL PIPELINE
 # ---------------------------------------------------------------------------
 
-async def sql_pipeline(user_query: str, new_state: dict) -> SQLResult:
+async def sql_pipeline(user_query: str, new_state: dict, date_facts: bool = False) -> SQLResult:
     """
     Builds the prompt, calls the LLM for SQL, validates with AST parsing.
     Retries once with the error message appended if validation fails.
+
+    `date_facts` adds the ticket_date_facts rules to summary prompts; the
+    caller decides (db.date_facts.prefer_date_facts).
     """
     intent = new_state.get("intent", "detail")
     max_retries = 1
     last_error: Optional[str] = None
 
     for attempt in range(max_retries + 1):
-        prompt = build_sql_prompt(user_query, new_state)
+        prompt = build_sql_prompt(user_query, new_state, date_facts=date_facts)
 
         if attempt > 0 and last_error:
             prompt += (
@@ -101,6 +107,7 @@ async def summary_pipeline(
     is_success: bool,
     db_error: Optional[str],
     row_count: int,
+    total_count: Optional[int] = None,
 ) -> SummaryResult:
     """
     Generates the human-readable summary and applies the correct row limit strategy.
@@ -111,8 +118,8 @@ async def summary_pipeline(
     - limit_reached warns if rows hit the hard DB cap.
 
     DETAIL INTENT:
-    - Total count is captured before truncation.
-    - Only DETAIL_PREVIEW_LIMIT (50) most recent rows go into raw_data.
+    - safe_rows is already the DETAIL_PREVIEW_LIMIT (50) row preview.
+    - total_count is the exact COUNT(*) of the same filters, when available.
     - The summary text states the full count honestly:
       "Found 312 tickets. Showing the 50 most recent — refine with filters."
     - No LLM call needed for detail — fast-pass string is sufficient.
@@ -126,6 +133,12 @@ async def summary_pipeline(
 
     if is_success and row_count > 0:
         if intent == "summary":
+            # Too little of the request's deadline left for an LLM round-trip.
+            if remaining_budget(float("inf")) < settings.SUMMARY_MIN_BUDGET_SECONDS:
+                print("Summary: deadline too close for the LLM, using the template.")
+                text = template_summary(safe_rows, new_state)
+                return SummaryResult(text=text, limit_reached=limit_reached, total_count=row_count)
+
             text = await generate_human_summary(
                 user_query,
                 safe_rows[:50],    # LLM only needs a sample
@@ -137,11 +150,16 @@ async def summary_pipeline(
         else:
             # DETAIL: honest count message, no LLM.
             #
-            # When the DB returns exactly MAX_ROWS_LIMIT rows, we hit the hard cap —
-            # the real count could be higher. Display "500+" rather than "500" to
-            # signal there are more results beyond the cap (same pattern as Gmail / GitHub).
-            # When the DB returns fewer rows, the count is exact — show it plainly.
-            total = row_count
+            # With an exact total_count from the companion COUNT(*) query the
+            # number is shown plainly. If the count query failed and the preview
+            # came back full, the real count could be higher — display "50+"
+            # (same pattern as Gmail / GitHub).
+            if total_count is not None:
+                total = max(total_count, row_count)
+                limit_reached = False
+            else:
+                total = row_count
+                limit_reached = row_count >= DETAIL_PREVIEW_LIMIT
             shown = min(total, DETAIL_PREVIEW_LIMIT)
             domain = (new_state.get("domain") or "corporate_tickets").lower()
             label = "PPM tickets" if "ppm" in domain else "tickets"
@@ -0,0 +1,216 @@
+"""
+ai/prefetcher.py
+
+Background prefetch of the smart-pill follow-ups.
+
+generate_smart_pills() already knows the 2–4 actions the user is most likely
+to click next. After a response is sent, the prefetcher runs the full
+pipeline for the top PREFETCH_MAX_PILLS of them: state update, SQL, DB and
+formatting. The finished responses are kept in a small store keyed by
+(state fingerprint, pill text). A pill click that hits the store returns
+without any LLM or DB work.
+
+Prefetching is strictly lower priority than interactive requests:
+  - At most PREFETCH_MAX_CONCURRENT prefetches run at once.
+  - Nothing is scheduled, and queued prefetches give up, while
+    PREFETCH_MAX_INTERACTIVE or more interactive requests are in flight.
+  - When an interactive request pushes the load over that limit, running
+    prefetches are cancelled.
+  - Prefetches run as core/admission background work: they take an LLM /
+    DB / CPU slot only when one is free and never queue for it, and
+    nothing is scheduled while any of those limiters has waiters.
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from config import settings
+from core.admission import OverloadedError, background_work, has_waiters
+
+# State keys that change on every turn without changing the answer.
+_VOLATILE_STATE_KEYS = ("last_updated", "dismissed_pills")
+
+
+def state_fingerprint(state: Optional[Dict[str, Any]]) -> str:
+    """Stable hash of the answer-relevant part of a search state."""
+    relevant = {k: v for k, v in (state or {}).items() if k not in _VOLATILE_STATE_KEYS}
+    payload = json.dumps(relevant, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _prefetch_key(state: Optional[Dict[str, Any]], query: str, variant: str = "") -> str:
+    # `variant` carries response-shape options (e.g. raw_data layout) so a
+    # prefetched payload is only served to a request that asked for the same shape.
+    return f"{state_fingerprint(state)}:{variant}:{query.strip().lower()}"
+
+
+@dataclass
+class PrefetchedResponse:
+    response: Any  # QueryResponse
+    created_at: float = field(default_factory=time.time)
+
+
+class Prefetcher:
+    """Bounded store of prefetched pill responses plus the low-priority task runner."""
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: int,
+        max_pills: int,
+        max_concurrent: int,
+        max_interactive: int,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_pills = max_pills
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_interactive = max(1, max_interactive)
+
+        self._entries: "OrderedDict[str, PrefetchedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight_keys: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._interactive = 0
+        self._metrics: Dict[str, int] = {
+            "scheduled": 0, "completed": 0, "hits": 0, "misses": 0,
+            "skipped_load": 0, "cancelled": 0, "errors": 0,
+        }
+
+    # ------------------------------------------------------------------
+    # INTERACTIVE LOAD TRACKING
+    # ------------------------------------------------------------------
+
+    @contextmanager
+    def interactive(self):
+        """Wraps an interactive request so prefetching backs off under load."""
+        self._interactive += 1
+        if self._interactive >= self.max_interactive:
+            self.cancel_all()
+        try:
+            yield
+        finally:
+            self._interactive -= 1
+
+    @property
+    def under_load(self) -> bool:
+        return self._interactive >= self.max_interactive or has_waiters()
+
+    # ------------------------------------------------------------------
+    # STORE
+    # ------------------------------------------------------------------
+
+    def get(self, state: Optional[Dict[str, Any]], query: str, variant: str = "") -> Optional[Any]:
+        """Returns a prefetched response for this (state, query), if fresh."""
+        key = _prefetch_key(state, query, variant)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry.created_at > self.ttl_seconds:
+                if entry is not None:
+                    del self._entries[key]
+                self._metrics["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._metrics["hits"] += 1
+            return entry.response
+
+    def _put(self, key: str, response: Any) -> None:
+        with self._lock:
+            self._entries[key] = PrefetchedResponse(response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            snapshot = dict(self._metrics)
+            snapshot["entries"] = len(self._entries)
+        snapshot["running"] = len(self._tasks)
+        snapshot["interactive_inflight"] = self._interactive
+        return snapshot
+
+    # ------------------------------------------------------------------
+    # SCHEDULING
+    # ------------------------------------------------------------------
+
+    async def schedule(
+        self,
+        state: Optional[Dict[str, Any]],
+        pills: List[str],
+        run: Callable[[str, Optional[Dict[str, Any]]], Awaitable[Any]],
+        variant: str = "",
+    ) -> None:
+        """
+        Starts background prefetches for the top pills under `state`.
+        `run(query, state)` is the reusable pipeline core and returns a
+        QueryResponse. Meant to be called as a FastAPI BackgroundTask, after
+        the interactive response has been sent.
+        """
+        if not settings.PREFETCH_ENABLED or not pills:
+            return
+        if self.under_load:
+            self._count("skipped_load", len(pills[:self.max_pills]))
+            return
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+
+        for pill in pills[:self.max_pills]:
+            key = _prefetch_key(state, pill, variant)
+            with self._lock:
+                if key in self._entries or key in self._inflight_keys:
+                    continue
+                self._inflight_keys.add(key)
+            task = asyncio.create_task(self._prefetch(key, pill, dict(state or {}), run))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            self._count("scheduled")
+
+    def cancel_all(self) -> None:
+        for task in list(self._tasks):
+            if not task.done():
+                task.cancel()
+
+    async def _prefetch(self, key: str, pill: str, state: Dict[str, Any], run) -> None:
+        try:
+            async with self._semaphore:
+                # Re-check after queueing: interactive traffic wins.
+                if self.under_load:
+                    self._count("skipped_load")
+                    return
+                with background_work():
+                    response = await asyncio.wait_for(run(pill, state), timeout=settings.PREFETCH_TIMEOUT_SECONDS)
+            if getattr(response, "status", None) == "success":
+                self._put(key, response)
+            self._count("completed")
+        except asyncio.CancelledError:
+            self._count("cancelled")
+        except OverloadedError:
+            self._count("skipped_load")  # no free slot: interactive traffic wins
+        except Exception as e:
+            print(f"Prefetch failed for '{pill}': {e}")
+            self._count("errors")
+        finally:
+            with self._lock:
+                self._inflight_keys.discard(key)
+
+    def _count(self, metric: str, n: int = 1) -> None:
+        with self._lock:
+            self._metrics[metric] += n
+
+
+prefetcher = Prefetcher(
+    max_entries=settings.PREFETCH_STORE_MAX_ENTRIES,
+    ttl_seconds=settings.PREFETCH_TTL_SECONDS,
+    max_pills=settings.PREFETCH_MAX_PILLS,
+    max_concurrent=settings.PREFETCH_MAX_CONCURRENT,
+    max_interactive=settings.PREFETCH_MAX_INTERACTIVE,
+)
@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from config import settings
 from datetime import datetime
 
@@ -83,6 +85,7 @@ SCHEMA_DEFINITION = """
 MIN_WILDCARD_CHARS = 5  # e.g. "Mumbai" (6) → "%Mumba%", "Pune" (4) → "%Pune%"
 
 
+@lru_cache(maxsize=None)
 def _wildcard_rule_description() -> str:
     """Returns the wildcard rule text injected into the prompt."""
     return f"""
@@ -100,6 +103,7 @@ def _wildcard_rule_description() -> str:
 """
 
 
+@lru_cache(maxsize=None)
 def _branch_where_clause_description(ticket_alias: str) -> str:
     """
     Returns the branch/location WHERE clause instruction, now aware that
@@ -132,7 +136,38 @@ def _branch_where_clause_description(ticket_alias: str) -> str:
 """
 
 
-def build_sql_prompt(user_query: str, state: dict) -> str:
+@lru_cache(maxsize=None)
+def _date_facts_rules(ticket_alias: str, is_ppm: bool) -> str:
+    """Rule 17: read dates from the typed ticket_date_facts shadow table."""
+    source = "ppm_tickets" if is_ppm else "corporate_tickets"
+    resolution = (
+        "\n        * Resolution time: use `ROUND(AVG(tdf.DaysToClose), 1) AS AvgDaysToClose` and add "
+        "`AND tdf.DaysToClose IS NOT NULL` instead of the DATEDIFF expression and CloseDate checks."
+        if is_ppm else ""
+    )
+    return f"""
+17. TYPED DATE TABLE (OVERRIDES RULE 12 AND THE DATE RULES ABOVE): Table `ticket_date_facts` holds the parsed dates of every ticket as real DATE columns, with indexes.
+    - Columns: SourceTable (varchar), TicketRowID (int FK -> {source}.ID), EventDate (date), MonthKey (char 'YYYY-MM'), CreatedOn (date), ClosedOn (date), DueOn (date), DaysToClose (int).
+    - Join it EXACTLY like this: `LEFT JOIN ticket_date_facts tdf ON tdf.SourceTable = '{source}' AND tdf.TicketRowID = {ticket_alias}.ID`.
+        * Timeframes: filter on a half-open range, e.g. December 2025 is `tdf.EventDate >= '2025-12-01' AND tdf.EventDate < '2026-01-01'`. Do NOT use the LIKE patterns of rule 12.
+        * Trends: use `tdf.MonthKey AS TimePeriod` instead of LEFT(). Group by `TimePeriod` and order by `TimePeriod ASC`.{resolution}
+"""
+
+
+def warm_prompt_sections() -> int:
+    """Builds every cached static section (startup warm-up). Returns how many."""
+    for alias in ("ct", "pt"):
+        _branch_where_clause_description(alias)
+        _date_facts_rules(alias, alias == "pt")
+    _wildcard_rule_description()
+    return (
+        _wildcard_rule_description.cache_info().currsize
+        + _branch_where_clause_description.cache_info().currsize
+        + _date_facts_rules.cache_info().currsize
+    )
+
+
+def build_sql_prompt(user_query: str, state: dict, date_facts: bool = False) -> str:
     # 1. DYNAMIC DATE CALCULATION
     current_date = datetime.now().strftime("%B %d, %Y")
     current_year = datetime.now().strftime("%Y")
@@ -241,6 +276,8 @@ MANDATORY: YOU MUST INCLUDE A `WHERE` CONDITION FOR EVERY SINGLE NON-NONE FILTER
     - STRICT SQL FIX: When using `GROUP BY`, you are FORBIDDEN from using `SELECT *`. Your `SELECT` clause MUST ONLY contain the exact columns in the `GROUP BY`, plus the Metric (Count or Avg). Example: `SELECT company.CompanyName, COUNT({ticket_alias}.TicketID) AS Count FROM...`
     - TOP RESULTS LOGIC: Always append `LIMIT {SUMMARY_LIMIT}` to every summary query to ensure all grouped rows are returned.
 """
+        if date_facts:
+            base_instructions += _date_facts_rules(ticket_alias, is_ppm)
     else:
         base_instructions += f"""
 16. DETAIL MODE (RAW TICKETS): The user wants a raw list of tickets.
@@ -1,6 +1,8 @@
 import json
 from openai import AsyncOpenAI
 from config import settings
+from core.admission import OverloadedError, llm_limiter
+from core.deadline import within_deadline
 
 client = AsyncOpenAI(
     api_key=settings.LLM_API_KEY,
@@ -39,7 +41,8 @@ async def route_user_query(user_prompt: str, active_state: dict = None) -> dict:
       CHITCHAT        — greetings, thanks, goodbye, social pleasantries.
       CONTEXT_QUESTION — question about the currently active filters or visible data
                          (e.g., "Is this from 2025?", "What company is filtered?").
-                         Answered directly from state without a DB round-trip.
+                         Answered from the last result's digest without a DB
+                         round-trip; response_text is the fallback.
       UNSUPPORTED     — HR, payroll, coding help, general web knowledge.
 
     Splitting CHITCHAT and CONTEXT_QUESTION prevents the LLM from writing a
@@ -78,15 +81,18 @@ Output ONLY valid JSON in this exact structure. No extra keys, no markdown:
 }}"""
 
     try:
-        response = await client.chat.completions.create(
-            model=settings.LLM_MODEL,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"User message: {user_prompt}"}
-            ],
-            temperature=0.0,
-            max_tokens=120,  # Router output is a small JSON object — cap tightly
-            response_format={"type": "json_object"}
+        response = await within_deadline(
+            client.chat.completions.create(
+                model=settings.LLM_MODEL,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": f"User message: {user_prompt}"}
+                ],
+                temperature=0.0,
+                max_tokens=120,  # Router output is a small JSON object — cap tightly
+                response_format={"type": "json_object"}
+            ),
+            limiter=llm_limiter,
         )
 
         raw_content = response.choices[0].message.content
@@ -94,20 +100,18 @@ Output ONLY valid JSON in this exact structure. No extra keys, no markdown:
 
         intent = route_info.get("intent", "DATABASE")
 
-        # Normalise CONTEXT_QUESTION — the rest of app.py only checks for
-        # CHITCHAT and UNSUPPORTED to decide whether to short-circuit.
-        # CONTEXT_QUESTION should also short-circuit (it answers from state),
-        # so map it to CHITCHAT for the caller's branching logic.
-        # The response_text will contain the state-aware answer.
-        if intent == "CONTEXT_QUESTION":
-            intent = "CHITCHAT"
-
+        # CONTEXT_QUESTION is passed through as its own intent: app.py first
+        # tries to answer it exactly from the session's last result digest
+        # (ai/context_answerer.py) and only falls back to response_text.
         return {
             "intent": intent,
             "response_text": route_info.get("response_text"),
             "suggested_actions": route_info.get("suggested_actions", [])
         }
 
+    except OverloadedError:
+        raise  # shed the request (503), don't guess the route
+
     except Exception as e:
         print(f"Router Exception: {e}")
         return {
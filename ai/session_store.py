@@ -0,0 +1,224 @@
+"""
+ai/session_store.py
+
+Server-side memory of each conversation, keyed by session_id.
+
+Until now the client sent the whole search state on every request, including
+the ever-growing dismissed_pills list, and the server forgot everything
+between turns. The store keeps, per session:
+
+  - state           the latest search state (the same dict update_state returns)
+  - last_sql        the validated SQL behind the last data result
+  - last_result_id  handle of that result in db/result_store.py
+  - last_digest     compact summary of the last data response (ai/context_answerer.py)
+
+Expiry uses the state's own `last_updated` stamp: a session idle for more
+than SESSION_TTL_SECONDS is gone. Memory is bounded to
+SESSION_STORE_MAX_ENTRIES with LRU eviction. With the "file" backend every
+write also lands on disk. A session evicted from memory, or one from a
+previous process, is then loaded back on the next request.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from config import settings
+
+_SESSION_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+@dataclass
+class SessionRecord:
+    session_id: str
+    state: Dict[str, Any]
+    last_sql: Optional[str] = None
+    last_result_id: Optional[str] = None
+    last_intent: Optional[str] = None
+    last_digest: Optional[Dict[str, Any]] = None
+    updated_at: float = field(default_factory=time.time)
+
+    def touched_at(self) -> float:
+        """Epoch seconds of the state's `last_updated` stamp (falls back to updated_at)."""
+        stamp = (self.state or {}).get("last_updated")
+        if stamp:
+            try:
+                return _utc_iso_to_epoch(str(stamp))
+            except ValueError:
+                pass
+        return self.updated_at
+
+
+def _utc_iso_to_epoch(stamp: str) -> float:
+    # update_state() stamps naive UTC ISO strings (datetime.utcnow().isoformat()).
+    parsed = datetime.fromisoformat(stamp.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        return (parsed - datetime(1970, 1, 1)).total_seconds()
+    return parsed.timestamp()
+
+
+def is_valid_session_id(session_id: Optional[str]) -> bool:
+    return bool(session_id) and bool(_SESSION_ID_RE.match(session_id))
+
+
+# ---------------------------------------------------------------------------
+# PERSISTENCE BACKENDS
+# ---------------------------------------------------------------------------
+
+class MemorySessionBackend:
+    """No persistence — sessions live only in the in-process LRU."""
+
+    def load(self, session_id: str) -> Optional[SessionRecord]:
+        return None
+
+    def save(self, record: SessionRecord) -> None:
+        pass
+
+    def delete(self, session_id: str) -> None:
+        pass
+
+
+class FileSessionBackend:
+    """
+    One JSON file per session under `directory`. Each write goes to a temp
+    file and is then renamed, so a crash never leaves a half-written session.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, session_id: str) -> str:
+        return os.path.join(self.directory, f"{session_id}.json")
+
+    def load(self, session_id: str) -> Optional[SessionRecord]:
+        try:
+            with open(self._path(session_id), encoding="utf-8") as f:
+                return SessionRecord(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def save(self, record: SessionRecord) -> None:
+        path = self._path(record.session_id)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(asdict(record), f, default=str)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f" Failed to persist session {record.session_id}: {e}")
+
+    def delete(self, session_id: str) -> None:
+        try:
+            os.remove(self._path(session_id))
+        except OSError:
+            pass
+
+
+# ---------------------------------------------------------------------------
+# SESSION STORE
+# ---------------------------------------------------------------------------
+
+class SessionStore:
+    """Bounded LRU of SessionRecord with last_updated-driven TTL and a write-through backend."""
+
+    def __init__(self, max_entries: int, ttl_seconds: int, backend):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.backend = backend
+        self._entries: "OrderedDict[str, SessionRecord]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def new_session_id() -> str:
+        return uuid.uuid4().hex
+
+    def get(self, session_id: Optional[str]) -> Optional[SessionRecord]:
+        """Returns the live session, or None if unknown / expired / malformed id."""
+        if not is_valid_session_id(session_id):
+            return None
+
+        with self._lock:
+            record = self._entries.get(session_id)
+            if record is not None:
+                self._entries.move_to_end(session_id)
+
+        if record is None:
+            record = self.backend.load(session_id)
+            if record is None:
+                return None
+            self._remember(record)
+
+        if time.time() - record.touched_at() > self.ttl_seconds:
+            self.delete(session_id)
+            return None
+        return record
+
+    def save(
+        self,
+        session_id: str,
+        state: Optional[Dict[str, Any]],
+        last_sql: Optional[str] = None,
+        last_result_id: Optional[str] = None,
+        last_intent: Optional[str] = None,
+        last_digest: Optional[Dict[str, Any]] = None,
+    ) -> SessionRecord:
+        """
+        Records the latest state for a session. last_sql / last_result_id /
+        last_digest are only replaced when this turn produced a new data
+        result, so a clarification or small-talk turn doesn't lose the
+        previous result.
+        """
+        with self._lock:
+            previous = self._entries.get(session_id)
+        if previous is None:
+            previous = self.backend.load(session_id)
+
+        record = SessionRecord(
+            session_id=session_id,
+            state=state or {},
+            last_sql=last_sql if last_sql else (previous.last_sql if previous else None),
+            last_result_id=last_result_id if last_result_id else (previous.last_result_id if previous else None),
+            last_intent=last_intent if last_sql else (previous.last_intent if previous else None),
+            last_digest=last_digest if last_digest else (previous.last_digest if previous else None),
+        )
+        self._remember(record)
+        self.backend.save(record)
+        return record
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._entries.pop(session_id, None)
+        self.backend.delete(session_id)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries)}
+
+    def _remember(self, record: SessionRecord) -> None:
+        with self._lock:
+            self._entries[record.session_id] = record
+            self._entries.move_to_end(record.session_id)
+            while len(self._entries) > self.max_entries:
+                # Evicted sessions stay on disk (file backend) and reload on demand.
+                self._entries.popitem(last=False)
+
+
+def _build_backend():
+    if settings.SESSION_STORE_BACKEND == "file":
+        return FileSessionBackend(settings.SESSION_STORE_PATH)
+    return MemorySessionBackend()
+
+
+session_store = SessionStore(
+    max_entries=settings.SESSION_STORE_MAX_ENTRIES,
+    ttl_seconds=settings.SESSION_TTL_SECONDS,
+    backend=_build_backend(),
+)
@@ -1,6 +1,9 @@
 import json
+from decimal import Decimal
 from openai import AsyncOpenAI
 from config import settings
+from core.admission import OverloadedError, in_background_work, llm_limiter
+from core.deadline import within_deadline
 
 client = AsyncOpenAI(
     api_key=settings.LLM_API_KEY,
@@ -62,33 +65,83 @@ async def generate_sql(prompt: str) -> str:
     or SQL_GENERATION_FAILED if the API call itself errors out.
     """
     try:
-        response = await client.chat.completions.create(
-            model=settings.LLM_MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "You are a strict MySQL compiler. "
-                        "Output ONLY raw valid SQL. "
-                        "No markdown, no backticks, no explanatory text."
-                    )
-                },
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.0,
-            max_tokens=1500,
-            top_p=1.0
+        response = await within_deadline(
+            client.chat.completions.create(
+                model=settings.LLM_MODEL,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": (
+                            "You are a strict MySQL compiler. "
+                            "Output ONLY raw valid SQL. "
+                            "No markdown, no backticks, no explanatory text."
+                        )
+                    },
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.0,
+                max_tokens=1500,
+                top_p=1.0
+            ),
+            limiter=llm_limiter,
         )
 
         raw_sql = response.choices[0].message.content.strip()
         clean_sql = raw_sql.replace("```sql", "").replace("```", "").strip()
         return clean_sql
 
+    except OverloadedError:
+        raise  # shed the request (503) instead of spending the retry
+
     except Exception as e:
         print(f"LLM SQL Generation Error: {e}")
         return SQL_GENERATION_FAILED
 
 
+# ---------------------------------------------------------------------------
+# TEMPLATE SUMMARY — no LLM call
+# ---------------------------------------------------------------------------
+# Used when the request's deadline leaves too little time for the summary
+# LLM (ai/pipeline.py). Plain facts read off the rows, never an insight.
+
+def _split_columns(row: dict) -> tuple:
+    # MySQL returns SUM / AVG / ROUND results as Decimal.
+    numeric = [k for k, v in row.items() if isinstance(v, (int, float, Decimal)) and not isinstance(v, bool)]
+    labels = [k for k in row if k not in numeric]
+    return labels, numeric
+
+
+def template_summary(raw_data: list, state: dict = None) -> str:
+    domain = (state.get("domain", "") if state else "") or "corporate_tickets"
+    ticket_label = "PPM tickets" if "ppm" in domain.lower() else "corporate tickets"
+    response_type = _classify_response(raw_data, state.get("intent", "detail") if state else "detail")
+
+    if response_type == "EMPTY":
+        return "No records found."
+    if response_type == "DETAIL_LIST":
+        return f"Retrieved {len(raw_data)} {ticket_label}."
+
+    labels, numeric = _split_columns(raw_data[0])
+    if not numeric:
+        return f"Here is the requested data for {ticket_label} ({len(raw_data)} rows)."
+    metric = numeric[-1]
+
+    if response_type == "SINGLE_KPI":
+        row = raw_data[0]
+        prefix = f"{row[labels[0]]}: " if labels else ""
+        return f"{prefix}**{row[metric]}** {ticket_label} ({metric})."
+
+    label = labels[0] if labels else None
+    if response_type == "TIME_TREND" and label:
+        return (
+            f"{metric} for {ticket_label} across **{len(raw_data)}** periods, "
+            f"from {raw_data[0][label]} to {raw_data[-1][label]}."
+        )
+    top = max(raw_data, key=lambda r: r.get(metric) or 0)
+    leader = f" The largest is **{top[label]}** with **{top[metric]}**." if label else ""
+    return f"{metric} for {ticket_label} across **{len(raw_data)}** groups.{leader}"
+
+
 # ---------------------------------------------------------------------------
 # HUMAN SUMMARY — with No-Overpromising Guardrail
 # ---------------------------------------------------------------------------
@@ -222,15 +275,20 @@ CRITICAL BOUNDARIES — YOU MUST FOLLOW THESE OR YOUR RESPONSE IS WRONG:
 
     # ── LLM CALL ──────────────────────────────────────────────────────────
     try:
-        response = await client.chat.completions.create(
-            model=settings.LLM_MODEL,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-            max_tokens=max_tokens
+        response = await within_deadline(
+            client.chat.completions.create(
+                model=settings.LLM_MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.3,
+                max_tokens=max_tokens
+            ),
+            limiter=llm_limiter,
         )
         return response.choices[0].message.content.strip()
 
     except Exception as e:
+        if isinstance(e, OverloadedError) and in_background_work():
+            raise  # a prefetch gives up rather than store the fallback text
         print(f"Summary Generation Error: {e}")
         if raw_data:
             return (
@@ -2,6 +2,8 @@ import json
 from datetime import datetime
 from openai import AsyncOpenAI
 from config import settings
+from core.admission import OverloadedError, llm_limiter
+from core.deadline import within_deadline
 
 client = AsyncOpenAI(
     api_key=settings.LLM_API_KEY,
@@ -96,14 +98,17 @@ The JSON must have these exact keys: intent, domain, company_name, branch_name,
 """
 
     try:
-        response = await client.chat.completions.create(
-            model=settings.LLM_MODEL,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_query}
-            ],
-            temperature=0.0,
-            response_format={"type": "json_object"}
+        response = await within_deadline(
+            client.chat.completions.create(
+                model=settings.LLM_MODEL,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_query}
+                ],
+                temperature=0.0,
+                response_format={"type": "json_object"}
+            ),
+            limiter=llm_limiter,
         )
 
         raw_output = response.choices[0].message.content.strip()
@@ -132,6 +137,9 @@ The JSON must have these exact keys: intent, domain, company_name, branch_name,
 
         return new_state
 
+    except OverloadedError:
+        raise  # shed the request (503), don't run on a stale state
+
     except Exception as e:
         print(f"State Manager Error: {e}")
         fallback_state = current_state.copy()
@@ -1,17 +1,57 @@
+import asyncio
 import time
-from fastapi import FastAPI, BackgroundTasks
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Optional, Tuple
+from fastapi import FastAPI, BackgroundTasks, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.concurrency import run_in_threadpool
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import StreamingResponse
 import uvicorn
 
-from core.schemas import QueryRequest, QueryResponse
+from config import settings
+from core.schemas import (
+    QueryRequest,
+    QueryResponse,
+    ResultPage,
+    RawDataFormat,
+    DashboardRequest,
+    DashboardResponse,
+    DashboardPanel,
+)
+from core.serialization import FastJSONResponse, copy_pre_encoded
+from core.cancellation import ClientDisconnected, run_until_disconnect
+from core.deadline import deadline_scope
+from core.admission import OverloadedError, admission_stats, admit, run_cpu, run_db
+from core.single_flight import db_flight, normalize_query, single_flight_stats, sql_flight, state_flight
+from core.warmup import prime_llm_clients, prime_pool, readiness, run_warmup
+from db.connection import admin_engine, engine
 from rules.input_validator import validate_user_query
-from ai.state_manager import update_state
+from ai.state_manager import update_state, DEFAULT_STATE
+from ai.panel_templates import compile_panel_sql, PANEL_QUESTIONS
+from ai.session_store import session_store
+from ai.prefetcher import prefetcher, state_fingerprint
+from ai.drilldown import drilldown_memory
+from ai.context_answerer import ResultDigest, answer_context_question, build_digest, count_not_in_result
 from ai.pipeline import sql_pipeline, summary_pipeline, DETAIL_PREVIEW_LIMIT
-from db.query_executor import execute_query
+from ai.prompt_builder import warm_prompt_sections
+from ai.router import client as router_client
+from ai.sql_generator import client as sql_client
+from ai.state_manager import client as state_client
+from db.result_cache import result_cache, watermarks
+from db.rollups import rollup_store
+from db.snapshot import snapshot_store
+from db.date_facts import date_facts_sync, prefer_date_facts
+from db.rollup_planner import execute_summary_query
+from db.detail_query import fetch_detail_preview, fetch_detail_page, InvalidCursorError
+from db.result_store import result_store
+from db.summary_totals import fetch_true_totals
+from db.query_exporter import EXPORT_FORMATS, stream_export, try_acquire_export_slot
+from rules.sql_validator import derive_export_sql
 from aggregator.dashboard_aggregator import format_response
+from aggregator.response_formatter import to_raw_data_layout
 from ai.router import route_user_query
-from db.audit_logger import log_query_event
+from db.audit_logger import log_query_event, get_audit_metrics, audit_sink
 from interceptors import (
     check_incomplete_command,
     check_vague_search,
@@ -21,10 +61,86 @@ from interceptors import (
 )
 from aggregator.smart_pills import generate_smart_pills
 
+def start_background_workers():
+    # Rollups, the snapshot and the date facts are checked against the same
+    # watermarks as the result cache.
+    if (
+        settings.RESULT_CACHE_ENABLED or settings.ROLLUPS_ENABLED
+        or settings.SNAPSHOT_ENABLED or settings.DATE_FACTS_ENABLED
+    ):
+        watermarks.start()
+    if settings.ROLLUPS_ENABLED:
+        rollup_store.start()
+    if settings.SNAPSHOT_ENABLED:
+        snapshot_store.start()
+    if settings.DATE_FACTS_ENABLED:
+        date_facts_sync.start()
+
+
+def stop_background_workers():
+    watermarks.stop()
+    rollup_store.stop()
+    snapshot_store.stop()
+    date_facts_sync.stop()
+    # Drain queued audit events before the worker exits.
+    audit_sink.stop()
+
+
+def warm_query_compilers() -> str:
+    """Static prompt sections, and sqlglot's parser/generator via the panel templates."""
+    sections = warm_prompt_sections()
+    compiled = sum(
+        compile_panel_sql(panel, {**DEFAULT_STATE, "domain": domain}) is not None
+        for panel in PANEL_QUESTIONS
+        for domain in ("corporate_tickets", "ppm_tickets")
+    )
+    return f"{sections} prompt sections, {compiled} panel queries"
+
+
+def warmup_plan() -> Tuple[list, list]:
+    """(parallel, sequential) warm-up steps for this configuration."""
+    parallel = [
+        ("analytics_pool", partial(prime_pool, engine, [
+            "SET SESSION TRANSACTION READ ONLY",
+            f"SET SESSION MAX_EXECUTION_TIME={int(settings.QUERY_TIMEOUT_SECONDS) * 1000}",
+        ])),
+        ("admin_pool", partial(prime_pool, admin_engine)),
+        ("query_compilers", warm_query_compilers),
+    ]
+    if settings.WARMUP_LLM_ENABLED:
+        parallel.append(("llm_clients", partial(prime_llm_clients, [router_client, sql_client, state_client])))
+
+    # In-process caches need the pool; rollups need the watermarks first.
+    sequential = []
+    if (
+        settings.RESULT_CACHE_ENABLED or settings.ROLLUPS_ENABLED
+        or settings.SNAPSHOT_ENABLED or settings.DATE_FACTS_ENABLED
+    ):
+        sequential.append(("watermarks", watermarks.poll_once))
+    if settings.ROLLUPS_ENABLED:
+        sequential.append(("rollups", rollup_store.refresh_once))
+    return parallel, sequential
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async def workers_after_warmup():
+        start_background_workers()
+
+    parallel, sequential = warmup_plan()
+    warmup = asyncio.create_task(run_warmup(parallel, sequential, on_done=workers_after_warmup))
+    yield
+    # Fail readiness first so the load balancer drains this instance.
+    readiness.shutting_down = True
+    warmup.cancel()
+    stop_background_workers()
+
+
 app = FastAPI(
     title="Corporate Tickets AI Analytics",
     description="Stateful V4 NL-to-SQL Engine with Guided Agent",
     version="4.3.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -35,10 +151,158 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large JSON payloads (500-row breakdowns) and streamed exports.
+app.add_middleware(GZipMiddleware, minimum_size=settings.RESPONSE_GZIP_MIN_BYTES)
+
+
+@app.exception_handler(OverloadedError)
+async def overloaded_handler(request: Request, exc: OverloadedError):
+    """Load shedding: a fast 503 the client can retry, instead of a slow timeout."""
+    print(f"Shed request: {exc}")
+    return FastJSONResponse(
+        {"status": "error", "summary": "The service is busy. Please retry shortly.", "resource": exc.resource},
+        status_code=503,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving HTTP."""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: 200 only once the startup warm-up has finished."""
+    snapshot = readiness.snapshot()
+    return FastJSONResponse(snapshot, status_code=200 if readiness.is_ready() else 503)
+
+
+@app.get("/api/v1/metrics")
+async def get_metrics():
+    return {
+        "audit": get_audit_metrics(),
+        "result_cache": result_cache.stats(),
+        "sessions": session_store.stats(),
+        "prefetch": prefetcher.stats(),
+        "rollups": rollup_store.stats(),
+        "snapshot": snapshot_store.stats(),
+        "date_facts": date_facts_sync.stats(),
+        "admission": admission_stats(),
+        "single_flight": single_flight_stats(),
+    }
+
 
 @app.post("/api/v1/query", response_model=QueryResponse)
-async def process_query(request: QueryRequest, background_tasks: BackgroundTasks):
+async def process_query(request: QueryRequest, background_tasks: BackgroundTasks, http_request: Request):
+    # Encode directly with the fast serializer. Returning a Response makes
+    # FastAPI skip re-validating the payload against response_model, which
+    # is still declared for the OpenAPI docs.
     start_time = time.time()
+    # Every stage below sizes its timeout from one request deadline.
+    with prefetcher.interactive(), deadline_scope(request.deadline_ms):
+        session_id = resolve_session(request)
+        variant = f"{request.raw_data_format}:{request.include_raw_data}"
+
+        # A pill click the prefetcher already answered costs no LLM or DB work.
+        response = prefetcher.get(request.state, request.query, variant)
+        if response is not None:
+            response = response.model_copy()
+            print(f"Prefetch hit: '{request.query}'")
+            background_tasks.add_task(
+                log_query_event,
+                session_id=session_id,
+                user_id=None,
+                user_query=request.query,
+                turn_count=request.turn_count,
+                intent=(response.state or {}).get("intent", "unknown"),
+                active_domain=(response.state or {}).get("domain", ""),
+                generated_sql="",
+                execution_status="Prefetch_Hit",
+                rows_returned=len(response.raw_data or []),
+                error_message="",
+                execution_time_ms=0,
+            )
+        elif settings.CANCEL_ON_DISCONNECT:
+            # A client that navigates away stops its LLM calls and SQL.
+            try:
+                response = await run_until_disconnect(
+                    http_request,
+                    run_query_pipeline(request, background_tasks),
+                    settings.DISCONNECT_POLL_SECONDS,
+                )
+            except ClientDisconnected as e:
+                print(f"Client disconnected: cancelled '{request.query}' ({len(e.interrupted)} statement(s) killed).")
+                log_query_event(
+                    session_id=session_id,
+                    user_id=None,
+                    user_query=request.query,
+                    turn_count=request.turn_count,
+                    intent=(request.state or {}).get("intent", "unknown"),
+                    active_domain=(request.state or {}).get("domain", ""),
+                    generated_sql="; ".join(e.interrupted),
+                    execution_status="Cancelled_ClientDisconnect",
+                    rows_returned=0,
+                    error_message=str(e),
+                    execution_time_ms=int((time.time() - start_time) * 1000),
+                )
+                # Nobody reads it; 499 ("client closed request") keeps access logs honest.
+                return Response(status_code=499)
+        else:
+            response = await run_query_pipeline(request, background_tasks)
+
+    # Remember this turn server-side; the client only needs the session_id next time.
+    stored = result_store.get(response.result_id) if response.result_id else None
+    digest = build_digest(response, response.state)
+    session_store.save(
+        session_id,
+        state=response.state if response.state is not None else request.state,
+        last_sql=stored.safe_sql if stored else None,
+        last_result_id=response.result_id,
+        last_intent=stored.intent if stored else None,
+        last_digest=digest.to_dict() if digest else None,
+    )
+    response.session_id = session_id
+
+    # After the response is sent, warm the most likely next clicks.
+    if response.status == "success" and response.suggested_actions:
+        async def run_prefetch(pill: str, state: Optional[dict]) -> QueryResponse:
+            prefetch_request = QueryRequest(
+                query=pill,
+                state=state,
+                raw_data_format=request.raw_data_format,
+                include_raw_data=request.include_raw_data,
+            )
+            # Its BackgroundTasks never run: prefetches don't write audit rows.
+            return await run_query_pipeline(prefetch_request, BackgroundTasks())
+
+        background_tasks.add_task(
+            prefetcher.schedule, response.state, response.suggested_actions, run_prefetch, variant
+        )
+    return FastJSONResponse(content=response)
+
+
+def resolve_session(request: QueryRequest) -> str:
+    """
+    Returns the session_id for this request and, when the client relies on
+    the server-side session (no `state` sent), loads the stored state into
+    request.state. Unknown or expired ids start a fresh session.
+    """
+    session = session_store.get(request.session_id)
+    if session is None:
+        request.session_id = session_store.new_session_id()
+        return request.session_id
+
+    if request.state is None:
+        request.state = dict(session.state)
+    return session.session_id
+
+
+async def run_query_pipeline(request: QueryRequest, background_tasks: BackgroundTasks) -> QueryResponse:
+    start_time = time.time()
+    # 0. ADMISSION — shed now (503) rather than queue behind a full resource
+    admit()
     print(f"\n--- New Request: '{request.query}' ---")
     query_lower = request.query.strip().lower()
 
@@ -47,7 +311,7 @@ async def process_query(request: QueryRequest, background_tasks: BackgroundTasks
         exec_time_ms = int((time.time() - start_time) * 1000)
         background_tasks.add_task(
             log_query_event,
-            session_id=None,
+            session_id=request.session_id,
             user_id=None,
             user_query=request.query,
             turn_count=request.turn_count,
@@ -79,10 +343,28 @@ async def process_query(request: QueryRequest, background_tasks: BackgroundTasks
         dispatch_log("Blocked_IncompleteCommand", request.state or {})
         return intercept
 
-    # 3. ROUTER (skipped on fast-pass)
+    # 3. CONTEXT QUESTIONS ("How many did you just fetch?", "Is this from 2025?")
+    # Answered exactly from the session's last result digest — no LLM call.
+    session = session_store.get(request.session_id) if request.session_id else None
+    digest = ResultDigest.from_dict(session.last_digest) if session else None
+    local_answer = answer_context_question(query_lower, digest, request.state, strict=True)
+    if local_answer:
+        dispatch_log("Context_AnsweredLocally", request.state or {})
+        return context_answer_response(local_answer, digest, request.state)
+
+    # 3b. ROUTER (skipped on fast-pass)
     if not is_fast_pass(query_lower, request.query, request.state):
         route_info = await route_user_query(request.query, request.state)
-        if route_info.get("intent") in ["CHITCHAT", "UNSUPPORTED"]:
+        if route_info.get("intent") == "CONTEXT_QUESTION":
+            local_answer = answer_context_question(query_lower, digest, request.state, strict=False)
+            if local_answer:
+                dispatch_log("Context_AnsweredLocally", request.state or {})
+                return context_answer_response(local_answer, digest, request.state)
+            if count_not_in_result(query_lower, digest):
+                # The breakdown on screen has no ticket count to quote: query for it.
+                print("Context question needs a count the last result doesn't carry; running SQL.")
+                route_info = {"intent": "DATABASE"}
+        if route_info.get("intent") in ["CHITCHAT", "CONTEXT_QUESTION", "UNSUPPORTED"]:
             dispatch_log(f"Router_{route_info['intent']}", request.state or {})
             return QueryResponse(
                 status="success",
@@ -101,7 +383,13 @@ async def process_query(request: QueryRequest, background_tasks: BackgroundTasks
         print("Memory wipe: resetting state for fresh search.")
         request.state = None
 
-    new_state = await update_state(request.query, request.state)
+    # Identical concurrent turns (a shared link opened by many) share one call.
+    query_key = normalize_query(request.query)
+    dismissed = tuple(sorted(map(str, (request.state or {}).get("dismissed_pills") or [])))
+    new_state = await state_flight.do(
+        (query_key, state_fingerprint(request.state), dismissed),
+        lambda: update_state(request.query, request.state),
+    )
     print(f"Active State: {new_state}")
     intent = new_state.get("intent", "detail")
 
@@ -111,8 +399,21 @@ async def process_query(request: QueryRequest, background_tasks: BackgroundTasks
         dispatch_log("Blocked_VagueSearch", new_state)
         return intercept
 
+    # 5b. IN-MEMORY DRILL-DOWN
+    # A follow-up that only narrows the previous COMPLETE detail result
+    # ("only the closed ones") is answered by filtering those rows — no SQL
+    # generation, no DB round-trip.
+    derived = drilldown_memory.narrow(request.session_id, new_state)
+    if derived is not None:
+        return await respond_with_derived_rows(request, new_state, derived, query_lower, dispatch_log)
+
     # 6. SQL PIPELINE (prompt -> generate -> validate, with retry)
-    sql_result = await sql_pipeline(request.query, new_state)
+    # Summary prompts read dates from ticket_date_facts while it is current.
+    date_facts = prefer_date_facts(new_state.get("domain"))
+    sql_result = await sql_flight.do(
+        (query_key, state_fingerprint(new_state), date_facts),
+        lambda: sql_pipeline(request.query, new_state, date_facts=date_facts),
+    )
 
     if sql_result.special_response:
         is_security = sql_result.special_response.startswith("I do not have access")
@@ -149,10 +450,49 @@ async def process_query(request: QueryRequest, background_tasks: BackgroundTasks
         )
 
     # 7. DATABASE EXECUTION
+    # DETAIL intent runs a 50-row preview and an exact COUNT(*) concurrently
+    # instead of fetching 500 rows; SUMMARY intent runs the validated SQL as-is.
     print(f"Executing SQL: {sql_result.safe_sql}")
-    is_success, rows, db_error = await run_in_threadpool(execute_query, sql_result.safe_sql)
+    total_count = None
+    result_id = None
+    next_cursor = None
+    if intent == "detail":
+        detail = await db_flight.do(
+            ("detail", sql_result.safe_sql, DETAIL_PREVIEW_LIMIT),
+            lambda: fetch_detail_preview(sql_result.safe_sql, DETAIL_PREVIEW_LIMIT),
+        )
+        is_success, rows, db_error, cache_age = detail.is_success, detail.rows, detail.error, detail.cache_age
+        total_count = detail.total_count
+        next_cursor = detail.next_cursor
+        # Every matching row fit in the preview: keep it for in-memory drill-down.
+        if detail.is_success and next_cursor is None and total_count is not None and total_count <= len(rows):
+            drilldown_memory.remember(
+                request.session_id, new_state, rows, None, data_as_of=time.time() - (cache_age or 0.0)
+            )
+        else:
+            drilldown_memory.forget(request.session_id)
+    else:
+        # Eligible GROUP BY counts are answered from the in-process rollups.
+        is_success, rows, db_error, cache_age = await db_flight.do(
+            ("summary", sql_result.safe_sql),
+            lambda: run_db(execute_summary_query, sql_result.safe_sql),
+        )
+        drilldown_memory.forget(request.session_id)
+    if is_success:
+        # Remember the validated SQL so the client can page past the preview
+        # or export the full result set.
+        result_id = result_store.put(sql_result.safe_sql, intent, total_count)
+        drilldown_memory.set_result_id(request.session_id, result_id)
+    if cache_age:
+        print(f"Result cache hit ({cache_age:.1f}s old).")
     safe_rows = rows if is_success else []
 
+    # A summary that hit the row cap is missing groups — fetch the grand
+    # totals across ALL groups so KPIs and the "Other" bucket stay exact.
+    true_totals = None
+    if intent == "summary" and len(safe_rows) >= settings.MAX_ROWS_LIMIT:
+        true_totals = await run_db(fetch_true_totals, sql_result.safe_sql)
+
     # 8. ZERO DATA INTERCEPT
     if is_success and len(safe_rows) == 0:
         intercept = check_zero_data(safe_rows, new_state, sql_result.safe_sql)
@@ -163,8 +503,7 @@ async def process_query(request: QueryRequest, background_tasks: BackgroundTasks
     # pipeline.py handles:
     #   - response type classification (COMPANY_BREAKDOWN / TIME_TREND / STATUS_DIST / etc.)
     #   - no-overpromising guardrail enforcement
-    #   - honest count messaging for detail queries
-    #   - total_count capture before any row slicing
+    #   - honest count messaging for detail queries (exact total_count)
     summary = await summary_pipeline(
         user_query=request.query,
         safe_rows=safe_rows,
@@ -172,6 +511,7 @@ async def process_query(request: QueryRequest, background_tasks: BackgroundTasks
         is_success=is_success,
         db_error=db_error,
         row_count=len(safe_rows),
+        total_count=total_count,
     )
 
     # 10. ROW LIMIT STRATEGY
@@ -180,10 +520,11 @@ async def process_query(request: QueryRequest, background_tasks: BackgroundTasks
     #   Every company/status must appear in the chart/table.
     #   Showing only 50 of 200 companies = hiding data. Not acceptable.
     #
-    # DETAIL intent → send only the 50 most recent rows to the frontend.
+    # DETAIL intent → only the 50 most recent rows were fetched at all.
     #   The summary text already tells the user the full count honestly:
     #   "Found 312 tickets. Showing the 50 most recent — add a filter to narrow down."
     #   The smart pills will push the user to refine rather than scroll 312 rows.
+    #   The slice below is a guard in case the preview derivation fell back.
     if intent == "detail" and len(safe_rows) > DETAIL_PREVIEW_LIMIT:
         display_rows = safe_rows[:DETAIL_PREVIEW_LIMIT]
         print(f"Detail preview: showing {DETAIL_PREVIEW_LIMIT} of {len(safe_rows)} rows.")
@@ -201,13 +542,22 @@ async def process_query(request: QueryRequest, background_tasks: BackgroundTasks
     )
 
     # 12. FORMAT & RETURN
-    final_payload = format_response(
+    # Aggregation over up to MAX_ROWS_LIMIT rows runs off the event loop.
+    final_payload = await run_cpu(
+        format_response,
         intent=intent,
         rows=display_rows,          # correctly sliced: all rows for summary, 50 for detail
         summary_text=summary.text,
         state=new_state,
         suggested_actions=final_pills,
         limit_reached=summary.limit_reached,
+        cache_age_seconds=cache_age,
+        total_count=summary.total_count if intent == "detail" else None,
+        result_id=result_id,
+        next_cursor=next_cursor,
+        raw_data_format=request.raw_data_format,
+        include_raw_data=request.include_raw_data,
+        true_totals=true_totals,
     )
 
     if not is_success:
@@ -219,5 +569,249 @@ async def process_query(request: QueryRequest, background_tasks: BackgroundTasks
     return final_payload
 
 
+def context_answer_response(answer: str, digest: ResultDigest, state: Optional[dict]) -> QueryResponse:
+    """A context question answered from the digest; the previous pills stay on offer."""
+    return QueryResponse(
+        status="success",
+        summary=answer,
+        suggested_actions=digest.suggested_actions,
+        charts=[],
+        raw_data=[],
+        insight="CONTEXT_QUESTION",
+        state=state,
+    )
+
+
+async def respond_with_derived_rows(request, new_state, derived, query_lower, dispatch_log) -> QueryResponse:
+    """Steps 9–12 for a result filtered in memory from the previous turn's rows."""
+    print(f"Drill-down in memory: {derived.description} -> {len(derived.rows)} rows")
+    if not derived.rows:
+        dispatch_log("Zero_Data_SmartFallback", new_state, sql=f"[derived] {derived.description}")
+        return check_zero_data(derived.rows, new_state, "")
+
+    # Still the complete result for the narrower state — allow further narrowing.
+    drilldown_memory.remember(
+        request.session_id, new_state, derived.rows, derived.source_result_id, data_as_of=derived.data_as_of
+    )
+
+    summary = await summary_pipeline(
+        user_query=request.query,
+        safe_rows=derived.rows,
+        new_state=new_state,
+        is_success=True,
+        db_error=None,
+        row_count=len(derived.rows),
+        total_count=len(derived.rows),
+    )
+    final_pills = generate_smart_pills("detail", new_state, query_lower, total_count=len(derived.rows))
+    final_payload = format_response(
+        intent="detail",
+        rows=derived.rows,
+        summary_text=summary.text,
+        state=new_state,
+        suggested_actions=final_pills,
+        limit_reached=False,
+        cache_age_seconds=derived.age_seconds,
+        total_count=len(derived.rows),
+        raw_data_format=request.raw_data_format,
+        include_raw_data=request.include_raw_data,
+        derived_from=derived.source_result_id,
+    )
+    dispatch_log("Success_DerivedInMemory", new_state, sql=f"[derived] {derived.description}", rows=len(derived.rows))
+    print("--- Request Complete ---\n")
+    return final_payload
+
+
+@app.post("/api/v1/dashboard", response_model=DashboardResponse)
+async def build_dashboard(request: DashboardRequest, background_tasks: BackgroundTasks):
+    """
+    Computes several summary panels (status / company / branch / trend) for
+    one search state in a single round-trip.
+
+    Each panel's SQL is compiled from the state by ai/panel_templates.py, so
+    no LLM call is needed. The LLM SQL pipeline is used only for a panel whose
+    filters can't be templated. All panel queries run concurrently on the
+    pool through the result cache.
+    """
+    start_time = time.time()
+    state = {**DEFAULT_STATE, **(request.state or {}), "intent": "summary"}
+    panel_types = list(dict.fromkeys(request.panels))  # drop duplicates, keep order
+
+    results = await asyncio.gather(
+        *(build_dashboard_panel(panel, state, request) for panel in panel_types)
+    )
+
+    panels = []
+    for panel, safe_sql in results:
+        panels.append(panel)
+        background_tasks.add_task(
+            log_query_event,
+            session_id=None,
+            user_id=None,
+            user_query=f"[dashboard:{panel.panel}]",
+            turn_count=0,
+            intent="summary",
+            active_domain=state.get("domain", ""),
+            generated_sql=safe_sql,
+            execution_status="Dashboard_Success" if panel.status == "success" else "Dashboard_Error",
+            rows_returned=0,
+            error_message=panel.error or "",
+            execution_time_ms=int((time.time() - start_time) * 1000),
+        )
+
+    status = "success" if all(p.status == "success" for p in panels) else "partial"
+    return FastJSONResponse(content=DashboardResponse.model_construct(
+        status=status,
+        state=state,
+        panels=panels,
+    ))
+
+
+async def build_dashboard_panel(
+    panel: str,
+    state: dict,
+    request: DashboardRequest,
+) -> Tuple[DashboardPanel, str]:
+    """Compiles, runs and formats one dashboard panel. Returns (panel, safe_sql)."""
+    sql_source = "template"
+    date_facts = prefer_date_facts(state.get("domain"))
+    safe_sql = compile_panel_sql(panel, state, date_facts=date_facts)
+
+    if safe_sql is None:
+        # Filters the templates can't express (e.g. timeframe "Q3") — ask the LLM.
+        sql_source = "llm"
+        sql_result = await sql_flight.do(
+            (normalize_query(PANEL_QUESTIONS[panel]), state_fingerprint(state), date_facts),
+            lambda: sql_pipeline(PANEL_QUESTIONS[panel], state, date_facts=date_facts),
+        )
+        if not sql_result.safe_sql:
+            error = sql_result.special_response or sql_result.error or "Could not build this panel."
+            return DashboardPanel(panel=panel, status="error", sql_source=sql_source, error=error), ""
+        safe_sql = sql_result.safe_sql
+
+    is_success, rows, db_error, cache_age = await db_flight.do(
+        ("summary", safe_sql), lambda: run_db(execute_summary_query, safe_sql)
+    )
+    if not is_success:
+        return DashboardPanel(panel=panel, status="error", sql_source=sql_source, error=str(db_error)), safe_sql
+
+    limit_reached = len(rows) >= settings.MAX_ROWS_LIMIT
+    true_totals = await run_db(fetch_true_totals, safe_sql) if limit_reached else None
+
+    formatted = await run_cpu(
+        format_response,
+        intent="summary",
+        rows=rows,
+        summary_text="",
+        state=state,
+        limit_reached=limit_reached,
+        cache_age_seconds=cache_age,
+        result_id=result_store.put(safe_sql, "summary", None),
+        raw_data_format=request.raw_data_format,
+        include_raw_data=request.include_raw_data,
+        true_totals=true_totals,
+    )
+    return copy_pre_encoded(formatted, DashboardPanel.model_construct(
+        panel=panel,
+        status="success",
+        sql_source=sql_source,
+        kpis=formatted.kpis,
+        charts=formatted.charts,
+        raw_data=formatted.raw_data,
+        raw_data_format=formatted.raw_data_format,
+        columns=formatted.columns,
+        data_as_of=formatted.data_as_of,
+        cache_age_seconds=formatted.cache_age_seconds,
+        result_id=formatted.result_id,
+        error=None,
+    )), safe_sql
+
+
+@app.get("/api/v1/query/{result_id}/page", response_model=ResultPage)
+async def get_result_page(
+    result_id: str,
+    cursor: str = Query(..., description="next_cursor from the previous response or page"),
+    page_size: Optional[int] = Query(default=None, ge=1, description="Rows per page"),
+    raw_data_format: RawDataFormat = Query(default="records", description="'records', 'rows' or 'columns'"),
+):
+    """
+    Keyset-paginated continuation of a detail result. Each page is derived
+    from the stored validated SQL and seeks past the cursor's (date, ID), so
+    deep pages cost the same as the first one.
+    """
+    stored = result_store.get(result_id)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Result not found or expired. Please re-run the query.")
+
+    size = min(page_size or DETAIL_PREVIEW_LIMIT, settings.DETAIL_PAGE_MAX_SIZE)
+    try:
+        page = await fetch_detail_page(stored.safe_sql, cursor, size)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not page.is_success:
+        return ResultPage(status="error", result_id=result_id, error=page.error)
+
+    raw_data, columns = to_raw_data_layout(page.rows, raw_data_format)
+    return FastJSONResponse(content=ResultPage.model_construct(
+        status="success",
+        result_id=result_id,
+        raw_data=raw_data,
+        raw_data_format=raw_data_format,
+        columns=columns,
+        next_cursor=page.next_cursor,
+        error=None,
+    ))
+
+
+@app.get("/api/v1/query/{result_id}/export")
+async def export_result(
+    result_id: str,
+    fmt: str = Query(default="csv", alias="format", pattern="^(csv|ndjson)$"),
+):
+    """
+    Streams the full result set behind result_id as CSV or NDJSON, re-validated
+    with the separate EXPORT_MAX_ROWS cap and read through a server-side cursor.
+    """
+    stored = result_store.get(result_id)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Result not found or expired. Please re-run the query.")
+
+    validation = derive_export_sql(stored.safe_sql, stored.intent, settings.EXPORT_MAX_ROWS)
+    if not validation["is_valid"]:
+        raise HTTPException(status_code=400, detail=validation["error"])
+
+    slot = try_acquire_export_slot()
+    if slot is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many exports are running. Please try again shortly.",
+            headers={"Retry-After": "30"},
+        )
+
+    start_time = time.time()
+
+    def on_finish(status: str, rows: int, error: str):
+        log_query_event(
+            session_id=None,
+            user_id=None,
+            user_query=f"[export:{fmt}] {result_id}",
+            turn_count=0,
+            intent=stored.intent,
+            active_domain="",
+            generated_sql=validation["safe_sql"],
+            execution_status=status,
+            rows_returned=rows,
+            error_message=error,
+            execution_time_ms=int((time.time() - start_time) * 1000),
+        )
+
+    return StreamingResponse(
+        stream_export(validation["safe_sql"], fmt, slot, on_finish=on_finish),
+        media_type=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="tickets_{result_id[:8]}.{fmt}"'},
+    )
+
+
 if __name__ == "__main__":
     uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,105 @@
+"""
+benchmarks/aggregator_benchmark.py
+
+Times the aggregator (chart selection + KPI cards) on synthetic summary
+results of 500 and 5,000 rows for the 2-column (bar/line) and 3-column
+(stacked bar) shapes.
+
+"legacy" is the per-call scan the aggregator used before the column
+profiler: chart selection and each KPI re-walk the row dicts and type-check
+every value. "profiled" is format_response as it is now. Both end in the
+same build_response call. The count rows are not like for like: the legacy
+path sent every label, the current one folds all but the top CHART_TOP_N
+into "Other", and for stacked bars it also does the pivot that used to be
+left to React.
+
+Run from the repo root:
+    python -m benchmarks.aggregator_benchmark
+"""
+
+import random
+import timeit
+from decimal import Decimal
+
+from aggregator.chart_selector import _looks_like_date, _make_title
+from aggregator.dashboard_aggregator import format_response
+from aggregator.response_formatter import build_response
+from core.schemas import KPI, ChartData
+
+STATUSES = ["Open", "Closed", "Pending", "In Progress", "Cancelled", "Assigned"]
+
+
+def _two_col(n: int) -> list:
+    return [{"CompanyName": f"Company {i}", "Count": random.randint(1, 5000)} for i in range(n)]
+
+
+def _two_col_decimal(n: int) -> list:
+    return [{"BranchSite": f"Branch {i}", "AvgDaysToClose": Decimal(f"{random.randint(0, 90)}.{random.randint(0, 9)}")} for i in range(n)]
+
+
+def _three_col(n: int) -> list:
+    return [
+        {"CompanyName": f"Company {i // len(STATUSES)}", "CurrentStatus": STATUSES[i % len(STATUSES)], "Count": random.randint(1, 500)}
+        for i in range(n)
+    ]
+
+
+def _is_number(val) -> bool:
+    return isinstance(val, (int, float, Decimal))
+
+
+def _legacy_format(rows: list, state: dict):
+    """The pre-profiler per-call scan, kept here as the baseline."""
+    sample = rows[0]
+    columns = list(sample.keys())
+    charts = []
+    if len(columns) == 2:
+        col1, col2 = columns
+        label_col, value_col = (col1, col2) if _is_number(sample[col2]) else (col2, col1)
+        labels = [str(row[label_col]) for row in rows]
+        values = [row[value_col] for row in rows]
+        chart_type = "line" if _looks_like_date(sample[label_col]) else ("pie" if len(rows) <= 5 else "bar")
+        charts.append(ChartData(type=chart_type, title=_make_title(label_col, state), labels=labels,
+                                values=values, x_key=label_col, y_key=value_col))
+    elif len(columns) == 3 and _is_number(sample[columns[2]]):
+        col1, col2, col3 = columns
+        labels = list({str(row[col1]) for row in rows})
+        charts.append(ChartData(type="stacked_bar", title=_make_title(f"{col1} by {col2}", state), labels=labels,
+                                values=[], x_key=col1, series_key=col2, y_key=col3))
+
+    total = len(rows)
+    for col in columns:
+        if col.lower() in ("count", "total"):
+            total = int(sum(row[col] for row in rows if _is_number(row.get(col))))
+            break
+    kpis = [KPI(label="Total Tickets", value=total)]
+    if len(columns) == 2:
+        col1, col2 = columns
+        value_col = col2 if _is_number(sample[col2]) else (col1 if _is_number(sample[col1]) else None)
+        if value_col and value_col.lower() not in ("count", "total"):
+            total_val = sum(row[value_col] for row in rows if _is_number(row.get(value_col)))
+            kpis.append(KPI(label=f"Total {value_col.replace('_', ' ').title()}", value=round(total_val, 1)))
+
+    return build_response(intent="summary", rows=rows, summary_text="Here are your results.", kpis=kpis,
+                          charts=charts, state=state, suggested_actions=[])
+
+
+def _best_ms(call, loops: int) -> float:
+    return min(timeit.repeat(call, number=loops, repeat=5)) / loops * 1000
+
+
+def main():
+    random.seed(7)
+    state = {"intent": "summary", "domain": "corporate_tickets"}
+    print(f"{'shape':<24}{'rows':>7}{'legacy ms':>11}{'profiled ms':>13}")
+    for name, builder in (("company count", _two_col), ("branch avg (Decimal)", _two_col_decimal), ("company x status", _three_col)):
+        for n in (500, 5000):
+            rows = builder(n)
+            loops = 50 if n == 500 else 10
+            legacy = _best_ms(lambda: _legacy_format(rows, state), loops)
+            profiled = _best_ms(lambda: format_response("summary", rows, state=state), loops)
+            print(f"{name:<24}{n:>7}{legacy:>11.3f}{profiled:>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
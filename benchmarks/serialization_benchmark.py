@@ -0,0 +1,112 @@
+"""
+benchmarks/serialization_benchmark.py
+
+Compares the old response path (validated QueryResponse → response_model
+re-validation → JSONResponse) with the fast path (model_construct →
+FastJSONResponse / orjson) on synthetic detail and summary payloads. The
+"render ms" column is the event-loop share of the fast path once the
+chart/KPI blocks were pre-encoded by the formatter.
+
+Run from the repo root:
+    python -m benchmarks.serialization_benchmark
+"""
+
+import gzip
+import json
+import random
+import timeit
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from core.schemas import QueryResponse, KPI, ChartData
+from core.serialization import FastJSONResponse, pre_encode
+from aggregator.response_formatter import to_raw_data_layout
+
+STATUSES = ["Open", "Closed", "Pending", "In Progress", "Cancelled"]
+
+
+def _detail_rows(n: int) -> list:
+    base = datetime(2025, 1, 1)
+    return [
+        {
+            "TicketID": f"CT-{100000 + i}",
+            "CompanyName": f"Company {i % 37}",
+            "BranchSite": f"Branch {i % 113}",
+            "Type": random.choice(["AMC", "R&M", "Supply"]),
+            "Service": random.choice(["Electrician", "CCTV", "Plumbing"]),
+            "Price": Decimal(f"{random.randint(100, 99999)}.{random.randint(0, 99):02d}"),
+            "CurrentStatus": random.choice(STATUSES),
+            "Priority": random.choice(["High", "Medium", "Low"]),
+            "CreatedDate": (base + timedelta(days=i % 365)).date(),
+            "UpdatedAt": base + timedelta(minutes=i * 7),
+        }
+        for i in range(n)
+    ]
+
+
+def _summary_rows(n: int) -> list:
+    return [{"CompanyName": f"Company {i}", "Count": random.randint(1, 5000)} for i in range(n)]
+
+
+def _parts(rows: list, intent: str) -> dict:
+    kpis = [KPI(label="Total Tickets", value=len(rows))]
+    charts = []
+    if intent == "summary":
+        charts.append(ChartData(
+            type="bar",
+            title="Tickets by Company",
+            labels=[r["CompanyName"] for r in rows],
+            values=[r["Count"] for r in rows],
+        ))
+    return dict(
+        status="success", summary="Benchmark payload.", kpis=kpis, charts=charts,
+        raw_data=rows, suggested_actions=["Breakdown by Status"], state={"intent": intent},
+    )
+
+
+def old_path(parts: dict) -> bytes:
+    response = QueryResponse(**parts)                              # aggregator construction
+    validated = QueryResponse.model_validate(response.model_dump())  # response_model check
+    return json.dumps(validated.model_dump(mode="json"), ensure_ascii=False,
+                      separators=(",", ":")).encode("utf-8")       # JSONResponse.render
+
+
+def fast_path(parts: dict) -> bytes:
+    return FastJSONResponse(content=QueryResponse.model_construct(**parts)).body
+
+
+def render_pre_encoded(response: QueryResponse) -> bytes:
+    return FastJSONResponse(content=response).body
+
+
+def main():
+    random.seed(7)
+    print(
+        f"{'payload':<16}{'layout':<9}{'old ms':>9}{'fast ms':>9}{'render ms':>11}"
+        f"{'speedup':>9}{'bytes':>10}{'gzip':>9}"
+    )
+    for intent, builder in (("detail", _detail_rows), ("summary", _summary_rows)):
+        for n in (50, 500):
+            rows = builder(n)
+            for layout in ("records", "columns"):
+                raw_data, columns = to_raw_data_layout(rows, layout)
+                parts = _parts(rows, intent)
+                parts.update(raw_data=raw_data, raw_data_format=layout, columns=columns)
+
+                loops = 200 if n == 50 else 40
+                old_ms = min(timeit.repeat(lambda: old_path(parts), number=loops, repeat=3)) / loops * 1000
+                fast_ms = min(timeit.repeat(lambda: fast_path(parts), number=loops, repeat=3)) / loops * 1000
+                response = pre_encode(QueryResponse.model_construct(**parts))
+                render_ms = min(
+                    timeit.repeat(lambda: render_pre_encoded(response), number=loops, repeat=3)
+                ) / loops * 1000
+                body = fast_path(parts)
+                assert render_pre_encoded(response) == body
+                print(
+                    f"{intent + ' ' + str(n):<16}{layout:<9}{old_ms:>9.3f}{fast_ms:>9.3f}{render_ms:>11.3f}"
+                    f"{old_ms / fast_ms:>8.1f}x{len(body):>10}{len(gzip.compress(body)):>9}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -24,7 +24,132 @@ class Settings:
     MAX_ROWS_LIMIT = int(os.getenv("MAX_ROWS_LIMIT", 500))
     QUERY_TIMEOUT_SECONDS = int(os.getenv("QUERY_TIMEOUT_SECONDS", 15))
     MAX_CLARIFICATION_TURNS = int(os.getenv("MAX_CLARIFICATION_TURNS", 10))
+
+    # End-to-end /query budget (core/deadline.py); clients may ask for less via deadline_ms
+    REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", 30))
+    LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", 20))
+    DEADLINE_MIN_STAGE_SECONDS = float(os.getenv("DEADLINE_MIN_STAGE_SECONDS", 0.5))
+    SUMMARY_MIN_BUDGET_SECONDS = float(os.getenv("SUMMARY_MIN_BUDGET_SECONDS", 2.0))
+
+    # Admission control (core/admission.py): concurrent slots and bounded wait queues per resource
+    LLM_MAX_CONCURRENT = int(os.getenv("LLM_MAX_CONCURRENT", 8))
+    LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", 32))
+    DB_MAX_CONCURRENT = int(os.getenv("DB_MAX_CONCURRENT", 15))  # analytics pool_size + max_overflow
+    DB_MAX_QUEUE = int(os.getenv("DB_MAX_QUEUE", 60))
+    CPU_MAX_CONCURRENT = int(os.getenv("CPU_MAX_CONCURRENT", 4))
+    CPU_MAX_QUEUE = int(os.getenv("CPU_MAX_QUEUE", 32))
+    ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", 5))
+
+    # Coalesce identical in-flight state/SQL/DB work across requests (core/single_flight.py)
+    SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+
+    # Stop a /query request's LLM calls and MySQL statement when its client disconnects
+    CANCEL_ON_DISCONNECT = os.getenv("CANCEL_ON_DISCONNECT", "true").lower() == "true"
+    DISCONNECT_POLL_SECONDS = float(os.getenv("DISCONNECT_POLL_SECONDS", 0.5))
+    # Connect/read timeout of the one-off connection that sends KILL QUERY
+    KILL_QUERY_TIMEOUT_SECONDS = int(os.getenv("KILL_QUERY_TIMEOUT_SECONDS", 3))
+
+    # Audit Log Sink (batched background writer)
+    AUDIT_QUEUE_MAX = int(os.getenv("AUDIT_QUEUE_MAX", 5000))
+    AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", 100))
+    AUDIT_FLUSH_INTERVAL_MS = int(os.getenv("AUDIT_FLUSH_INTERVAL_MS", 1000))
+    AUDIT_SPILL_PATH = os.getenv("AUDIT_SPILL_PATH", "audit_spill.jsonl")
+
+    # Response Serialization
+    RESPONSE_GZIP_MIN_BYTES = int(os.getenv("RESPONSE_GZIP_MIN_BYTES", 2048))
+
+    # Chart Shaping — categorical charts keep the top N labels and fold the
+    # long tail into a single "Other" bucket
+    CHART_TOP_N = int(os.getenv("CHART_TOP_N", 15))
+    # Line charts: gap-filled trends are re-bucketed / downsampled to this many points
+    TIME_SERIES_MAX_POINTS = int(os.getenv("TIME_SERIES_MAX_POINTS", 120))
+
+    # Detail Result Pagination
+    RESULT_STORE_MAX_ENTRIES = int(os.getenv("RESULT_STORE_MAX_ENTRIES", 2000))
+    RESULT_STORE_TTL_SECONDS = int(os.getenv("RESULT_STORE_TTL_SECONDS", 3600))
+    DETAIL_PAGE_MAX_SIZE = int(os.getenv("DETAIL_PAGE_MAX_SIZE", 200))
+
+    # Full Result Export (streamed, separate cap from interactive queries)
+    EXPORT_MAX_ROWS = int(os.getenv("EXPORT_MAX_ROWS", 200000))
+    EXPORT_TIMEOUT_SECONDS = int(os.getenv("EXPORT_TIMEOUT_SECONDS", 120))
+    EXPORT_MAX_CONCURRENT = int(os.getenv("EXPORT_MAX_CONCURRENT", 2))
+    EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", 1000))
+
+    # Server-side Session Store ("memory" or "file")
+    SESSION_STORE_BACKEND = os.getenv("SESSION_STORE_BACKEND", "memory").lower()
+    SESSION_STORE_PATH = os.getenv("SESSION_STORE_PATH", "sessions")
+    SESSION_STORE_MAX_ENTRIES = int(os.getenv("SESSION_STORE_MAX_ENTRIES", 5000))
+    SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", 1800))
+
+    # In-memory drill-down: sessions whose last complete detail result is kept
+    DRILLDOWN_MAX_SESSIONS = int(os.getenv("DRILLDOWN_MAX_SESSIONS", 1000))
+
+    # Context questions answered from the last result's digest (chart labels kept per chart)
+    CONTEXT_DIGEST_MAX_LABELS = int(os.getenv("CONTEXT_DIGEST_MAX_LABELS", 20))
+
+    # Smart-pill Prefetch (background, lower priority than interactive requests)
+    PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "true").lower() == "true"
+    PREFETCH_MAX_PILLS = int(os.getenv("PREFETCH_MAX_PILLS", 2))
+    PREFETCH_MAX_CONCURRENT = int(os.getenv("PREFETCH_MAX_CONCURRENT", 2))
+    PREFETCH_MAX_INTERACTIVE = int(os.getenv("PREFETCH_MAX_INTERACTIVE", 4))
+    PREFETCH_STORE_MAX_ENTRIES = int(os.getenv("PREFETCH_STORE_MAX_ENTRIES", 500))
+    PREFETCH_TTL_SECONDS = int(os.getenv("PREFETCH_TTL_SECONDS", 120))
+    PREFETCH_TIMEOUT_SECONDS = int(os.getenv("PREFETCH_TIMEOUT_SECONDS", 30))
+
+    # Query Result Cache
+    RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+    RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+    RESULT_CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", 300))
+    # MAX(ID) is polled every WATERMARK_POLL_SECONDS (an index seek). COUNT(*)
+    # scans a whole index, so it runs only when MAX(ID) moves or every
+    # WATERMARK_COUNT_POLL_SECONDS, which bounds how late a delete is noticed.
+    WATERMARK_POLL_SECONDS = int(os.getenv("WATERMARK_POLL_SECONDS", 10))
+    WATERMARK_COUNT_POLL_SECONDS = int(os.getenv("WATERMARK_COUNT_POLL_SECONDS", 300))
+    # Tables whose MAX(ID)/row count is polled to invalidate cached results.
+    # Status changes land in corporate_ticket_status_history as new rows, so
+    # its watermark also catches updates to existing corporate tickets.
+    WATERMARK_TABLES = [
+        "corporate_tickets",
+        "ppm_tickets",
+        "corporate_ticket_status_history",
+    ]
     
+    # In-process Rollups for summary intent (refreshed from the table watermarks)
+    ROLLUPS_ENABLED = os.getenv("ROLLUPS_ENABLED", "true").lower() == "true"
+    # In-place UPDATEs (Status, Priority, ...) move no watermark: only a full
+    # rebuild picks them up. A rollup older than ROLLUP_MAX_AGE_SECONDS is not
+    # served — the same update-staleness bound as a result cache entry's TTL.
+    # Inserts are merged incrementally between full rebuilds.
+    ROLLUP_REBUILD_SECONDS = int(os.getenv("ROLLUP_REBUILD_SECONDS", 240))
+    ROLLUP_MAX_AGE_SECONDS = int(os.getenv("ROLLUP_MAX_AGE_SECONDS", RESULT_CACHE_TTL_SECONDS))
+    ROLLUP_MIN_REBUILD_SECONDS = int(os.getenv("ROLLUP_MIN_REBUILD_SECONDS", 60))
+    ROLLUP_BUILD_TIMEOUT_SECONDS = int(os.getenv("ROLLUP_BUILD_TIMEOUT_SECONDS", 120))
+    ROLLUP_MAX_GROUPS = int(os.getenv("ROLLUP_MAX_GROUPS", 200000))
+
+    # Local Columnar Snapshot (Parquet + DuckDB; needs the optional duckdb/pyarrow packages)
+    SNAPSHOT_ENABLED = os.getenv("SNAPSHOT_ENABLED", "false").lower() == "true"
+    SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "./snapshots")
+    SNAPSHOT_REFRESH_SECONDS = int(os.getenv("SNAPSHOT_REFRESH_SECONDS", 900))
+    # Summary panels may be served from a snapshot this old even after the tables moved
+    SNAPSHOT_MAX_STALENESS_SECONDS = int(os.getenv("SNAPSHOT_MAX_STALENESS_SECONDS", 1800))
+    SNAPSHOT_EXPORT_TIMEOUT_SECONDS = int(os.getenv("SNAPSHOT_EXPORT_TIMEOUT_SECONDS", 600))
+    SNAPSHOT_EXPORT_CHUNK_ROWS = int(os.getenv("SNAPSHOT_EXPORT_CHUNK_ROWS", 20000))
+
+    # Typed Date Shadow Table (ticket_date_facts; created and synced on the admin pool)
+    DATE_FACTS_ENABLED = os.getenv("DATE_FACTS_ENABLED", "false").lower() == "true"
+    DATE_FACTS_SYNC_SECONDS = int(os.getenv("DATE_FACTS_SYNC_SECONDS", 60))
+    DATE_FACTS_BATCH_ROWS = int(os.getenv("DATE_FACTS_BATCH_ROWS", 5000))
+    # ID-range batches re-checked per cycle for changed dates and deleted tickets
+    DATE_FACTS_SWEEP_BATCHES = int(os.getenv("DATE_FACTS_SWEEP_BATCHES", 4))
+
+    # Startup warm-up (lifespan) gating /readyz
+    WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+    WARMUP_LLM_ENABLED = os.getenv("WARMUP_LLM_ENABLED", "true").lower() == "true"
+    WARMUP_STEP_TIMEOUT_SECONDS = int(os.getenv("WARMUP_STEP_TIMEOUT_SECONDS", 20))
+
+    # Offline index advisor (python -m db.index_advisor)
+    INDEX_ADVISOR_MAX_LOG_ROWS = int(os.getenv("INDEX_ADVISOR_MAX_LOG_ROWS", 50000))
+
     # V3 Security Whitelist (Finance/Quotation Removed, PPM Added)
     ALLOWED_TABLES = [
         # Corporate Core
@@ -50,6 +175,9 @@ class Settings:
         "branch_assets",
         "employees"
     ]
+    # The typed date shadow table is only queryable once it is maintained.
+    if DATE_FACTS_ENABLED:
+        ALLOWED_TABLES = ALLOWED_TABLES + ["ticket_date_facts"]
 
 settings = Settings()
 
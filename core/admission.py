@@ -0,0 +1,191 @@
+"""
+core/admission.py
+
+Per-resource concurrency limits with bounded wait queues and load shedding.
+
+Nothing used to bound concurrent work. LLM calls fanned out until the
+provider answered 429, and every DB call queued on AnyIO's shared 40-thread
+limiter in front of a 15-connection pool, so under a spike every request
+got slower until they all timed out together.
+
+Each scarce resource now has a ResourceLimiter:
+  - llm: concurrent LLM calls (core/deadline.py within_deadline());
+  - db:  DB work on the threadpool (run_db); sized to the analytics pool,
+         pool_size + max_overflow;
+  - cpu: response formatting on the threadpool (run_cpu), so aggregating
+         large results can't stall the event loop or wait behind DB threads.
+db + cpu stay below AnyIO's thread limit, so the threadpool itself never
+becomes the queue.
+
+A caller waits at most ADMISSION_MAX_WAIT_SECONDS (less if the request
+deadline is closer) behind at most <RESOURCE>_MAX_QUEUE other waiters.
+Past either bound it gets OverloadedError, which app.py turns into a 503
+with Retry-After. admit() sheds a new /query request up front when any
+queue is already full, before it spends LLM calls it could never finish.
+
+Background work (prefetches, ai/prefetcher.py) runs under background_work().
+It only takes a slot that is free right now and never queues, so it can't
+sit in front of interactive requests in a wait queue or push them into
+shed_queue_full. The prefetcher also stops scheduling while any limiter has
+waiters (has_waiters()).
+"""
+
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from config import settings
+from core.deadline import remaining_budget
+
+
+# True inside background work: take a free slot or none, never queue.
+_background: ContextVar[bool] = ContextVar("background_work", default=False)
+
+
+class OverloadedError(Exception):
+    """A resource's wait queue is full or the wait ran out. Maps to HTTP 503."""
+
+    def __init__(self, resource: str, retry_after: int):
+        super().__init__(f"{resource} is overloaded; retry in {retry_after}s")
+        self.resource = resource
+        self.retry_after = retry_after
+
+
+class ResourceLimiter:
+    """
+    An asyncio semaphore with a bounded queue and wait-time metrics. Only
+    used from the event loop, so the counters need no lock.
+    """
+
+    # Weight of the newest sample in the average hold time (Retry-After estimate)
+    _HOLD_EWMA_ALPHA = 0.2
+
+    def __init__(self, name: str, limit: int, max_queue: int, max_wait_seconds: float):
+        self.name = name
+        self.limit = max(1, limit)
+        self.max_queue = max(0, max_queue)
+        self.max_wait_seconds = max_wait_seconds
+        self._semaphore = asyncio.Semaphore(self.limit)
+        self._in_use = 0
+        self._waiting = 0
+        self._hold_seconds = 0.0
+        self._metrics: Dict[str, Any] = {
+            "admitted": 0, "queued": 0, "shed_admission": 0, "shed_queue_full": 0, "shed_wait_timeout": 0,
+            "shed_background": 0,
+            "wait_ms_total": 0.0, "wait_ms_max": 0.0,
+        }
+
+    def saturated(self) -> bool:
+        return self._in_use >= self.limit and self._waiting >= self.max_queue
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue has probably drained."""
+        estimate = self._hold_seconds * (self._waiting + 1) / self.limit
+        return min(60, max(1, math.ceil(estimate)))
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._metrics)
+        queued = stats.pop("queued")
+        wait_ms_total = stats.pop("wait_ms_total")
+        stats["wait_ms_avg"] = round(wait_ms_total / queued, 1) if queued else 0.0
+        stats["wait_ms_max"] = round(stats["wait_ms_max"], 1)
+        stats.update(limit=self.limit, in_use=self._in_use, waiting=self._waiting, queued=queued)
+        return stats
+
+    def _shed(self, metric: str) -> OverloadedError:
+        self._metrics[metric] += 1
+        return OverloadedError(self.name, self.retry_after())
+
+    @asynccontextmanager
+    async def slot(self, max_wait: Optional[float] = None):
+        """Holds one unit of the resource for the block. Raises OverloadedError."""
+        if self._in_use >= self.limit or self._waiting:
+            if _background.get():
+                raise self._shed("shed_background")
+            if self._waiting >= self.max_queue:
+                raise self._shed("shed_queue_full")
+            max_wait = min(self.max_wait_seconds, max_wait if max_wait is not None else self.max_wait_seconds)
+            self._waiting += 1
+            self._metrics["queued"] += 1
+            started = time.monotonic()
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), max_wait)
+            except asyncio.TimeoutError:
+                raise self._shed("shed_wait_timeout")
+            finally:
+                self._waiting -= 1
+                waited_ms = (time.monotonic() - started) * 1000
+                self._metrics["wait_ms_total"] += waited_ms
+                self._metrics["wait_ms_max"] = max(self._metrics["wait_ms_max"], waited_ms)
+        else:
+            await self._semaphore.acquire()  # free: returns without suspending
+
+        self._metrics["admitted"] += 1
+        self._in_use += 1
+        held_from = time.monotonic()
+        try:
+            yield
+        finally:
+            self._in_use -= 1
+            self._semaphore.release()
+            held = time.monotonic() - held_from
+            self._hold_seconds += self._HOLD_EWMA_ALPHA * (held - self._hold_seconds)
+
+
+llm_limiter = ResourceLimiter(
+    "llm", settings.LLM_MAX_CONCURRENT, settings.LLM_MAX_QUEUE, settings.ADMISSION_MAX_WAIT_SECONDS
+)
+db_limiter = ResourceLimiter(
+    "db", settings.DB_MAX_CONCURRENT, settings.DB_MAX_QUEUE, settings.ADMISSION_MAX_WAIT_SECONDS
+)
+cpu_limiter = ResourceLimiter(
+    "cpu", settings.CPU_MAX_CONCURRENT, settings.CPU_MAX_QUEUE, settings.ADMISSION_MAX_WAIT_SECONDS
+)
+LIMITERS = (llm_limiter, db_limiter, cpu_limiter)
+
+
+@contextmanager
+def background_work():
+    """Marks the block (and tasks it starts) as background work that never queues."""
+    token = _background.set(True)
+    try:
+        yield
+    finally:
+        _background.reset(token)
+
+
+def in_background_work() -> bool:
+    return _background.get()
+
+
+def has_waiters() -> bool:
+    """True while any interactive caller is queued for a resource."""
+    return any(limiter._waiting for limiter in LIMITERS)
+
+
+def admit() -> None:
+    """Sheds a new request up front when any resource's queue is already full."""
+    for limiter in LIMITERS:
+        if limiter.saturated():
+            raise limiter._shed("shed_admission")
+
+
+async def run_db(func: Callable[..., Any], *args: Any) -> Any:
+    """run_in_threadpool() for DB work, behind the db limiter."""
+    async with db_limiter.slot(remaining_budget(settings.ADMISSION_MAX_WAIT_SECONDS)):
+        return await run_in_threadpool(func, *args)
+
+
+async def run_cpu(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """run_in_threadpool() for CPU-bound formatting, behind the cpu limiter."""
+    async with cpu_limiter.slot(remaining_budget(settings.ADMISSION_MAX_WAIT_SECONDS)):
+        return await run_in_threadpool(func, *args, **kwargs)
+
+
+def admission_stats() -> Dict[str, Dict[str, Any]]:
+    return {limiter.name: limiter.stats() for limiter in LIMITERS}
@@ -0,0 +1,147 @@
+"""
+core/cancellation.py
+
+Stops the backend work of a /query request whose client has gone away.
+
+A user who clicks another pill mid-request abandons the first one, but
+nothing told the server: every remaining LLM call still ran, and the
+statement on the pool kept its connection busy until MAX_EXECUTION_TIME.
+
+run_until_disconnect() runs the pipeline as a task and polls the ASGI
+receive channel every DISCONNECT_POLL_SECONDS. On disconnect it:
+  1. cancels the request's CancelScope — statements already running are
+     interrupted (MySQL: KILL QUERY on a one-off connection, DuckDB: interrupt)
+     and any statement not yet started raises RequestCancelled instead;
+  2. cancels the pipeline task, which aborts the awaited LLM HTTP calls;
+  3. raises ClientDisconnected so the endpoint can audit the cancellation.
+
+The scope travels in a ContextVar. asyncio tasks and run_in_threadpool()
+both copy the context, so execute_query() on a worker thread finds the
+scope of the request that called it; prefetches and background workers
+run outside any scope and are never cancelled.
+"""
+
+import asyncio
+import threading
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+
+class RequestCancelled(Exception):
+    """Raised when a statement is about to start for an already-cancelled request."""
+
+
+class ClientDisconnected(Exception):
+    """Raised by run_until_disconnect() after the request's work was cancelled."""
+
+    def __init__(self, interrupted: List[str]):
+        super().__init__(f"client disconnected; {len(interrupted)} statement(s) interrupted")
+        self.interrupted = interrupted
+
+
+class CancelScope:
+    """The in-flight statements of one request, and whether it was cancelled."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._sequence = 0
+        # key -> (label, interrupt, per-statement lock held while interrupting)
+        self._inflight: Dict[int, Tuple[str, Callable[[], None], threading.Lock]] = {}
+        self.interrupted: List[str] = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    @contextmanager
+    def track(self, label: str, interrupt: Callable[[], None]):
+        """
+        Registers a running statement. `interrupt` is called from another
+        thread on cancel. Leaving the block waits for an interrupt of this
+        statement in progress, so a MySQL connection can't go back to the
+        pool (and start another request's statement) before its KILL QUERY
+        lands.
+        """
+        statement_lock = threading.Lock()
+        with self._lock:
+            if self._cancelled:
+                raise RequestCancelled("Request was cancelled: the client disconnected.")
+            self._sequence += 1
+            key = self._sequence
+            self._inflight[key] = (label, interrupt, statement_lock)
+        try:
+            yield
+        finally:
+            with statement_lock, self._lock:
+                self._inflight.pop(key, None)
+
+    def cancel(self) -> List[str]:
+        """
+        Interrupts every in-flight statement. Blocking (network round-trips),
+        but only each statement's own lock is held during its interrupt.
+        """
+        with self._lock:
+            self._cancelled = True
+            inflight = list(self._inflight.items())
+        for key, (label, interrupt, statement_lock) in inflight:
+            with statement_lock:
+                with self._lock:
+                    if key not in self._inflight:
+                        continue  # finished in the meantime
+                try:
+                    interrupt()
+                except Exception as e:
+                    print(f"Cancel: could not interrupt statement: {e}")
+                    continue
+            with self._lock:
+                self.interrupted.append(label)
+        with self._lock:
+            return list(self.interrupted)
+
+
+current_scope: ContextVar[Optional[CancelScope]] = ContextVar("cancel_scope", default=None)
+
+
+def cancel_requested() -> bool:
+    scope = current_scope.get()
+    return scope is not None and scope.cancelled
+
+
+def cancellable(label: str, interrupt: Callable[[], None]):
+    """scope.track() for the current request, or a no-op outside one."""
+    scope = current_scope.get()
+    return scope.track(label, interrupt) if scope is not None else nullcontext()
+
+
+async def run_until_disconnect(http_request: Any, work: Awaitable[Any], poll_seconds: float) -> Any:
+    """
+    Awaits `work` in its own CancelScope. Raises ClientDisconnected if the
+    client disconnects first.
+    """
+    scope = CancelScope()
+
+    async def scoped():
+        current_scope.set(scope)  # task-local: the task runs in a copied context
+        return await work
+
+    task = asyncio.create_task(scoped())
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_seconds)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                break
+    except asyncio.CancelledError:
+        # The endpoint itself was cancelled (server shutdown): take the pipeline with it.
+        task.cancel()
+        raise
+
+    interrupted = await run_in_threadpool(scope.cancel)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    raise ClientDisconnected(interrupted)
@@ -0,0 +1,119 @@
+"""
+core/deadline.py
+
+One end-to-end time budget per /query request.
+
+Each stage used to have its own limit, or none: the LLM calls had no
+timeout (the SDK default is ten minutes, with retries), MySQL had its fixed
+QUERY_TIMEOUT_SECONDS, and the summary only fell back to a template after
+an exception. The worst case was the sum of all of them.
+
+process_query() now starts a Deadline (REQUEST_DEADLINE_SECONDS, or the
+client's shorter `deadline_ms`) and every stage sizes itself from what is
+left:
+  - LLM calls (router, state manager, SQL generation, summary) are awaited
+    through within_deadline(), capped per call by LLM_TIMEOUT_SECONDS. The
+    cap includes the SDK's own retries and the wait for an LLM slot. Each
+    stage already has a fallback for a failed call, and a timeout takes the
+    same path;
+  - execute_query() sets MAX_EXECUTION_TIME to the remaining budget when it
+    is shorter than QUERY_TIMEOUT_SECONDS, and refuses to start a statement
+    once less than DEADLINE_MIN_STAGE_SECONDS is left;
+  - summary_pipeline() uses a template instead of the LLM when less than
+    SUMMARY_MIN_BUDGET_SECONDS is left.
+
+The deadline lives in a ContextVar, like the cancel scope, so it reaches
+execute_query() on the threadpool without changing any signatures. Work
+outside a request (prefetches, background workers) has no deadline and
+keeps the fixed limits.
+"""
+
+import asyncio
+import inspect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Awaitable, Optional
+
+from config import settings
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a stage has too little of the request's budget left to start or finish."""
+
+
+@dataclass
+class Deadline:
+    budget_seconds: float
+    # time.monotonic() value at which the budget runs out
+    expires_at: float
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        return cls(seconds, time.monotonic() + seconds)
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+
+current_deadline: ContextVar[Optional[Deadline]] = ContextVar("request_deadline", default=None)
+
+
+def request_deadline(client_deadline_ms: Optional[int] = None) -> Deadline:
+    """The server budget, shortened (never lengthened) by the client's `deadline_ms`."""
+    budget = float(settings.REQUEST_DEADLINE_SECONDS)
+    if client_deadline_ms is not None:
+        budget = min(budget, client_deadline_ms / 1000)
+    return Deadline.after(budget)
+
+
+@contextmanager
+def deadline_scope(client_deadline_ms: Optional[int] = None):
+    """Runs the block (and the tasks/threads it starts) under a fresh request deadline."""
+    token = current_deadline.set(request_deadline(client_deadline_ms))
+    try:
+        yield current_deadline.get()
+    finally:
+        current_deadline.reset(token)
+
+
+def remaining_budget(default: float) -> float:
+    """Seconds left in the current request, or `default` outside one."""
+    deadline = current_deadline.get()
+    return default if deadline is None else min(default, deadline.remaining())
+
+
+def stage_timeout(cap: float) -> float:
+    """
+    Timeout for a stage that may take up to `cap` seconds. Raises
+    DeadlineExceeded when too little of the request's budget is left.
+    """
+    timeout = remaining_budget(cap)
+    if timeout < settings.DEADLINE_MIN_STAGE_SECONDS:
+        raise DeadlineExceeded(f"request deadline reached ({timeout:.2f}s left)")
+    return timeout
+
+
+async def within_deadline(awaitable: Awaitable[Any], cap: Optional[float] = None, limiter: Any = None) -> Any:
+    """
+    Awaits an LLM call for at most LLM_TIMEOUT_SECONDS and the request's
+    remaining budget. With a `limiter` (core/admission.py) the call first
+    queues for a slot; the queue wait counts against the same budget.
+    """
+    cap = cap if cap is not None else settings.LLM_TIMEOUT_SECONDS
+    try:
+        if limiter is None:
+            return await _await_within(awaitable, stage_timeout(cap))
+        async with limiter.slot(stage_timeout(cap)):
+            return await _await_within(awaitable, stage_timeout(cap))
+    finally:
+        if inspect.iscoroutine(awaitable):
+            awaitable.close()  # no-op once awaited; avoids "never awaited" when refused
+
+
+async def _await_within(awaitable: Awaitable[Any], timeout: float) -> Any:
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(f"LLM call exceeded its {timeout:.1f}s budget")
@@ -1,5 +1,11 @@
-from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional, Union
+from pydantic import BaseModel, Field, PrivateAttr
+from typing import List, Dict, Any, Optional, Union, Literal
+
+# raw_data layouts a client can negotiate:
+#   records — [{"col": val, ...}, ...]           (default, column names on every row)
+#   rows    — [[val, ...], ...] + columns        (row tuples, names sent once)
+#   columns — [[col1 vals], [col2 vals]] + columns (one value list per column)
+RawDataFormat = Literal["records", "rows", "columns"]
 
 # -------------------------------------------------------------------
 # REQUEST SCHEMAS (What React sends to the backend)
@@ -9,15 +15,43 @@ class QueryRequest(BaseModel):
     turn_count: int = Field(default=0, description="Tracks clarification loops to enforce the max 1 turn limit")
     # Accepts the current search state from React
     state: Optional[Dict[str, Any]] = Field(default=None, description="The current active JSON search state")
+    raw_data_format: RawDataFormat = Field(default="records", description="Layout of raw_data in the response: 'records', 'rows' or 'columns'")
+    # Charts are self-contained (stacked bars arrive pre-pivoted), so a client that
+    # only draws the charts can skip the row payload for summary results.
+    include_raw_data: bool = Field(default=True, description="Set False to omit raw_data from charted summary responses")
+    # With a session_id the server remembers the state; `state` can then be omitted
+    session_id: Optional[str] = Field(default=None, description="Server-side session handle returned by a previous response")
+    # Can only shorten the server's REQUEST_DEADLINE_SECONDS, never extend it
+    deadline_ms: Optional[int] = Field(default=None, ge=1, description="Client time budget for this request in milliseconds")
+
+# Standard dashboard panels (SQL templates live in ai/panel_templates.py)
+PanelType = Literal["status", "company", "branch", "trend"]
+
+class DashboardRequest(BaseModel):
+    state: Dict[str, Any] = Field(default_factory=dict, description="Active search state shared by every panel")
+    panels: List[PanelType] = Field(default=["status", "company", "trend"], min_length=1, description="Panels to compute")
+    raw_data_format: RawDataFormat = Field(default="records", description="Layout of each panel's raw_data")
+    # Dashboards only draw charts, so rows are omitted unless asked for
+    include_raw_data: bool = Field(default=False, description="Include each panel's rows in raw_data")
 
 # -------------------------------------------------------------------
 # RESPONSE SCHEMAS (What the backend sends to React)
 # -------------------------------------------------------------------
+class ChartSeries(BaseModel):
+    name: str
+    values: List[Union[int, float]]  # One value per ChartData label, 0 where the cell is missing
+
 class ChartData(BaseModel):
-    type: str = Field(..., description="'pie', 'bar', or 'line'")
+    type: str = Field(..., description="'pie', 'bar', 'line' or 'stacked_bar'")
     title: str
     labels: List[str]
     values: List[Union[int, float]]
+    # Source column names, so React knows which axis is which
+    x_key: Optional[str] = None
+    y_key: Optional[str] = None
+    series_key: Optional[str] = None
+    # stacked_bar only: dense series matrix aligned with `labels`
+    series: Optional[List[ChartSeries]] = None
 
 class KPI(BaseModel):
     label: str
@@ -28,7 +62,9 @@ class QueryResponse(BaseModel):
     summary: str = Field(..., description="Executive summary or error/clarification message")
     kpis: List[KPI] = []
     charts: List[ChartData] = []
-    raw_data: List[Dict[str, Any]] = []  # Array of row dictionaries
+    raw_data: Union[List[Dict[str, Any]], List[List[Any]]] = []  # Row dicts, or lists for rows/columns layouts
+    raw_data_format: RawDataFormat = "records"
+    columns: Optional[List[str]] = Field(default=None, description="Column names for the 'rows' and 'columns' layouts")
     insight: Optional[str] = None
     
     # Used ONLY if status is 'clarification_required'
@@ -38,4 +74,53 @@ class QueryResponse(BaseModel):
     suggested_actions: List[str] = Field(default=[], description="Clickable quick-reply buttons for the user")
     
     # Returns the updated search state to React
-    state: Optional[Dict[str, Any]] = Field(default=None, description="The newly updated JSON search state")
\ No newline at end of file
+    state: Optional[Dict[str, Any]] = Field(default=None, description="The newly updated JSON search state")
+
+    # Freshness of raw_data — lets the UI show "as of HH:MM" for cached results
+    data_as_of: Optional[str] = Field(default=None, description="ISO UTC timestamp of when the rows were read from the database")
+    cache_age_seconds: Optional[float] = Field(default=None, description="0 for a fresh read, otherwise age of the cached result")
+
+    # Handle for /api/v1/query/{result_id}/page (detail) and /export (any intent)
+    result_id: Optional[str] = Field(default=None, description="Handle for paging (detail) or exporting the full result")
+    next_cursor: Optional[str] = Field(default=None, description="Opaque cursor for the next page; null when there are no more rows")
+
+    # Set when raw_data was derived in memory from an earlier result rather than queried
+    derived_from: Optional[str] = Field(default=None, description="result_id of the result this one was filtered from")
+
+    # Send back on the next request instead of the full state
+    session_id: Optional[str] = Field(default=None, description="Server-side session handle")
+
+    # JSON of the kpis/charts blocks, encoded once (core/serialization.pre_encode)
+    _encoded: Dict[str, bytes] = PrivateAttr(default_factory=dict)
+
+
+class ResultPage(BaseModel):
+    status: str = Field(..., description="'success' or 'error'")
+    result_id: str
+    raw_data: Union[List[Dict[str, Any]], List[List[Any]]] = []
+    raw_data_format: RawDataFormat = "records"
+    columns: Optional[List[str]] = None
+    next_cursor: Optional[str] = Field(default=None, description="Opaque cursor for the next page; null on the last page")
+    error: Optional[str] = None
+
+class DashboardPanel(BaseModel):
+    panel: str
+    status: str = Field(..., description="'success' or 'error'")
+    sql_source: str = Field(..., description="'template' (no LLM) or 'llm' (fallback)")
+    kpis: List[KPI] = []
+    charts: List[ChartData] = []
+    raw_data: Union[List[Dict[str, Any]], List[List[Any]]] = []
+    raw_data_format: RawDataFormat = "records"
+    columns: Optional[List[str]] = None
+    data_as_of: Optional[str] = None
+    cache_age_seconds: Optional[float] = None
+    result_id: Optional[str] = None
+    error: Optional[str] = None
+
+    _encoded: Dict[str, bytes] = PrivateAttr(default_factory=dict)
+
+
+class DashboardResponse(BaseModel):
+    status: str = Field(..., description="'success' if every panel succeeded, otherwise 'partial'")
+    state: Dict[str, Any]
+    panels: List[DashboardPanel]
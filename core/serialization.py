@@ -0,0 +1,127 @@
+"""
+core/serialization.py
+
+Fast JSON path for QueryResponse.
+
+Returning a Pydantic model from a FastAPI route with response_model set means
+the whole payload — including up to 500 raw_data rows of Decimal / datetime
+values straight from MySQL — is validated and serialized again on the way out.
+Once LLM calls are cached that re-walk dominates CPU time per request.
+
+This module encodes the response directly with orjson (stdlib json as a
+fallback if orjson is missing):
+  - raw_data rows are passed to the encoder by reference, never copied or
+    re-validated.
+  - Types orjson doesn't know natively (Decimal, timedelta, bytes) fall back
+    to pydantic_core's own JSON conversion, so the wire format is identical
+    to what response_model produced before (e.g. Decimal → "12.50").
+  - The chart and KPI blocks are pre-encoded by pre_encode() when the
+    response is assembled (aggregator/response_formatter.py, on the CPU
+    threadpool) and spliced into the body as bytes. Rendering on the event
+    loop then only encodes raw_data and the scalar fields, and a prefetched
+    response or a dashboard panel reuses the bytes instead of dumping the
+    KPI/ChartData models again.
+
+Compression above RESPONSE_GZIP_MIN_BYTES is handled by GZipMiddleware in
+app.py so it applies uniformly to every route.
+"""
+
+import json
+from typing import Any, Dict, Iterable
+
+from fastapi.responses import Response
+from pydantic import BaseModel
+from pydantic_core import to_jsonable_python
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+
+def _default(val: Any) -> Any:
+    return to_jsonable_python(val)
+
+
+def dumps(obj: Any) -> bytes:
+    """Encodes `obj` to compact JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+# Response fields holding lists of small models that are encoded up front
+PRE_ENCODED_FIELDS = ("kpis", "charts")
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, list) and value and isinstance(value[0], BaseModel):
+        return [item.model_dump() for item in value]
+    return value
+
+
+def model_to_payload(model: BaseModel) -> Dict[str, Any]:
+    """
+    Shallow conversion of a response model to a plain dict.
+
+    Nested models (KPI, ChartData) are small and are dumped normally; plain
+    containers such as raw_data and state are passed through untouched.
+    """
+    return {name: _plain(getattr(model, name)) for name in type(model).model_fields}
+
+
+def _pre_encoded(model: BaseModel) -> Dict[str, bytes]:
+    # Only models declaring the `_encoded` private attribute carry blocks.
+    return getattr(model, "_encoded", None) or {}
+
+
+def _has_pre_encoded_items(value: Any) -> bool:
+    return isinstance(value, list) and bool(value) and isinstance(value[0], BaseModel) and bool(_pre_encoded(value[0]))
+
+
+def pre_encode(model: BaseModel, fields: Iterable[str] = PRE_ENCODED_FIELDS) -> BaseModel:
+    """
+    Encodes the model's chart/KPI blocks now, so render() splices the bytes
+    in. The fields must not be reassigned afterwards.
+    """
+    encoded = model._encoded
+    for name in fields:
+        encoded[name] = dumps(_plain(getattr(model, name)))
+    return model
+
+
+def copy_pre_encoded(source: BaseModel, target: BaseModel) -> BaseModel:
+    """Reuses `source`'s pre-encoded blocks for `target` (built from the same kpis/charts)."""
+    target._encoded.update(_pre_encoded(source))
+    return target
+
+
+def encode_model(model: BaseModel) -> bytes:
+    """JSON for a response model, with any pre-encoded blocks spliced in as-is."""
+    encoded = _pre_encoded(model)
+    fields = type(model).model_fields
+    nested = {name for name in fields if _has_pre_encoded_items(getattr(model, name))}
+    if not encoded and not nested:
+        return dumps(model_to_payload(model))
+
+    parts = []
+    for name in fields:
+        if name in encoded:
+            body = encoded[name]
+        elif name in nested:  # e.g. dashboard panels
+            body = b"[" + b",".join(encode_model(item) for item in getattr(model, name)) + b"]"
+        else:
+            body = dumps(_plain(getattr(model, name)))
+        parts.append(dumps(name) + b":" + body)
+    return b"{" + b",".join(parts) + b"}"
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return encode_model(content)
+        return dumps(content)
@@ -0,0 +1,127 @@
+"""
+core/single_flight.py
+
+Coalesces identical in-flight work: concurrent callers with the same key
+await one shared computation instead of each repeating it.
+
+A shared dashboard link opened by many people at once sends the same
+(query, state) to /query many times within a second. Before the first
+answer lands nothing is cached yet, so every copy made the same state and
+SQL LLM calls and ran the same statement. app.py now routes three stages
+through a SingleFlight:
+  - state:  update_state(), keyed on the normalized query + full input state;
+  - sql:    sql_pipeline(), keyed on the query + answer-relevant new state;
+  - db:     the DB stage, keyed on the validated SQL (and fetch shape).
+
+Semantics:
+  - The first caller (leader) starts the work as its own task; later
+    callers with the same key (followers) await that task. An exception
+    is delivered to every waiter; nothing is remembered once the task
+    finishes — the result cache and prefetcher are the caches.
+  - Waiters are reference-counted and await through asyncio.shield(). A
+    waiter that is cancelled (client disconnect, core/cancellation.py)
+    only drops its reference. The shared work is cancelled when the LAST
+    waiter leaves: the task is cancelled and its statements interrupted.
+  - The shared task runs in a copy of the leader's context with its own
+    CancelScope, so the leader's disconnect can't KILL a query that other
+    requests are waiting on. It keeps the leader's deadline, so only
+    requests with the same deadline budget share work: the budget is part
+    of the key. A client sending deadline_ms=500 then coalesces with other
+    500 ms requests, and never makes a default-deadline request take the
+    DeadlineExceeded fallbacks. A follower sharing the budget started no
+    earlier than the leader, so the leader's deadline is never shorter
+    than its own.
+  - With copy_result, each waiter gets a deep copy (states and SQLResults
+    are mutated downstream). Rows from the DB stage are shared read-only,
+    as result-cache hits already are.
+"""
+
+import asyncio
+import contextvars
+import copy
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from config import settings
+from core.cancellation import CancelScope, current_scope
+from core.deadline import current_deadline
+
+
+@dataclass
+class _Call:
+    task: "asyncio.Task[Any]"
+    scope: CancelScope
+    waiters: int = 0
+
+
+class SingleFlight:
+    def __init__(self, name: str, copy_result: bool = False):
+        self.name = name
+        self.copy_result = copy_result
+        self._calls: Dict[Hashable, _Call] = {}
+        self._metrics: Dict[str, int] = {"leaders": 0, "followers": 0, "errors": 0, "abandoned": 0}
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._metrics, "in_flight": len(self._calls)}
+
+    async def do(self, key: Hashable, work: Callable[[], Awaitable[Any]]) -> Any:
+        """Result of `work()`, shared with every concurrent caller using the same key."""
+        if not settings.SINGLE_FLIGHT_ENABLED:
+            return await work()
+
+        deadline = current_deadline.get()
+        key = (None if deadline is None else deadline.budget_seconds, key)
+        call = self._calls.get(key)
+        if call is None:
+            call = self._start(key, work)
+            self._metrics["leaders"] += 1
+        else:
+            self._metrics["followers"] += 1
+
+        call.waiters += 1
+        try:
+            result = await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                self._abandon(key, call)
+        return copy.deepcopy(result) if self.copy_result else result
+
+    def _start(self, key: Hashable, work: Callable[[], Awaitable[Any]]) -> _Call:
+        scope = CancelScope()
+        context = contextvars.copy_context()
+        context.run(current_scope.set, scope)
+        task = asyncio.get_running_loop().create_task(work(), context=context)
+        call = _Call(task, scope)
+        self._calls[key] = call
+        task.add_done_callback(lambda done: self._finish(key, call, done))
+        return call
+
+    def _finish(self, key: Hashable, call: _Call, task: "asyncio.Task[Any]") -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        # Retrieve the exception even when every waiter has already left.
+        if not task.cancelled() and task.exception() is not None:
+            self._metrics["errors"] += 1
+
+    def _abandon(self, key: Hashable, call: _Call) -> None:
+        """Every waiter left: stop the shared work. A new caller starts afresh."""
+        self._metrics["abandoned"] += 1
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        call.task.cancel()
+        # KILL QUERY is a blocking round-trip; don't hold up the leaving waiter.
+        asyncio.get_running_loop().run_in_executor(None, call.scope.cancel)
+
+
+def normalize_query(query: Optional[str]) -> str:
+    return " ".join((query or "").lower().split())
+
+
+state_flight = SingleFlight("state", copy_result=True)
+sql_flight = SingleFlight("sql", copy_result=True)
+db_flight = SingleFlight("db")
+
+
+def single_flight_stats() -> Dict[str, Dict[str, int]]:
+    return {flight.name: flight.stats() for flight in (state_flight, sql_flight, db_flight)}
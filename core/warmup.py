@@ -0,0 +1,147 @@
+"""
+core/warmup.py
+
+Startup warm-up and the readiness state behind /readyz.
+
+After a deploy, the first requests on a new instance used to pay for work
+that could have happened before traffic arrived:
+  - SQLAlchemy creates its engines at import but opens no connections, so
+    each of the first queries paid a TCP + MySQL auth handshake;
+  - the AsyncOpenAI clients connect lazily, so the first LLM call of each
+    client paid DNS + TLS;
+  - prompt text and sqlglot's parser/generator were built on first use;
+  - the watermarks and rollups were empty until their first background pass.
+
+The lifespan hook in app.py runs a list of warm-up steps once at startup,
+each bounded by WARMUP_STEP_TIMEOUT_SECONDS. A step that fails or times out
+is recorded and the warm-up moves on: a cold pool is slower, not broken.
+`readiness` flips to ready only when every step has finished, so a load
+balancer polling /readyz keeps traffic on the old instances until then.
+/healthz is plain liveness and answers immediately.
+"""
+
+import asyncio
+import time
+from contextlib import ExitStack
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import text
+
+from config import settings
+
+
+@dataclass
+class WarmupStep:
+    name: str
+    ok: bool
+    elapsed_ms: int
+    detail: str = ""
+
+
+class Readiness:
+    """Whether this instance has finished warming up and isn't shutting down."""
+
+    def __init__(self):
+        self.ready = False
+        self.shutting_down = False
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.steps: List[WarmupStep] = []
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "status": "ready" if self.is_ready() else ("shutting_down" if self.shutting_down else "warming_up"),
+            "warmup_ms": (
+                int((self.finished_at - self.started_at) * 1000)
+                if self.started_at and self.finished_at else None
+            ),
+            "steps": [asdict(step) for step in self.steps],
+        }
+
+    def is_ready(self) -> bool:
+        return self.ready and not self.shutting_down
+
+
+readiness = Readiness()
+
+
+# ---------------------------------------------------------------------------
+# STEPS
+# ---------------------------------------------------------------------------
+
+def prime_pool(engine, session_statements: Iterable[str] = ()) -> str:
+    """
+    Opens every `pool_size` connection at once so the pool keeps them, runs
+    the session statements the request path would run on each, then returns
+    them all to the pool.
+    """
+    if engine is None:
+        raise RuntimeError("engine is not initialized")
+    size = engine.pool.size()
+    with ExitStack() as stack:
+        for _ in range(size):
+            connection = stack.enter_context(engine.connect())
+            for statement in session_statements:
+                connection.execute(text(statement))
+            connection.execute(text("SELECT 1"))
+    return f"{size} connections"
+
+
+async def prime_llm_clients(clients: Iterable[Any]) -> str:
+    """
+    One authenticated, cheap request per AsyncOpenAI client (models.list).
+    Each client owns its own HTTP pool, so each needs its own TLS handshake.
+    """
+    unique = list({id(c): c for c in clients}.values())
+    await asyncio.gather(*(client.models.list() for client in unique))
+    return f"{len(unique)} clients"
+
+
+# ---------------------------------------------------------------------------
+# RUNNER
+# ---------------------------------------------------------------------------
+
+Step = Tuple[str, Callable[[], Any]]
+
+
+async def _run_step(name: str, step: Callable[[], Any]) -> WarmupStep:
+    started = time.perf_counter()
+    try:
+        if asyncio.iscoroutinefunction(step):
+            detail = await asyncio.wait_for(step(), settings.WARMUP_STEP_TIMEOUT_SECONDS)
+        else:
+            # A timed-out sync step keeps running in its thread; it is only
+            # no longer waited for.
+            detail = await asyncio.wait_for(run_in_threadpool(step), settings.WARMUP_STEP_TIMEOUT_SECONDS)
+        ok, detail = True, str(detail or "")
+    except asyncio.TimeoutError:
+        ok, detail = False, f"timed out after {settings.WARMUP_STEP_TIMEOUT_SECONDS}s"
+    except Exception as e:
+        ok, detail = False, str(e)
+    result = WarmupStep(name, ok, int((time.perf_counter() - started) * 1000), detail)
+    print(f" Warm-up {name}: {'ok' if ok else 'FAILED'} in {result.elapsed_ms} ms {detail}".rstrip())
+    return result
+
+
+async def run_warmup(
+    parallel: List[Step],
+    sequential: List[Step],
+    on_done: Optional[Callable[[], Awaitable[None]]] = None,
+) -> None:
+    """
+    Runs the independent `parallel` steps concurrently, then `sequential`
+    in order (steps that need a warm pool), then `on_done`, and marks the
+    instance ready.
+    """
+    readiness.started_at = time.time()
+    if settings.WARMUP_ENABLED:
+        readiness.steps.extend(await asyncio.gather(*(_run_step(n, s) for n, s in parallel)))
+        for name, step in sequential:
+            readiness.steps.append(await _run_step(name, step))
+    if on_done is not None:
+        await on_done()
+    readiness.finished_at = time.time()
+    readiness.ready = True
+    print(f" Warm-up finished in {int((readiness.finished_at - readiness.started_at) * 1000)} ms; instance is ready.")
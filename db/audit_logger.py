@@ -1,5 +1,299 @@
-import pymysql
+"""
+db/audit_logger.py
+
+Batched, pooled writer for the `ai_audit_logs` table.
+
+Previously every request opened a brand-new pymysql connection, inserted one
+row, committed and closed — a full TCP + auth handshake per query. Events now
+go into a bounded in-memory queue and a single background thread flushes them
+as multi-row INSERTs (cursor.executemany) through the pooled `admin_engine`:
+
+  - A flush happens every AUDIT_FLUSH_INTERVAL_MS, or as soon as
+    AUDIT_BATCH_SIZE events are waiting, whichever comes first.
+  - If MySQL is unreachable the batch is spilled to a local JSONL file
+    (AUDIT_SPILL_PATH) and replayed on the next successful flush.
+  - If the queue is full the event is dropped and counted — audit logging
+    must never back-pressure the request path.
+"""
+
+import json
+import os
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
 from config import settings
+from db.connection import admin_engine
+
+AUDIT_COLUMNS: Tuple[str, ...] = (
+    "SessionID", "UserID", "UserQuery", "TurnCount", "Intent", "ActiveDomain",
+    "GeneratedSQL", "ExecutionStatus", "RowsReturned", "ErrorMessage", "ExecutionTimeMs",
+)
+
+INSERT_AUDIT_SQL = (
+    f"INSERT INTO ai_audit_logs ({', '.join(AUDIT_COLUMNS)}) "
+    f"VALUES ({', '.join(['%s'] * len(AUDIT_COLUMNS))})"
+)
+
+
+class AuditSink:
+    """
+    Bounded queue + background flusher for audit events.
+
+    Each event is a tuple in AUDIT_COLUMNS order. The flusher thread is
+    started lazily on the first enqueue so importing this module has no
+    side effects.
+    """
+
+    def __init__(
+        self,
+        max_queue: int,
+        batch_size: int,
+        flush_interval_ms: int,
+        spill_path: str,
+    ):
+        self.max_queue = max_queue
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(flush_interval_ms, 10) / 1000.0
+        self.spill_path = spill_path
+
+        self._queue: deque = deque()
+        self._lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self._metrics: Dict[str, int] = {
+            "enqueued": 0,
+            "written": 0,
+            "dropped": 0,
+            "spilled": 0,
+            "replayed": 0,
+            "flush_errors": 0,
+        }
+
+    # ------------------------------------------------------------------
+    # PUBLIC API
+    # ------------------------------------------------------------------
+
+    def enqueue(self, event: Tuple[Any, ...]) -> bool:
+        """Queues one event. Returns False (and counts a drop) if the queue is full."""
+        self._ensure_started()
+        with self._lock:
+            if len(self._queue) >= self.max_queue:
+                self._metrics["dropped"] += 1
+                return False
+            self._queue.append(event)
+            self._metrics["enqueued"] += 1
+            backlog = len(self._queue)
+
+        if backlog >= self.batch_size:
+            self._wake.set()
+        return True
+
+    def start(self) -> None:
+        self._ensure_started()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Signals the flusher to drain the queue and exit. Safe to call twice."""
+        thread = self._thread
+        if thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        thread.join(timeout=timeout)
+        self._thread = None
+
+    def metrics(self) -> Dict[str, int]:
+        """Point-in-time counters plus current in-memory and spill backlog."""
+        with self._lock:
+            snapshot = dict(self._metrics)
+            snapshot["backlog"] = len(self._queue)
+        snapshot["spill_backlog"] = self._spill_backlog()
+        return snapshot
+
+    # ------------------------------------------------------------------
+    # FLUSHER THREAD
+    # ------------------------------------------------------------------
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="audit-sink", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        # Pick up anything left on disk by a previous process.
+        self._replay_spill()
+
+        while True:
+            self._wake.wait(timeout=self.flush_interval)
+            self._wake.clear()
+            stopping = self._stop.is_set()
+
+            # Drain everything that is waiting, one batch at a time.
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    break
+                self._flush(batch)
+
+            if stopping:
+                return
+
+    def _take_batch(self) -> List[Tuple[Any, ...]]:
+        with self._lock:
+            count = min(self.batch_size, len(self._queue))
+            return [self._queue.popleft() for _ in range(count)]
+
+    def _flush(self, batch: List[Tuple[Any, ...]]) -> None:
+        try:
+            self._write_batch(batch)
+        except Exception as e:
+            print(f" Failed to write audit batch ({len(batch)} events), spilling to disk: {e}")
+            with self._lock:
+                self._metrics["flush_errors"] += 1
+            self._spill(batch)
+            return
+
+        with self._lock:
+            self._metrics["written"] += len(batch)
+        print(f" Audit Log Batch Saved: {len(batch)} events")
+
+        # MySQL is reachable again — replay anything that was spilled earlier.
+        self._replay_spill()
+
+    def _write_batch(self, batch: List[Tuple[Any, ...]]) -> None:
+        if admin_engine is None:
+            raise RuntimeError("Admin database engine is not initialized.")
+
+        # raw_connection() checks a DBAPI connection out of the pool; close()
+        # returns it rather than tearing down the socket.
+        raw = admin_engine.raw_connection()
+        try:
+            cursor = raw.cursor()
+            try:
+                # pymysql rewrites INSERT ... VALUES executemany() into a
+                # single multi-row INSERT statement.
+                cursor.executemany(INSERT_AUDIT_SQL, batch)
+            finally:
+                cursor.close()
+            raw.commit()
+        except Exception:
+            try:
+                raw.rollback()
+            except Exception:
+                pass
+            raise
+        finally:
+            raw.close()
+
+    # ------------------------------------------------------------------
+    # LOCAL SPILL FILE
+    # ------------------------------------------------------------------
+
+    def _spill(self, batch: List[Tuple[Any, ...]], count: bool = True) -> None:
+        try:
+            with self._spill_lock, open(self.spill_path, "a", encoding="utf-8") as f:
+                for event in batch:
+                    f.write(json.dumps(dict(zip(AUDIT_COLUMNS, event)), default=str) + "\n")
+            if count:
+                with self._lock:
+                    self._metrics["spilled"] += len(batch)
+        except OSError as e:
+            print(f" Failed to spill audit batch, {len(batch)} events lost: {e}")
+            with self._lock:
+                self._metrics["dropped"] += len(batch)
+
+    def _replay_spill(self) -> None:
+        # Move the file aside first so new spills during replay don't interleave.
+        # A .replay file left by an interrupted replay (or a crash) is picked up
+        # too: the spill is appended to it rather than overwriting it.
+        replay_path = f"{self.spill_path}.replay"
+        with self._spill_lock:
+            try:
+                if not os.path.exists(replay_path):
+                    if not os.path.exists(self.spill_path):
+                        return
+                    os.replace(self.spill_path, replay_path)
+                elif os.path.exists(self.spill_path):
+                    with open(self.spill_path, encoding="utf-8") as src, \
+                            open(replay_path, "a", encoding="utf-8") as dst:
+                        # Leading newline: the old file may end in a torn line.
+                        dst.write("\n" + src.read())
+                    os.remove(self.spill_path)
+            except OSError as e:
+                print(f" Failed to move audit spill file aside: {e}")
+                return
+
+        events: List[Tuple[Any, ...]] = []
+        skipped = 0
+        try:
+            with open(replay_path, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    # A torn write (process killed mid-line) costs that one
+                    # event, not the rest of the file.
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        skipped += 1
+                        continue
+                    if isinstance(record, dict):
+                        events.append(tuple(record.get(col) for col in AUDIT_COLUMNS))
+                    else:
+                        skipped += 1
+        except OSError as e:
+            print(f" Failed to read audit spill file: {e}")
+            return
+
+        if skipped:
+            print(f" Skipped {skipped} unreadable lines in audit spill file")
+            with self._lock:
+                self._metrics["dropped"] += skipped
+
+        for start in range(0, len(events), self.batch_size):
+            batch = events[start:start + self.batch_size]
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                print(f" Audit spill replay interrupted, will retry later: {e}")
+                with self._lock:
+                    self._metrics["flush_errors"] += 1
+                # Already counted when first spilled — don't count them twice.
+                self._spill(events[start:], count=False)
+                break
+            with self._lock:
+                self._metrics["replayed"] += len(batch)
+
+        try:
+            os.remove(replay_path)
+        except OSError:
+            pass
+
+    def _spill_backlog(self) -> int:
+        try:
+            with self._spill_lock, open(self.spill_path, encoding="utf-8") as f:
+                return sum(1 for _ in f)
+        except OSError:
+            return 0
+
+
+audit_sink = AuditSink(
+    max_queue=settings.AUDIT_QUEUE_MAX,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_interval_ms=settings.AUDIT_FLUSH_INTERVAL_MS,
+    spill_path=settings.AUDIT_SPILL_PATH,
+)
+
 
 def log_query_event(
     session_id: str,
@@ -15,33 +309,16 @@ def log_query_event(
     execution_time_ms: int
 ):
     """
-    Inserts a comprehensive audit log into the database.
-    Designed to be run as a FastAPI BackgroundTask so it doesn't block the UI.
+    Queues a comprehensive audit log entry for the batched background writer.
+    Never blocks on the database — safe to call from the request path or a
+    FastAPI BackgroundTask.
     """
-    try:
-        # Connect to the database (Adjust to match your existing DB connection logic if needed)
-        connection = pymysql.connect(
-            host=settings.DB_HOST,
-            user=settings.DB_USER,
-            password=settings.DB_PASSWORD,
-            database=settings.DB_NAME,
-            cursorclass=pymysql.cursors.DictCursor
-        )
-        
-        with connection.cursor() as cursor:
-            sql = """
-                INSERT INTO ai_audit_logs 
-                (SessionID, UserID, UserQuery, TurnCount, Intent, ActiveDomain, GeneratedSQL, ExecutionStatus, RowsReturned, ErrorMessage, ExecutionTimeMs)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            cursor.execute(sql, (
-                session_id, user_id, user_query, turn_count, intent, active_domain, 
-                generated_sql, execution_status, rows_returned, error_message, execution_time_ms
-            ))
-            
-        connection.commit()
-        connection.close()
-        print(f" Audit Log Saved: [{execution_status}] ({execution_time_ms}ms)")
-        
-    except Exception as e:
-        print(f" Failed to write audit log: {e}")
\ No newline at end of file
+    audit_sink.enqueue((
+        session_id, user_id, user_query, turn_count, intent, active_domain,
+        generated_sql, execution_status, rows_returned, error_message, execution_time_ms
+    ))
+
+
+def get_audit_metrics() -> Dict[str, int]:
+    """Drop / backlog / throughput counters for the audit sink."""
+    return audit_sink.metrics()
@@ -1,4 +1,5 @@
 from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
 from config import settings
 
 # Create the SQLAlchemy engine
@@ -13,4 +14,51 @@ try:
     print(" Database engine initialized successfully.")
 except Exception as e:
     print(f" Failed to initialize database engine: {e}")
-    engine = None
\ No newline at end of file
+    engine = None
+
+# Small, separate pool for internal bookkeeping writes (audit log batches).
+# It must stay separate from `engine`: execute_query() switches its sessions to
+# READ ONLY, and that session setting survives the connection's return to the
+# pool — an INSERT on a recycled analytics connection would be rejected.
+try:
+    admin_engine = create_engine(
+        settings.DATABASE_URL,
+        pool_pre_ping=True,
+        pool_size=1,
+        max_overflow=1
+    )
+except Exception as e:
+    print(f" Failed to initialize admin database engine: {e}")
+    admin_engine = None
+
+# Dedicated pool for streamed exports. A long export holds its connection for
+# the whole download; sizing this pool to EXPORT_MAX_CONCURRENT with no
+# overflow means exports can never take connections from interactive queries.
+try:
+    export_engine = create_engine(
+        settings.DATABASE_URL,
+        pool_pre_ping=True,
+        pool_size=settings.EXPORT_MAX_CONCURRENT,
+        max_overflow=0
+    )
+except Exception as e:
+    print(f" Failed to initialize export database engine: {e}")
+    export_engine = None
+
+# One-off connections for KILL QUERY on client disconnect. Not pooled, and
+# separate from admin_engine (pool 1+1), which the audit flusher and the
+# date-facts sync hold for whole batches: a burst of disconnects must neither
+# wait behind them nor starve them. The timeouts bound a KILL against an
+# unreachable server.
+try:
+    kill_engine = create_engine(
+        settings.DATABASE_URL,
+        poolclass=NullPool,
+        connect_args={
+            "connect_timeout": settings.KILL_QUERY_TIMEOUT_SECONDS,
+            "read_timeout": settings.KILL_QUERY_TIMEOUT_SECONDS,
+        }
+    )
+except Exception as e:
+    print(f" Failed to initialize kill database engine: {e}")
+    kill_engine = None
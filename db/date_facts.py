@@ -0,0 +1,297 @@
+"""
+db/date_facts.py
+
+`ticket_date_facts`: a shadow table of properly typed dates, one row per
+ticket, kept in sync from corporate_tickets and ppm_tickets.
+
+CreatedDate, PPMDate, CloseDate and DueDate are VARCHAR in two formats
+(YYYY-MM-DD and DD-MM-YYYY, rule 12 of the SQL prompt). A timeframe filter
+is therefore a pair of LIKE patterns, a trend groups on LEFT(col, 7), and
+the resolution metric runs DATEDIFF on strings. All three parse every row
+and can't use an index. The shadow table stores:
+
+  - EventDate    the domain's primary date (CreatedDate / PPMDate) as DATE
+  - MonthKey     'YYYY-MM' of EventDate, for trends (both formats normalised)
+  - CreatedOn, ClosedOn, DueOn
+  - DaysToClose  GREATEST(DATEDIFF(ClosedOn, EventDate), 0), precomputed
+
+It is keyed on (SourceTable, TicketRowID) with composite indexes on
+(SourceTable, EventDate) and (SourceTable, MonthKey). Timeframes become
+index range scans and trends become index-only group-bys.
+
+Sync runs on the admin pool (the analytics pool is READ ONLY) and stays
+inside MySQL as INSERT ... SELECT ... ON DUPLICATE KEY UPDATE over ID
+ranges:
+  - catch-up: every ID above the last synced one, batch by batch;
+  - sweep: a rolling window re-upserts existing IDs (a PPM ticket gets its
+    CloseDate long after it was created) and deletes facts whose ticket is
+    gone, covering the whole table every few cycles.
+
+Queries only use the table when prefer_date_facts() says so: it is synced
+up to the live MAX(ID) watermark, and the in-process rollups aren't already
+answering that domain. A facts join makes a query ineligible for them.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from sqlalchemy import text
+
+from config import settings
+from db.connection import admin_engine
+from db.result_cache import watermarks
+from db.rollups import rollup_store
+
+DATE_FACTS_TABLE = "ticket_date_facts"
+
+
+@dataclass(frozen=True)
+class FactSource:
+    table: str
+    # The date a ticket is filtered and trended by (rule 12 of the prompt)
+    event_column: str
+    close_column: Optional[str] = None
+    due_column: Optional[str] = None
+
+
+# corporate_tickets has no close/due columns; closure lives in its status history.
+FACT_SOURCES: Dict[str, FactSource] = {
+    "corporate_tickets": FactSource("corporate_tickets", "CreatedDate"),
+    "ppm_tickets": FactSource("ppm_tickets", "PPMDate", close_column="CloseDate", due_column="DueDate"),
+}
+
+
+# ---------------------------------------------------------------------------
+# SQL
+# ---------------------------------------------------------------------------
+
+CREATE_TABLE_SQL = f"""
+CREATE TABLE IF NOT EXISTS {DATE_FACTS_TABLE} (
+    SourceTable VARCHAR(32) NOT NULL,
+    TicketRowID INT NOT NULL,
+    EventDate DATE NULL,
+    MonthKey CHAR(7) NULL,
+    CreatedOn DATE NULL,
+    ClosedOn DATE NULL,
+    DueOn DATE NULL,
+    DaysToClose INT NULL,
+    SyncedAt TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (SourceTable, TicketRowID),
+    KEY idx_tdf_event (SourceTable, EventDate, TicketRowID),
+    KEY idx_tdf_month (SourceTable, MonthKey, TicketRowID),
+    KEY idx_tdf_closed (SourceTable, ClosedOn)
+)
+"""
+
+
+def parse_date_sql(column: str) -> str:
+    """MySQL expression parsing a VARCHAR date in either stored format (NULL otherwise)."""
+    head = f"SUBSTRING_INDEX(TRIM({column}), ' ', 1)"
+    return (
+        f"CASE WHEN {head} REGEXP '^[0-9]{{4}}-[0-9]{{1,2}}-[0-9]{{1,2}}$' THEN STR_TO_DATE({head}, '%Y-%m-%d') "
+        f"WHEN {head} REGEXP '^[0-9]{{1,2}}-[0-9]{{1,2}}-[0-9]{{4}}$' THEN STR_TO_DATE({head}, '%d-%m-%Y') END"
+    )
+
+
+def upsert_sql(source: FactSource) -> str:
+    """INSERT ... SELECT for the source IDs in (:lo, :hi]."""
+    closed = parse_date_sql(f"s.{source.close_column}") if source.close_column else "NULL"
+    due = parse_date_sql(f"s.{source.due_column}") if source.due_column else "NULL"
+    return f"""
+INSERT INTO {DATE_FACTS_TABLE}
+    (SourceTable, TicketRowID, EventDate, MonthKey, CreatedOn, ClosedOn, DueOn, DaysToClose)
+SELECT '{source.table}', d.ID, d.EventDate, DATE_FORMAT(d.EventDate, '%Y-%m'), d.CreatedOn, d.ClosedOn, d.DueOn,
+       CASE WHEN d.ClosedOn IS NOT NULL AND d.EventDate IS NOT NULL
+            THEN GREATEST(DATEDIFF(d.ClosedOn, d.EventDate), 0) END
+FROM (
+    SELECT s.ID,
+           {parse_date_sql(f"s.{source.event_column}")} AS EventDate,
+           {parse_date_sql("s.CreatedDate")} AS CreatedOn,
+           {closed} AS ClosedOn,
+           {due} AS DueOn
+    FROM {source.table} s
+    WHERE s.ID > :lo AND s.ID <= :hi
+) d
+ON DUPLICATE KEY UPDATE
+    EventDate = VALUES(EventDate), MonthKey = VALUES(MonthKey), CreatedOn = VALUES(CreatedOn),
+    ClosedOn = VALUES(ClosedOn), DueOn = VALUES(DueOn), DaysToClose = VALUES(DaysToClose)
+"""
+
+
+def delete_orphans_sql(source: FactSource) -> str:
+    """Removes facts in (:lo, :hi] whose source ticket no longer exists."""
+    return f"""
+DELETE f FROM {DATE_FACTS_TABLE} f
+LEFT JOIN {source.table} s ON s.ID = f.TicketRowID
+WHERE f.SourceTable = '{source.table}' AND f.TicketRowID > :lo AND f.TicketRowID <= :hi AND s.ID IS NULL
+"""
+
+
+def sync_range(connection, source: FactSource, lo: int, hi: int, delete_orphans: bool = False) -> None:
+    """
+    Upserts the facts for source IDs in (lo, hi] on a write connection.
+
+    STR_TO_DATE on a malformed value ('2025-13-40') yields NULL with a
+    warning, which strict sql_mode turns into an error inside INSERT ...
+    SELECT. Strict mode is lifted for the statement and restored after, since
+    the admin pool is shared with the audit writer.
+    """
+    previous_mode = connection.execute(text("SELECT @@SESSION.sql_mode")).scalar()
+    connection.execute(text("SET SESSION sql_mode = ''"))
+    try:
+        connection.execute(text(upsert_sql(source)), {"lo": lo, "hi": hi})
+        if delete_orphans:
+            connection.execute(text(delete_orphans_sql(source)), {"lo": lo, "hi": hi})
+    finally:
+        connection.execute(text("SET SESSION sql_mode = :mode"), {"mode": previous_mode or ""})
+
+
+# ---------------------------------------------------------------------------
+# BACKGROUND SYNC
+# ---------------------------------------------------------------------------
+
+class DateFactsSync:
+    """Keeps ticket_date_facts in step with the source tables."""
+
+    def __init__(self, sources: Dict[str, FactSource], interval_seconds: int, batch_rows: int, sweep_batches: int):
+        self.sources = sources
+        self.interval_seconds = max(5, interval_seconds)
+        self.batch_rows = max(100, batch_rows)
+        self.sweep_batches = max(1, sweep_batches)
+        self._ready = False
+        self._synced_max: Dict[str, int] = {}
+        self._sweep_cursor: Dict[str, int] = {}
+        self._last_full_sweep: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._metrics: Dict[str, int] = {"cycles": 0, "batches": 0, "failures": 0}
+
+    def is_current(self, domain: str) -> bool:
+        """True when every ticket up to the live MAX(ID) watermark has its facts row."""
+        source = self.sources.get(domain)
+        if source is None:
+            return False
+        mark = watermarks.current(frozenset([source.table])).get(source.table)
+        with self._lock:
+            synced = self._synced_max.get(domain)
+        return self._ready and mark is not None and synced is not None and synced >= (mark[0] or 0)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._metrics)
+            synced = dict(self._synced_max)
+            sweeps = dict(self._last_full_sweep)
+        now = time.time()
+        stats["ready"] = self._ready
+        stats["domains"] = {
+            domain: {
+                "synced_max_id": synced.get(domain),
+                "current": self.is_current(domain),
+                "last_full_sweep_age_seconds": round(now - sweeps[domain], 1) if domain in sweeps else None,
+            }
+            for domain in self.sources
+        }
+        return stats
+
+    def _count(self, metric: str, n: int = 1) -> None:
+        with self._lock:
+            self._metrics[metric] += n
+
+    def ensure_table(self) -> bool:
+        if admin_engine is None:
+            return False
+        try:
+            with admin_engine.begin() as connection:
+                connection.execute(text(CREATE_TABLE_SQL))
+            self._ready = True
+        except Exception as e:
+            print(f"Date facts: cannot create {DATE_FACTS_TABLE}: {e}")
+        return self._ready
+
+    def sync_once(self) -> None:
+        if not self._ready and not self.ensure_table():
+            self._count("failures")
+            return
+        for domain, source in self.sources.items():
+            try:
+                self._sync_source(domain, source)
+            except Exception as e:
+                self._count("failures")
+                print(f"Date facts sync failed for {source.table}: {e}")
+        self._count("cycles")
+
+    def _sync_source(self, domain: str, source: FactSource) -> None:
+        with admin_engine.connect() as connection:
+            source_max = connection.execute(text(f"SELECT COALESCE(MAX(ID), 0) FROM {source.table}")).scalar()
+            synced = self._synced_max.get(domain)
+            if synced is None:
+                # Resume where a previous process stopped.
+                synced = connection.execute(
+                    text(f"SELECT COALESCE(MAX(TicketRowID), 0) FROM {DATE_FACTS_TABLE} WHERE SourceTable = :t"),
+                    {"t": source.table},
+                ).scalar()
+
+        # --- Catch-up: new tickets ---
+        while synced < source_max and not self._stop.is_set():
+            hi = min(synced + self.batch_rows, source_max)
+            with admin_engine.begin() as connection:
+                sync_range(connection, source, synced, hi)
+            synced = hi
+            with self._lock:
+                self._synced_max[domain] = synced
+            self._count("batches")
+        with self._lock:
+            self._synced_max[domain] = max(synced, self._synced_max.get(domain, 0))
+
+        # --- Sweep: updated dates and deleted tickets ---
+        cursor = self._sweep_cursor.get(domain, 0)
+        for _ in range(self.sweep_batches):
+            if self._stop.is_set():
+                break
+            hi = cursor + self.batch_rows
+            with admin_engine.begin() as connection:
+                sync_range(connection, source, cursor, hi, delete_orphans=True)
+            self._count("batches")
+            cursor = hi
+            if cursor >= synced:
+                cursor = 0
+                with self._lock:
+                    self._last_full_sweep[domain] = time.time()
+                break
+        self._sweep_cursor[domain] = cursor
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="date-facts-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.sync_once()
+            self._stop.wait(self.interval_seconds)
+
+
+date_facts_sync = DateFactsSync(
+    FACT_SOURCES,
+    interval_seconds=settings.DATE_FACTS_SYNC_SECONDS,
+    batch_rows=settings.DATE_FACTS_BATCH_ROWS,
+    sweep_batches=settings.DATE_FACTS_SWEEP_BATCHES,
+)
+
+
+def prefer_date_facts(domain: Optional[str]) -> bool:
+    """Whether summary SQL for `domain` should read dates from ticket_date_facts."""
+    domain = "ppm_tickets" if "ppm" in (domain or "").lower() else "corporate_tickets"
+    if not settings.DATE_FACTS_ENABLED or not date_facts_sync.is_current(domain):
+        return False
+    # Rollups answer LIKE-date summaries without touching MySQL at all.
+    return not (settings.ROLLUPS_ENABLED and rollup_store.current(domain) is not None)
@@ -0,0 +1,159 @@
+"""
+db/detail_query.py
+
+Detail-intent fetch strategy: exact total + small preview, then keyset pages.
+
+The validator caps detail SQL at MAX_ROWS_LIMIT (500), but the API only ever
+shows DETAIL_PREVIEW_LIMIT (50) rows. Fetching and dict-ifying 500 rows to
+throw 450 away — and then only being able to say "500+" — is wasteful and
+dishonest. Instead two queries derived from the same validated SQL run
+concurrently on the pool:
+
+  1. Preview: the first keyset page on (date_col DESC, ID DESC), or the
+     validated SQL with its LIMIT lowered when keyset order doesn't apply.
+  2. Count:   SELECT COUNT(*) over the same FROM / JOIN / WHERE.
+
+If the count query fails, the preview is still returned and total_count is
+None — the caller falls back to the "N+" display.
+
+Subsequent pages (fetch_detail_page) seek past the last row served instead
+of using OFFSET, so every page costs O(page) no matter how deep the client
+scrolls. The cursor handed to the client is opaque: base64 of the last
+(date, ID) pair plus the number of rows served so far.
+"""
+
+import asyncio
+import base64
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.admission import run_db
+from db.result_cache import cached_execute_query
+from db.snapshot import detail_snapshot_query
+from rules.sql_validator import (
+    CURSOR_DATE_COLUMN,
+    CURSOR_ID_COLUMN,
+    derive_count_sql,
+    derive_keyset_page_sql,
+    derive_preview_sql,
+    user_row_limit,
+)
+
+
+@dataclass
+class DetailFetch:
+    is_success: bool
+    rows: List[Dict[str, Any]]
+    error: str
+    total_count: Optional[int]
+    cache_age: float = 0.0
+    # Opaque cursor for the next page, None when there are no more rows
+    next_cursor: Optional[str] = None
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a client-supplied cursor cannot be decoded."""
+
+
+# ---------------------------------------------------------------------------
+# CURSOR ENCODING
+# ---------------------------------------------------------------------------
+
+def encode_cursor(last_date: Any, last_id: Any, served: int) -> str:
+    payload = json.dumps([None if last_date is None else str(last_date), int(last_id), served])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[str], int, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        # A JSON string of three characters would unpack too: check the shape.
+        if not isinstance(payload, list) or len(payload) != 3:
+            raise ValueError("cursor payload is not [date, id, served]")
+        last_date, last_id, served = payload
+        if last_date is not None and not isinstance(last_date, str):
+            raise ValueError("cursor date is not a string")
+        return last_date, int(last_id), int(served)
+    except (ValueError, TypeError):
+        raise InvalidCursorError("Invalid or corrupted page cursor.")
+
+
+# ---------------------------------------------------------------------------
+# FETCHERS
+# ---------------------------------------------------------------------------
+
+async def fetch_detail_preview(safe_sql: str, preview_limit: int) -> DetailFetch:
+    """Runs the first page and the COUNT(*) query concurrently."""
+    count_sql = derive_count_sql(safe_sql)
+
+    if count_sql is None:
+        return await _fetch_page(safe_sql, preview_limit, after=None, served=0)
+
+    page, (count_ok, count_rows, count_error, _) = await asyncio.gather(
+        _fetch_page(safe_sql, preview_limit, after=None, served=0),
+        run_db(cached_execute_query, count_sql, detail_snapshot_query),
+    )
+
+    if count_ok and count_rows:
+        try:
+            page.total_count = int(count_rows[0]["TotalCount"])
+        except (KeyError, TypeError, ValueError):
+            page.total_count = None
+    elif not count_ok:
+        print(f"Detail count query failed, falling back to preview size: {count_error}")
+
+    return page
+
+
+async def fetch_detail_page(safe_sql: str, cursor: str, page_size: int) -> DetailFetch:
+    """Fetches the page after `cursor` (raises InvalidCursorError on a bad cursor)."""
+    last_date, last_id, served = decode_cursor(cursor)
+    return await _fetch_page(safe_sql, page_size, after=(last_date, last_id), served=served)
+
+
+async def _fetch_page(
+    safe_sql: str,
+    page_size: int,
+    after: Optional[tuple],
+    served: int,
+) -> DetailFetch:
+    # Respect a LIMIT the user asked for ("latest 10 tickets") across pages.
+    row_limit = user_row_limit(safe_sql)
+    if row_limit is not None:
+        page_size = min(page_size, row_limit - served)
+        if page_size <= 0:
+            return DetailFetch(True, [], "", None)
+
+    page_sql = derive_keyset_page_sql(safe_sql, page_size, after=after)
+
+    if page_sql is None:
+        # Not keyset-compatible (custom ORDER BY, grouped detail query, ...):
+        # only the preview is available, with no further pages.
+        if after is not None:
+            return DetailFetch(False, [], "This result does not support paging.", None)
+        preview_sql = derive_preview_sql(safe_sql, page_size) or safe_sql
+        is_success, rows, error, cache_age = await run_db(cached_execute_query, preview_sql, detail_snapshot_query)
+        return DetailFetch(is_success, rows, error, None, cache_age)
+
+    is_success, rows, error, cache_age = await run_db(cached_execute_query, page_sql, detail_snapshot_query)
+    if not is_success:
+        return DetailFetch(False, [], error, None, cache_age)
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if row_limit is not None and served + len(rows) >= row_limit:
+        has_more = False
+
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1]
+        next_cursor = encode_cursor(last.get(CURSOR_DATE_COLUMN), last.get(CURSOR_ID_COLUMN), served + len(rows))
+
+    # Strip the keyset columns — new dicts, so cached rows stay untouched.
+    clean_rows = [
+        {k: v for k, v in row.items() if k not in (CURSOR_DATE_COLUMN, CURSOR_ID_COLUMN)}
+        for row in rows
+    ]
+    return DetailFetch(True, clean_rows, "", None, cache_age, next_cursor)
@@ -0,0 +1,515 @@
+"""
+db/index_advisor.py
+
+Offline index advisor built from the SQL recorded in `ai_audit_logs`.
+
+Every query this service runs is logged with its GeneratedSQL and
+ExecutionTimeMs, so the workload an index plan should serve is already on
+disk. This tool:
+
+  1. Loads recent audit rows: from MySQL, or from JSONL files in the audit
+     spill format (one object per line keyed by AUDIT_COLUMNS).
+  2. Parses each SQL with sqlglot and folds it into a query shape, with
+     literals replaced by `?`, so "Reliance in Dec" and "Tata in Nov" count
+     as one shape.
+  3. For every shape, finds the columns of the target tables that are
+     used as equality predicates, range predicates (including prefix LIKE
+     'abc%'), join keys and GROUP BY keys. It derives one candidate
+     composite index per table in the usual order: equality columns, then
+     one range column, or the GROUP BY columns when there is no range.
+     Predicates no B-tree index can serve are tallied separately: a leading
+     wildcard LIKE, a function-wrapped column like LEFT(col, 7), or an OR
+     mixing those.
+  4. Weights each candidate by the total ExecutionTimeMs of the shapes that
+     want it. A candidate that is a leftmost prefix of another folds into
+     it.
+  5. Cross-checks against SHOW INDEX. A candidate whose columns are a
+     leftmost prefix of an existing index is already covered and is not
+     recommended.
+
+ExecutionTimeMs is the whole request (LLM included), so weights favour
+frequent and slow shapes rather than measure pure DB time.
+
+Run from the repo root (reads through the READ ONLY analytics pool):
+    python -m db.index_advisor [--limit 50000] [--tables corporate_tickets ppm_tickets branch]
+    python -m db.index_advisor --jsonl audit_spill.jsonl --no-show-index
+"""
+
+import argparse
+import json
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import sqlglot
+from sqlglot import exp
+from sqlalchemy import text
+
+from config import settings
+from db.connection import engine
+
+DEFAULT_TABLES = ("corporate_tickets", "ppm_tickets", "branch")
+
+# Composite indexes wider than this rarely pay for their write cost here.
+MAX_INDEX_COLUMNS = 3
+
+EXAMPLE_SHAPES = 3
+
+_INDEX_NAME_MAX = 64
+
+
+@dataclass
+class QueryShape:
+    sql: str
+    count: int = 0
+    total_ms: int = 0
+
+
+@dataclass
+class ColumnUse:
+    """How one shape uses the columns of one table."""
+    equality: List[str] = field(default_factory=list)
+    range: List[str] = field(default_factory=list)
+    # Lookup keys of JOINs into this table, e.g. ("SourceTable", "TicketRowID")
+    join: List[Tuple[str, ...]] = field(default_factory=list)
+    group: List[str] = field(default_factory=list)
+    unsargable: List[str] = field(default_factory=list)
+
+    def candidate(self) -> Tuple[str, ...]:
+        columns = _unique(self.equality)
+        if self.range:
+            columns += [c for c in _unique(self.range) if c not in columns][:1]
+        else:
+            columns += [c for c in _unique(self.group) if c not in columns]
+        return tuple(columns[:MAX_INDEX_COLUMNS])
+
+
+@dataclass
+class Recommendation:
+    table: str
+    columns: Tuple[str, ...]
+    weight_ms: int = 0
+    queries: int = 0
+    shapes: List[QueryShape] = field(default_factory=list)
+    # Existing index this one extends (same leading columns), if any
+    extends: Optional[str] = None
+
+    @property
+    def create_sql(self) -> str:
+        name = f"idx_{self.table}_{'_'.join(c.lower() for c in self.columns)}"[:_INDEX_NAME_MAX]
+        return f"CREATE INDEX {name} ON {self.table} ({', '.join(self.columns)});"
+
+
+def _unique(items: Iterable[str]) -> List[str]:
+    return list(dict.fromkeys(items))
+
+
+# ---------------------------------------------------------------------------
+# LOADING
+# ---------------------------------------------------------------------------
+
+def load_from_db(limit: int) -> List[Tuple[str, int]]:
+    """(GeneratedSQL, ExecutionTimeMs) of the latest audit rows carrying SQL (timeouts included)."""
+    if engine is None:
+        raise RuntimeError("Database engine is not initialized.")
+    with engine.connect() as connection:
+        result = connection.execute(
+            text(
+                "SELECT GeneratedSQL, ExecutionTimeMs FROM ai_audit_logs "
+                "WHERE GeneratedSQL LIKE 'SELECT%' ORDER BY ID DESC LIMIT :limit"
+            ),
+            {"limit": int(limit)},
+        )
+        return [(row[0], int(row[1] or 0)) for row in result.fetchall()]
+
+
+def load_from_jsonl(paths: List[str]) -> List[Tuple[str, int]]:
+    events = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                sql = event.get("GeneratedSQL") or ""
+                if sql.lstrip().upper().startswith("SELECT"):
+                    events.append((sql, int(event.get("ExecutionTimeMs") or 0)))
+    return events
+
+
+def load_existing_indexes(tables: Iterable[str]) -> Dict[str, Dict[str, List[str]]]:
+    """table -> {index name: [columns in Seq_in_index order]} from SHOW INDEX."""
+    indexes: Dict[str, Dict[str, List[str]]] = {}
+    with engine.connect() as connection:
+        for table in tables:
+            rows = connection.execute(text(f"SHOW INDEX FROM {table}")).mappings().fetchall()
+            by_name: Dict[str, List[Tuple[int, str]]] = defaultdict(list)
+            for row in rows:
+                by_name[row["Key_name"]].append((int(row["Seq_in_index"]), row["Column_name"]))
+            indexes[table] = {name: [col for _, col in sorted(cols)] for name, cols in by_name.items()}
+    return indexes
+
+
+# ---------------------------------------------------------------------------
+# SHAPES
+# ---------------------------------------------------------------------------
+
+def _shape_of(parsed: exp.Expression) -> str:
+    def blank(node: exp.Expression) -> exp.Expression:
+        if isinstance(node, exp.Literal) and not isinstance(node.parent, exp.Limit):
+            return exp.Placeholder()
+        return node
+    return parsed.transform(blank).sql(dialect="mysql")
+
+
+def collect_shapes(events: Iterable[Tuple[str, int]]) -> Dict[str, Tuple[exp.Expression, QueryShape]]:
+    shapes: Dict[str, Tuple[exp.Expression, QueryShape]] = {}
+    for sql, elapsed_ms in events:
+        try:
+            parsed = sqlglot.parse_one(sql, read="mysql")
+        except Exception:
+            continue
+        if not isinstance(parsed, exp.Select):
+            continue
+        key = _shape_of(parsed)
+        if key not in shapes:
+            shapes[key] = (parsed, QueryShape(sql=key))
+        shape = shapes[key][1]
+        shape.count += 1
+        shape.total_ms += elapsed_ms
+    return shapes
+
+
+# ---------------------------------------------------------------------------
+# COLUMN USAGE
+# ---------------------------------------------------------------------------
+
+class _Usage:
+    """Resolves the columns of one SELECT to target tables and classifies them."""
+
+    def __init__(self, select: exp.Select, tables: Set[str]):
+        self.select = select
+        self.tables = tables
+        self.aliases: Dict[str, str] = {}
+        for table in select.find_all(exp.Table):
+            self.aliases[table.alias_or_name.lower()] = table.name.lower()
+        from_clause = select.args.get("from_") or select.args.get("from")
+        base = from_clause.this if from_clause else None
+        self.base = base.name.lower() if isinstance(base, exp.Table) else None
+        self.uses: Dict[str, ColumnUse] = defaultdict(ColumnUse)
+
+    def resolve(self, column: exp.Column) -> Optional[Tuple[str, str]]:
+        qualifier = column.table.lower()
+        table = self.aliases.get(qualifier) if qualifier else self.base
+        if table not in self.tables:
+            return None
+        return table, column.name
+
+    def _bare(self, node: exp.Expression) -> Optional[Tuple[str, str]]:
+        while isinstance(node, exp.Paren):
+            node = node.this
+        return self.resolve(node) if isinstance(node, exp.Column) else None
+
+    def _mark_unsargable(self, node: exp.Expression) -> None:
+        for column in node.find_all(exp.Column):
+            resolved = self.resolve(column)
+            if resolved:
+                self.uses[resolved[0]].unsargable.append(resolved[1])
+
+    def _sargable_kind(self, node: exp.Expression) -> Optional[Tuple[str, Tuple[str, str]]]:
+        """('equality' | 'range', (table, column)) if an index can serve `node`."""
+        if isinstance(node, (exp.EQ, exp.NullSafeEQ)):
+            for side, other in ((node.this, node.expression), (node.expression, node.this)):
+                resolved = self._bare(side)
+                if resolved and not other.find(exp.Column):
+                    return "equality", resolved
+            return None
+        if isinstance(node, exp.In) or isinstance(node, exp.Is):
+            resolved = self._bare(node.this)
+            return ("equality", resolved) if resolved else None
+        if isinstance(node, (exp.GT, exp.GTE, exp.LT, exp.LTE, exp.Between)):
+            resolved = self._bare(node.this)
+            return ("range", resolved) if resolved else None
+        if isinstance(node, exp.Like):
+            resolved = self._bare(node.this)
+            pattern = node.expression
+            if resolved and isinstance(pattern, exp.Literal) and pattern.is_string:
+                if pattern.this and pattern.this[0] not in "%_":
+                    return "range", resolved
+            return None
+        return None
+
+    def _unsargable(self, node: exp.Expression) -> bool:
+        """A filter an index could serve if it were written differently."""
+        if isinstance(node, (exp.Like, exp.ILike)):
+            return True  # leading wildcard (a prefix LIKE is sargable)
+        if isinstance(node, (exp.EQ, exp.GT, exp.GTE, exp.LT, exp.LTE, exp.In, exp.Between)):
+            sides = [node.this] + ([node.expression] if node.args.get("expression") else [])
+            return any(isinstance(side, exp.Func) and side.find(exp.Column) for side in sides)
+        return False
+
+    def predicate(self, node: exp.Expression) -> None:
+        while isinstance(node, exp.Paren):
+            node = node.this
+        if isinstance(node, exp.And):
+            self.predicate(node.this)
+            self.predicate(node.expression)
+            return
+        if isinstance(node, exp.Or):
+            # Index-served only when every branch is sargable on one column.
+            branches = [b.unnest() for b in node.flatten()]
+            kinds = [self._sargable_kind(b) for b in branches]
+            columns = {kind[1] for kind in kinds if kind}
+            if all(kinds) and len(columns) == 1:
+                table, column = columns.pop()
+                self.uses[table].range.append(column)
+            elif any(self._unsargable(b) for b in branches):
+                self._mark_unsargable(node)
+            return
+
+        # Column = column across tables is an implicit join.
+        if isinstance(node, exp.EQ) and self._bare(node.this) and self._bare(node.expression):
+            for side in (node.this, node.expression):
+                table, column = self._bare(side)
+                self.uses[table].join.append((column,))
+            return
+
+        kind = self._sargable_kind(node)
+        if kind:
+            usage, (table, column) = kind
+            getattr(self.uses[table], usage).append(column)
+        elif self._unsargable(node):
+            self._mark_unsargable(node)
+        # Anything else (!=, NOT, IS NOT NULL) filters too little to index for.
+
+    def joins(self) -> None:
+        for join in self.select.args.get("joins") or []:
+            joined = join.this
+            if not isinstance(joined, exp.Table) or joined.name.lower() not in self.tables:
+                continue
+            joined_alias = joined.alias_or_name.lower()
+            on = join.args.get("on")
+            if on is None:
+                continue
+            # The lookup happens on the table the JOIN introduces. Its key is
+            # any constant filters in ON (`tdf.SourceTable = 'ppm_tickets'`)
+            # followed by the column matched against the outer table.
+            constants, matched = [], []
+            for eq in on.find_all(exp.EQ):
+                for side, other in ((eq.this, eq.expression), (eq.expression, eq.this)):
+                    if not (isinstance(side, exp.Column) and side.table.lower() == joined_alias):
+                        continue
+                    (constants if not other.find(exp.Column) else matched).append(side.name)
+            use = self.uses[joined.name.lower()]
+            # Constants also filter the joined table for its WHERE ranges.
+            use.equality.extend(constants)
+            key = tuple(_unique(constants + matched))
+            if key:
+                use.join.append(key)
+
+    def group_by(self) -> None:
+        group = self.select.args.get("group")
+        if not group:
+            return
+        projections = {e.alias_or_name.lower(): e.unalias() for e in self.select.expressions}
+        for key in group.expressions:
+            if isinstance(key, exp.Column) and not key.table and key.name.lower() in projections:
+                key = projections[key.name.lower()]
+            resolved = self._bare(key)
+            if resolved and resolved[0] == self.base:
+                # Only the driving table can deliver rows pre-grouped.
+                self.uses[resolved[0]].group.append(resolved[1])
+            elif resolved:
+                continue
+            else:
+                self._mark_unsargable(key)
+
+    def analyse(self) -> Dict[str, ColumnUse]:
+        where = self.select.args.get("where")
+        if where is not None:
+            self.predicate(where.this)
+        self.joins()
+        self.group_by()
+        return dict(self.uses)
+
+
+def shape_usage(parsed: exp.Select, tables: Set[str]) -> Dict[str, ColumnUse]:
+    usage: Dict[str, ColumnUse] = defaultdict(ColumnUse)
+    # Subqueries (the totals wrapper, derived tables) are analysed on their own.
+    for select in parsed.find_all(exp.Select):
+        for table, use in _Usage(select, tables).analyse().items():
+            for name in ("equality", "range", "join", "group", "unsargable"):
+                getattr(usage[table], name).extend(getattr(use, name))
+    return dict(usage)
+
+
+# ---------------------------------------------------------------------------
+# RECOMMENDATIONS
+# ---------------------------------------------------------------------------
+
+def _covered_by(columns: Tuple[str, ...], existing: Dict[str, List[str]]) -> Optional[str]:
+    wanted = [c.lower() for c in columns]
+    for name, index_columns in existing.items():
+        if [c.lower() for c in index_columns[:len(wanted)]] == wanted:
+            return name
+    return None
+
+
+def _extends(columns: Tuple[str, ...], existing: Dict[str, List[str]]) -> Optional[str]:
+    wanted = [c.lower() for c in columns]
+    best, best_len = None, 0
+    for name, index_columns in existing.items():
+        have = [c.lower() for c in index_columns]
+        if len(have) < len(wanted) and wanted[:len(have)] == have and len(have) > best_len:
+            best, best_len = name, len(have)
+    return best
+
+
+def recommend(
+    shapes: Dict[str, Tuple[exp.Expression, QueryShape]],
+    tables: Set[str],
+    existing: Optional[Dict[str, Dict[str, List[str]]]] = None,
+) -> Tuple[List[Recommendation], List[Recommendation], Dict[Tuple[str, str], int]]:
+    """
+    Returns (recommended, already_covered, unsargable_ms_by_column), the
+    first two ranked by weight.
+    """
+    candidates: Dict[Tuple[str, Tuple[str, ...]], Recommendation] = {}
+    unsargable: Dict[Tuple[str, str], int] = defaultdict(int)
+
+    def add(table: str, columns: Tuple[str, ...], shape: QueryShape) -> None:
+        if not columns:
+            return
+        rec = candidates.setdefault((table, columns), Recommendation(table, columns))
+        rec.weight_ms += shape.total_ms
+        rec.queries += shape.count
+        rec.shapes.append(shape)
+
+    for parsed, shape in shapes.values():
+        for table, use in shape_usage(parsed, tables).items():
+            add(table, use.candidate(), shape)
+            for key in _unique(use.join):
+                add(table, key[:MAX_INDEX_COLUMNS], shape)
+            for column in _unique(use.unsargable):
+                unsargable[(table, column)] += shape.total_ms
+
+    # Fold leftmost prefixes into the widest candidate extending them.
+    for key in sorted(candidates, key=lambda k: len(k[1])):
+        table, columns = key
+        wider = [
+            other for (other_table, other_cols), other in candidates.items()
+            if other_table == table and len(other_cols) > len(columns) and other_cols[:len(columns)] == columns
+        ]
+        if wider:
+            target = max(wider, key=lambda r: r.weight_ms)
+            rec = candidates.pop(key)
+            target.weight_ms += rec.weight_ms
+            target.queries += rec.queries
+            target.shapes.extend(rec.shapes)
+
+    recommended, covered = [], []
+    for rec in candidates.values():
+        rec.shapes = sorted({id(s): s for s in rec.shapes}.values(), key=lambda s: -s.total_ms)
+        table_indexes = (existing or {}).get(rec.table, {})
+        if existing is not None and _covered_by(rec.columns, table_indexes):
+            covered.append(rec)
+            continue
+        rec.extends = _extends(rec.columns, table_indexes)
+        recommended.append(rec)
+
+    recommended.sort(key=lambda r: -r.weight_ms)
+    covered.sort(key=lambda r: -r.weight_ms)
+    return recommended, covered, dict(unsargable)
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _shorten(sql: str, width: int = 160) -> str:
+    sql = re.sub(r"\s+", " ", sql)
+    return sql if len(sql) <= width else sql[: width - 3] + "..."
+
+
+def render_text(
+    recommended: List[Recommendation],
+    covered: List[Recommendation],
+    unsargable: Dict[Tuple[str, str], int],
+    total_ms: int,
+    top: int,
+) -> str:
+    lines = []
+    share = lambda ms: f"{100.0 * ms / total_ms:.1f}%" if total_ms else "-"
+    lines.append(f"=== Recommended indexes (top {min(top, len(recommended))} of {len(recommended)}) ===")
+    for rank, rec in enumerate(recommended[:top], start=1):
+        note = f"  (extends {rec.extends})" if rec.extends else ""
+        lines.append(f"{rank:>2}. {rec.create_sql}{note}")
+        lines.append(f"    weight {rec.weight_ms} ms ({share(rec.weight_ms)}), {rec.queries} queries, {len(rec.shapes)} shapes")
+        for shape in rec.shapes[:EXAMPLE_SHAPES]:
+            lines.append(f"      - x{shape.count} {shape.total_ms} ms: {_shorten(shape.sql)}")
+
+    if covered:
+        lines.append("")
+        lines.append("=== Already covered by an existing index ===")
+        for rec in covered[:top]:
+            lines.append(f"    {rec.table} ({', '.join(rec.columns)}): {rec.weight_ms} ms, {rec.queries} queries")
+
+    if unsargable:
+        lines.append("")
+        lines.append("=== Predicates no index can serve (leading-wildcard LIKE, wrapped columns) ===")
+        for (table, column), ms in sorted(unsargable.items(), key=lambda kv: -kv[1])[:top]:
+            lines.append(f"    {table}.{column}: {ms} ms ({share(ms)})")
+        lines.append("    VARCHAR date filters here are what ticket_date_facts (DATE_FACTS_ENABLED) is for.")
+    return "\n".join(lines)
+
+
+def render_json(recommended, covered, unsargable, top: int) -> str:
+    def rec_dict(rec: Recommendation) -> Dict[str, Any]:
+        return {
+            "table": rec.table,
+            "columns": list(rec.columns),
+            "create_sql": rec.create_sql,
+            "weight_ms": rec.weight_ms,
+            "queries": rec.queries,
+            "extends": rec.extends,
+            "shapes": [{"sql": s.sql, "count": s.count, "total_ms": s.total_ms} for s in rec.shapes[:EXAMPLE_SHAPES]],
+        }
+    return json.dumps({
+        "recommended": [rec_dict(r) for r in recommended[:top]],
+        "already_covered": [rec_dict(r) for r in covered[:top]],
+        "unsargable": [
+            {"table": t, "column": c, "weight_ms": ms}
+            for (t, c), ms in sorted(unsargable.items(), key=lambda kv: -kv[1])[:top]
+        ],
+    }, indent=2)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Index recommendations from the audit log's generated SQL.")
+    parser.add_argument("--limit", type=int, default=settings.INDEX_ADVISOR_MAX_LOG_ROWS,
+                        help="latest audit rows to analyse")
+    parser.add_argument("--jsonl", nargs="+", help="read audit events from JSONL files instead of MySQL")
+    parser.add_argument("--tables", nargs="+", default=list(DEFAULT_TABLES))
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--no-show-index", action="store_true", help="skip the SHOW INDEX cross-check")
+    parser.add_argument("--json", action="store_true", help="machine-readable output")
+    args = parser.parse_args(argv)
+
+    events = load_from_jsonl(args.jsonl) if args.jsonl else load_from_db(args.limit)
+    tables = {t.lower() for t in args.tables}
+    shapes = collect_shapes(events)
+    existing = None if args.no_show_index else load_existing_indexes(sorted(tables))
+    recommended, covered, unsargable = recommend(shapes, tables, existing)
+
+    if args.json:
+        print(render_json(recommended, covered, unsargable, args.top))
+        return
+    total_ms = sum(shape.total_ms for _, shape in shapes.values())
+    print(f"Analysed {len(events)} queries in {len(shapes)} shapes ({total_ms} ms total).\n")
+    print(render_text(recommended, covered, unsargable, total_ms, args.top))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,18 @@
 from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError, OperationalError
-from typing import Dict, Any, Tuple, List
-from db.connection import engine
+from typing import Dict, Any, Tuple, List, Iterator
+from db.connection import engine, export_engine, kill_engine
 from config import settings
+from core.cancellation import RequestCancelled, cancellable
+from core.deadline import DeadlineExceeded, stage_timeout
 
 # MySQL error code for MAX_EXECUTION_TIME exceeded.
 # More reliable than string-matching the error message across MySQL versions.
 MYSQL_TIMEOUT_ERROR_CODE = 3024
 
+# ER_QUERY_INTERRUPTED: the statement was stopped by KILL QUERY.
+MYSQL_INTERRUPTED_ERROR_CODE = 1317
+
 # Python-side hard cap — last-resort guard independent of the SQL LIMIT clause.
 # Should match settings.MAX_ROWS_LIMIT but is intentionally explicit here.
 MAX_ROWS_HARD_CAP = settings.MAX_ROWS_LIMIT
@@ -30,6 +35,14 @@ def execute_query(sql_query: str) -> Tuple[bool, List[Dict[str, Any]], str]:
     if engine is None:
         return False, [], "Critical Error: Database engine is not initialized."
 
+    # Inside a request the statement gets at most the request's remaining
+    # budget (core/deadline.py), and none at all once it is spent.
+    try:
+        timeout_seconds = stage_timeout(int(settings.QUERY_TIMEOUT_SECONDS))
+    except DeadlineExceeded as e:
+        return False, [], f"Query not started: {e}."
+    deadline_bound = timeout_seconds < int(settings.QUERY_TIMEOUT_SECONDS)
+
     try:
         with engine.connect() as connection:
 
@@ -42,17 +55,22 @@ def execute_query(sql_query: str) -> Tuple[bool, List[Dict[str, Any]], str]:
             # Cast to int defensively — if QUERY_TIMEOUT_SECONDS is sourced
             # from an env var and misconfigured, this surfaces a clean error
             # rather than silently producing malformed SQL.
-            timeout_ms = int(settings.QUERY_TIMEOUT_SECONDS) * 1000
+            timeout_ms = max(1, int(timeout_seconds * 1000))
             connection.execute(text(f"SET SESSION MAX_EXECUTION_TIME={timeout_ms}"))
 
             # --- 3. EXECUTE THE VALIDATED QUERY ---
-            result = connection.execute(text(sql_query))
-
-            # --- 4. FETCH AND MAP TO DICTS ---
-            # fetchall() is acceptable at the current 500-row cap.
-            # The Python-side hard cap below is an independent safety net.
-            keys = list(result.keys())
-            rows = [dict(zip(keys, row)) for row in result.fetchall()]
+            # Registered with the request's cancel scope: if the client
+            # disconnects, the statement is killed from a side connection
+            # instead of running on to MAX_EXECUTION_TIME.
+            thread_id = _mysql_thread_id(connection)
+            with cancellable(sql_query, lambda: kill_query(thread_id)):
+                result = connection.execute(text(sql_query))
+
+                # --- 4. FETCH AND MAP TO DICTS ---
+                # fetchall() is acceptable at the current 500-row cap.
+                # The Python-side hard cap below is an independent safety net.
+                keys = list(result.keys())
+                rows = [dict(zip(keys, row)) for row in result.fetchall()]
 
             # --- 5. PYTHON-SIDE ROW CAP ---
             # Final guard that holds true regardless of what LIMIT the SQL
@@ -63,6 +81,9 @@ def execute_query(sql_query: str) -> Tuple[bool, List[Dict[str, Any]], str]:
 
             return True, rows, ""
 
+    except RequestCancelled as e:
+        return False, [], str(e)
+
     except OperationalError as e:
         # --- TIMEOUT: check by MySQL error code, not string matching ---
         try:
@@ -70,16 +91,111 @@ def execute_query(sql_query: str) -> Tuple[bool, List[Dict[str, Any]], str]:
         except (AttributeError, IndexError):
             mysql_code = None
 
+        if mysql_code == MYSQL_TIMEOUT_ERROR_CODE and deadline_bound:
+            return False, [], "Query stopped at the request deadline."
+
         if mysql_code == MYSQL_TIMEOUT_ERROR_CODE:
             return False, [], (
                 "Query timed out. The request was too large or complex. "
                 "Try narrowing your search with a company, branch, or timeframe filter."
             )
 
+        if mysql_code == MYSQL_INTERRUPTED_ERROR_CODE:
+            return False, [], "Query cancelled: the client disconnected."
+
         return False, [], f"Database operational error: {str(e.orig)}"
 
     except SQLAlchemyError as e:
         return False, [], f"Database error: {str(e)}"
 
     except Exception as e:
-        return False, [], f"Unexpected execution error: {str(e)}"
\ No newline at end of file
+        return False, [], f"Unexpected execution error: {str(e)}"
+
+
+def _mysql_thread_id(connection) -> int:
+    """Server-side id of a pooled connection (pymysql caches it from the handshake)."""
+    return connection.connection.dbapi_connection.thread_id()
+
+
+def kill_query(thread_id: int) -> None:
+    """
+    Stops the statement running on another connection. KILL QUERY leaves
+    that connection open, so it returns to its pool normally. Runs on a
+    fresh, unpooled connection: every analytics connection may be the busy
+    one, and the admin pool is held by the audit flusher.
+    """
+    if kill_engine is None:
+        raise RuntimeError("kill database engine is not initialized")
+    with kill_engine.connect() as connection:
+        connection.execute(text(f"KILL QUERY {int(thread_id)}"))
+
+
+def execute_internal_aggregate(sql_query: str, timeout_seconds: int) -> Tuple[bool, List[Dict[str, Any]], str]:
+    """
+    Runs an aggregate query generated by this service itself (rollup
+    builds), not by the LLM. Same READ ONLY / MAX_EXECUTION_TIME guards as
+    execute_query(), with its own timeout and WITHOUT the MAX_ROWS_LIMIT
+    cap — a rollup needs every group. Callers bound the result size.
+    """
+    if engine is None:
+        return False, [], "Critical Error: Database engine is not initialized."
+
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SET SESSION TRANSACTION READ ONLY"))
+            timeout_ms = int(timeout_seconds) * 1000
+            connection.execute(text(f"SET SESSION MAX_EXECUTION_TIME={timeout_ms}"))
+
+            result = connection.execute(text(sql_query))
+            keys = list(result.keys())
+            return True, [dict(zip(keys, row)) for row in result.fetchall()], ""
+
+    except SQLAlchemyError as e:
+        return False, [], f"Database error: {str(e)}"
+
+    except Exception as e:
+        return False, [], f"Unexpected execution error: {str(e)}"
+
+
+def stream_query(
+    sql_query: str,
+    timeout_seconds: int,
+    chunk_rows: int,
+) -> Iterator[Tuple[List[str], List[tuple]]]:
+    """
+    Streams a validated read-only query through an unbuffered server-side
+    cursor (SQLAlchemy stream_results → pymysql SSCursor) on the dedicated
+    export pool.
+
+    Yields (column_names, rows_chunk) with at most `chunk_rows` row tuples per
+    chunk, so memory stays constant regardless of total row count. The same
+    READ ONLY + MAX_EXECUTION_TIME session guards as execute_query() apply,
+    with the export's own timeout. Errors propagate to the caller — there is
+    no partial-success tuple to return mid-stream.
+    """
+    if export_engine is None:
+        raise RuntimeError("Critical Error: Export database engine is not initialized.")
+
+    with export_engine.connect() as connection:
+        connection.execute(text("SET SESSION TRANSACTION READ ONLY"))
+        timeout_ms = int(timeout_seconds) * 1000
+        connection.execute(text(f"SET SESSION MAX_EXECUTION_TIME={timeout_ms}"))
+
+        result = connection.execution_options(stream_results=True).execute(text(sql_query))
+        exhausted = False
+        try:
+            keys = list(result.keys())
+            while True:
+                chunk = result.fetchmany(chunk_rows)
+                if not chunk:
+                    exhausted = True
+                    break
+                yield keys, [tuple(row) for row in chunk]
+        finally:
+            if exhausted:
+                result.close()
+            else:
+                # Closing an unbuffered cursor early would read and discard
+                # every remaining row. Drop the connection instead; the pool
+                # replaces it on the next checkout.
+                connection.invalidate()
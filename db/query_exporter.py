@@ -0,0 +1,162 @@
+"""
+db/query_exporter.py
+
+Streaming CSV / NDJSON export of a full result set.
+
+Interactive queries are capped at MAX_ROWS_LIMIT (500); exports re-validate
+the stored SQL with a separate EXPORT_MAX_ROWS cap and stream it straight from
+a server-side cursor to the client in chunks, so memory use is constant no
+matter how many rows come back.
+
+Isolation from interactive traffic:
+  - Exports run on their own connection pool (db.connection.export_engine).
+  - At most EXPORT_MAX_CONCURRENT exports run at once; extra requests are
+    refused immediately rather than queued.
+  - Each export has its own wall-clock budget (EXPORT_TIMEOUT_SECONDS),
+    enforced both by MySQL MAX_EXECUTION_TIME and between chunks.
+"""
+
+import csv
+import io
+import json
+import threading
+import time
+from datetime import date, datetime, time as dt_time, timedelta
+from decimal import Decimal
+from typing import Any, Callable, Iterator, List, Optional
+
+from config import settings
+from db.query_executor import stream_query
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+_export_slots = threading.BoundedSemaphore(settings.EXPORT_MAX_CONCURRENT)
+
+
+class ExportTimeoutError(RuntimeError):
+    """Raised between chunks once an export exceeds EXPORT_TIMEOUT_SECONDS."""
+
+
+class ExportSlot:
+    """
+    Lease on one of the EXPORT_MAX_CONCURRENT export slots.
+
+    release() is idempotent. The slot is also released when the lease is
+    garbage-collected, which covers a StreamingResponse whose generator was
+    never started (client gone before the first chunk) — an unstarted
+    generator never runs its `finally` block.
+    """
+
+    def __init__(self):
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            _export_slots.release()
+
+    def __del__(self):
+        self.release()
+
+
+def try_acquire_export_slot() -> Optional[ExportSlot]:
+    """Non-blocking: an ExportSlot if one is free, else None."""
+    if _export_slots.acquire(blocking=False):
+        return ExportSlot()
+    return None
+
+
+def acquire_export_slot(timeout: float) -> Optional[ExportSlot]:
+    """Blocking for up to `timeout` seconds: an ExportSlot, or None if none freed up."""
+    if _export_slots.acquire(timeout=timeout):
+        return ExportSlot()
+    return None
+
+
+def _json_default(val: Any) -> Any:
+    if isinstance(val, Decimal):
+        return float(val)
+    if isinstance(val, (datetime, date, dt_time)):
+        return val.isoformat()
+    if isinstance(val, timedelta):
+        return str(val)
+    if isinstance(val, bytes):
+        return val.decode("utf-8", errors="replace")
+    return str(val)
+
+
+def _csv_chunk(rows: List[tuple], header: Optional[List[str]] = None) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header is not None:
+        writer.writerow(header)
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+def _ndjson_chunk(keys: List[str], rows: List[tuple]) -> str:
+    return "".join(
+        json.dumps(dict(zip(keys, row)), default=_json_default) + "\n"
+        for row in rows
+    )
+
+
+def stream_export(
+    export_sql: str,
+    fmt: str,
+    slot: ExportSlot,
+    on_finish: Optional[Callable[[str, int, str], None]] = None,
+) -> Iterator[str]:
+    """
+    Generator of encoded text chunks for a StreamingResponse.
+
+    Releases `slot` when the stream ends for any reason (completion, error,
+    client disconnect closing the generator). `on_finish(status, rows, error)`
+    is called once at the end, e.g. for audit logging.
+    """
+    started = time.monotonic()
+    rows_sent = 0
+    status, error = "Export_Success", ""
+    header_sent = False
+    chunks = stream_query(export_sql, settings.EXPORT_TIMEOUT_SECONDS, settings.EXPORT_CHUNK_ROWS)
+
+    try:
+        for keys, rows in chunks:
+            if time.monotonic() - started > settings.EXPORT_TIMEOUT_SECONDS:
+                raise ExportTimeoutError(
+                    f"Export exceeded {settings.EXPORT_TIMEOUT_SECONDS}s and was stopped "
+                    f"after {rows_sent} rows."
+                )
+
+            # Python-side guard independent of the SQL LIMIT, as in execute_query().
+            remaining = settings.EXPORT_MAX_ROWS - rows_sent
+            rows = rows[:remaining]
+
+            if fmt == "csv":
+                yield _csv_chunk(rows, header=None if header_sent else keys)
+                header_sent = True
+            else:
+                yield _ndjson_chunk(keys, rows)
+            rows_sent += len(rows)
+
+            if rows_sent >= settings.EXPORT_MAX_ROWS:
+                break
+
+    except GeneratorExit:
+        status, error = "Export_Cancelled", "Client disconnected during export."
+        raise
+    except Exception as e:
+        # Headers are already sent, so the only way to signal failure is to
+        # end the body early; the audit log records the reason.
+        status, error = "Export_Error", str(e)
+        print(f"Export failed after {rows_sent} rows: {e}")
+    finally:
+        # Closing the inner generator returns the connection to the pool now,
+        # not whenever it is garbage-collected.
+        chunks.close()
+        slot.release()
+        if on_finish is not None:
+            on_finish(status, rows_sent, error)
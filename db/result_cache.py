@@ -0,0 +1,270 @@
+"""
+db/result_cache.py
+
+In-process cache of query results keyed by the validated SQL.
+
+Dashboards refresh the same summary queries many times a minute. Because
+safe_sql is already normalised by sqlglot, identical questions under identical
+filters produce byte-identical SQL — a fingerprint of it is a reliable key.
+
+Bounds and invalidation:
+  - Total size is capped at RESULT_CACHE_MAX_BYTES (LRU eviction).
+  - Every entry expires after RESULT_CACHE_TTL_SECONDS regardless.
+  - A background poller reads a watermark (MAX(ID), row count) for each
+    table in WATERMARK_TABLES. Entries remember the watermarks of the tables
+    they read; once any of them moves, the entry is stale. MAX(ID) is read
+    every poll; the row count (a full index scan) only when MAX(ID) moved or
+    WATERMARK_COUNT_POLL_SECONDS has passed.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+import sqlglot
+from sqlglot import exp
+
+from config import settings
+from db.query_executor import execute_query
+
+
+@dataclass
+class CacheEntry:
+    rows: List[Dict[str, Any]]
+    size_bytes: int
+    created_at: float
+    tables: FrozenSet[str]
+    # Watermark of each watched table at the time the rows were fetched
+    watermarks: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def age_seconds(self) -> float:
+        return time.time() - self.created_at
+
+
+def fingerprint_sql(sql_query: str) -> str:
+    """Stable cache key for a validated SQL string."""
+    return hashlib.sha1(sql_query.strip().encode("utf-8")).hexdigest()
+
+
+def referenced_tables(sql_query: str) -> FrozenSet[str]:
+    """Lower-cased base table names referenced anywhere in the query."""
+    try:
+        parsed = sqlglot.parse_one(sql_query, read="mysql")
+    except Exception:
+        return frozenset()
+    return frozenset(t.name.lower() for t in parsed.find_all(exp.Table))
+
+
+def _estimate_size(rows: List[Dict[str, Any]]) -> int:
+    try:
+        return len(json.dumps(rows, default=str))
+    except (TypeError, ValueError):
+        return len(str(rows))
+
+
+# ---------------------------------------------------------------------------
+# TABLE WATERMARKS
+# ---------------------------------------------------------------------------
+
+class TableWatermarks:
+    """
+    Background poller for per-table change watermarks.
+
+    MAX(ID) catches inserts and is one seek to the end of the primary key,
+    so it is read every poll_seconds. COUNT(*) additionally catches deletes,
+    but InnoDB answers it by scanning a whole index; it is re-run only when
+    MAX(ID) moved (so the count in a mark is always current for its MAX(ID))
+    or every count_poll_seconds. Inserts therefore invalidate within one poll;
+    deletes without inserts within count_poll_seconds.
+    """
+
+    def __init__(self, tables: List[str], poll_seconds: int, count_poll_seconds: int = 0):
+        self.tables = [t.lower() for t in tables]
+        self.poll_seconds = max(1, poll_seconds)
+        self.count_poll_seconds = max(self.poll_seconds, count_poll_seconds)
+        self._current: Dict[str, Any] = {}
+        self._counted_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def current(self, tables: FrozenSet[str]) -> Dict[str, Any]:
+        """Latest known watermark for each watched table in `tables`."""
+        with self._lock:
+            return {t: self._current.get(t) for t in tables if t in self._current}
+
+    def poll_once(self) -> None:
+        for table in self.tables:
+            with self._lock:
+                previous = self._current.get(table)
+            count_due = (
+                previous is None
+                or time.time() - self._counted_at.get(table, 0.0) >= self.count_poll_seconds
+            )
+
+            if not count_due:
+                is_success, rows, error = execute_query(f"SELECT MAX(ID) AS MaxID FROM {table}")
+                if not is_success or not rows:
+                    print(f" Watermark poll failed for {table}: {error}")
+                    continue
+                if rows[0].get("MaxID") == previous[0]:
+                    continue  # no inserts; the count is re-checked on its own schedule
+
+            # Both together, so the mark's count always belongs to its MAX(ID).
+            counted_at = time.time()
+            is_success, rows, error = execute_query(
+                f"SELECT MAX(ID) AS MaxID, COUNT(*) AS RowCount FROM {table}"
+            )
+            if not is_success or not rows:
+                print(f" Watermark poll failed for {table}: {error}")
+                continue
+            mark = (rows[0].get("MaxID"), rows[0].get("RowCount"))
+            with self._lock:
+                self._current[table] = mark
+                self._counted_at[table] = counted_at
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="watermark-poller", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.poll_once()
+            self._stop.wait(self.poll_seconds)
+
+
+# ---------------------------------------------------------------------------
+# RESULT CACHE
+# ---------------------------------------------------------------------------
+
+class ResultCache:
+    """Byte-bounded LRU of query results with TTL and watermark invalidation."""
+
+    def __init__(self, max_bytes: int, ttl_seconds: int, watermarks: TableWatermarks):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.watermarks = watermarks
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, int] = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, sql_query: str) -> Optional[CacheEntry]:
+        key = fingerprint_sql(sql_query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._metrics["misses"] += 1
+                return None
+
+            if entry.age_seconds > self.ttl_seconds or self._is_stale(entry):
+                self._remove(key)
+                self._metrics["invalidations"] += 1
+                self._metrics["misses"] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._metrics["hits"] += 1
+            return entry
+
+    def put(self, sql_query: str, rows: List[Dict[str, Any]]) -> None:
+        size = _estimate_size(rows)
+        # A single result bigger than a quarter of the budget would just churn the cache.
+        if size > self.max_bytes // 4:
+            return
+
+        tables = referenced_tables(sql_query)
+        entry = CacheEntry(
+            rows=rows,
+            size_bytes=size,
+            created_at=time.time(),
+            tables=tables,
+            watermarks=self.watermarks.current(tables),
+        )
+        key = fingerprint_sql(sql_query)
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._total_bytes += size
+            while self._total_bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._metrics["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            snapshot = dict(self._metrics)
+            snapshot["entries"] = len(self._entries)
+            snapshot["bytes"] = self._total_bytes
+        return snapshot
+
+    def _is_stale(self, entry: CacheEntry) -> bool:
+        latest = self.watermarks.current(entry.tables)
+        return any(entry.watermarks.get(table) != mark for table, mark in latest.items())
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._total_bytes -= entry.size_bytes
+
+
+watermarks = TableWatermarks(
+    settings.WATERMARK_TABLES,
+    settings.WATERMARK_POLL_SECONDS,
+    settings.WATERMARK_COUNT_POLL_SECONDS,
+)
+result_cache = ResultCache(
+    max_bytes=settings.RESULT_CACHE_MAX_BYTES,
+    ttl_seconds=settings.RESULT_CACHE_TTL_SECONDS,
+    watermarks=watermarks,
+)
+
+
+def cached_execute_query(
+    sql_query: str,
+    alternate: Optional[Callable[[str], Optional[Tuple[List[Dict[str, Any]], float]]]] = None,
+) -> Tuple[bool, List[Dict[str, Any]], str, float]:
+    """
+    Cache-aware wrapper around execute_query().
+
+    `alternate` is tried on a cache miss before MySQL (the local snapshot);
+    it returns (rows, age_seconds) or None to decline. Its rows are not
+    cached: they aren't as fresh as the watermarks an entry would record.
+
+    Returns:
+        (is_success, rows, error_message, cache_age_seconds)
+        cache_age_seconds is 0.0 for a fresh DB read.
+    """
+    if settings.RESULT_CACHE_ENABLED:
+        entry = result_cache.get(sql_query)
+        if entry is not None:
+            return True, entry.rows, "", entry.age_seconds
+
+    if alternate is not None:
+        answered = alternate(sql_query)
+        if answered is not None:
+            rows, age = answered
+            return True, rows, "", age
+
+    is_success, rows, error = execute_query(sql_query)
+    if is_success and settings.RESULT_CACHE_ENABLED:
+        result_cache.put(sql_query, rows)
+    return is_success, rows, error, 0.0
@@ -0,0 +1,69 @@
+"""
+db/result_store.py
+
+Short-lived registry of validated SQL behind each detail response.
+
+A detail response only carries a 50-row preview. To let the client page
+further without re-asking the question, the validated SQL is remembered under
+an opaque result_id; /api/v1/query/{result_id}/page derives each subsequent
+page from it. Nothing but the SQL text and a few counters is stored — rows are
+always re-read from the database (or the result cache).
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
+
+from config import settings
+
+
+@dataclass
+class StoredResult:
+    result_id: str
+    safe_sql: str
+    intent: str
+    total_count: Optional[int] = None
+    created_at: float = field(default_factory=time.time)
+
+
+class ResultStore:
+    """Bounded LRU of StoredResult with a TTL."""
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, StoredResult]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, safe_sql: str, intent: str, total_count: Optional[int] = None) -> str:
+        result = StoredResult(
+            result_id=uuid.uuid4().hex,
+            safe_sql=safe_sql,
+            intent=intent,
+            total_count=total_count,
+        )
+        with self._lock:
+            self._entries[result.result_id] = result
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result.result_id
+
+    def get(self, result_id: str) -> Optional[StoredResult]:
+        with self._lock:
+            result = self._entries.get(result_id)
+            if result is None:
+                return None
+            if time.time() - result.created_at > self.ttl_seconds:
+                del self._entries[result_id]
+                return None
+            self._entries.move_to_end(result_id)
+            return result
+
+
+result_store = ResultStore(
+    max_entries=settings.RESULT_STORE_MAX_ENTRIES,
+    ttl_seconds=settings.RESULT_STORE_TTL_SECONDS,
+)
@@ -0,0 +1,618 @@
+"""
+db/rollup_planner.py
+
+Decides whether a validated summary query can be answered from the
+in-process rollups (db/rollups.py), and answers it if so.
+
+A query is eligible when its AST has exactly the shape the rollup can
+reproduce:
+
+  - FROM corporate_tickets / ppm_tickets, optionally LEFT JOINed to company,
+    corporate and branch on the standard keys (the joins build_sql_prompt()
+    prescribes). No other tables, subqueries or CTEs.
+  - SELECT: rollup dimensions, LEFT(<date>, n) with n <= 7, and
+    COUNT(<alias>.TicketID) / COUNT(<alias>.ID) / COUNT(*). No DISTINCT and
+    no HAVING.
+  - WHERE: AND / OR / NOT over LIKE, =, <>, IN, IS NULL and string
+    comparisons of a dimension or the date column with string literals.
+  - GROUP BY / ORDER BY / LIMIT over the selected outputs.
+  - Also the totals wrapper from derive_totals_sql(): SUM(_grouped.x) and
+    COUNT(*) over an eligible grouped subquery.
+
+Predicates are evaluated in Python with MySQL semantics: LIKE and
+equality are case-insensitive as in the default collation, and NULL
+follows three-valued logic. A date predicate on a month-grain group is
+evaluated for every possible day of that month. If the days disagree
+(the predicate splits the month), the query goes to MySQL. Anything the
+planner doesn't recognise goes to MySQL unchanged.
+"""
+
+import re
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from operator import itemgetter
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+import sqlglot
+from sqlglot import exp
+
+from config import settings
+from db.query_executor import MAX_ROWS_HARD_CAP
+from db.result_cache import cached_execute_query
+from db.snapshot import summary_snapshot_query
+from db.rollups import ROLLUP_SPECS, RollupSpec, rollup_store
+
+# (joined table) -> the ON condition it must use, as {(table, column), (table, column)}
+_JOIN_KEYS = {
+    "company": lambda base: {(base, "corporateid"), ("company", "id")},
+    "corporate": lambda base: {("company", "corporatename"), ("corporate", "id")},
+    "branch": lambda base: {(base, "branchid"), ("branch", "id")},
+}
+
+_MAX_DATE_PREFIX = 7  # LEFT(date, n) is exact on a month-grain group for n <= 7
+
+# Every day a month-grain group could hold; a predicate must agree on all of them.
+_DAYS = [f"{d:02d}" for d in range(1, 32)]
+
+
+class _Ineligible(Exception):
+    """The query can't be answered exactly from the rollup."""
+
+
+# ---------------------------------------------------------------------------
+# VALUE SEMANTICS
+# ---------------------------------------------------------------------------
+
+def _ci(value: Any) -> Any:
+    return value.casefold() if isinstance(value, str) else value
+
+
+@lru_cache(maxsize=512)
+def _like_regex(pattern: str) -> "re.Pattern":
+    parts = []
+    for ch in pattern:
+        if ch == "%":
+            parts.append(".*")
+        elif ch == "_":
+            parts.append(".")
+        else:
+            parts.append(re.escape(ch))
+    return re.compile("".join(parts), re.IGNORECASE | re.DOTALL)
+
+
+@dataclass(frozen=True)
+class _Operand:
+    """
+    An expression over one rollup group: `key` reads a hashable key from the
+    group, `expand` turns that key into the candidate SQL values (one value
+    normally, one per possible day for a month-grain date). Predicates and
+    grouping are memoised on the key, since rollup values repeat heavily.
+    """
+    key: Callable[[Dict[str, Any]], Any]
+    expand: Callable[[Any], List[Any]]
+
+
+# A predicate returns True / False / None (SQL unknown) for one rollup group.
+Predicate = Callable[[Dict[str, Any]], Optional[bool]]
+
+
+def _expand_date(key: Tuple[Any, bool]) -> List[Any]:
+    date_key, is_month = key
+    if is_month:
+        return [f"{date_key}-{day}" for day in _DAYS]
+    return [date_key]
+
+
+_DATE_OPERAND = _Operand(itemgetter("DateKey", "DateIsMonth"), _expand_date)
+
+
+def _left_operand(n: int) -> _Operand:
+    return _Operand(itemgetter("DateKey"), lambda key: [None if key is None else str(key)[:n]])
+
+
+def _field_operand(name: str) -> _Operand:
+    return _Operand(itemgetter(name), lambda key: [key])
+
+
+# ---------------------------------------------------------------------------
+# PLAN
+# ---------------------------------------------------------------------------
+
+@dataclass
+class _Output:
+    name: str
+    # "dim": key is a dimension id; "count": key is the measure name
+    kind: str
+    key: str
+
+
+@dataclass
+class RollupPlan:
+    domain: str
+    outputs: List[_Output]
+    group_keys: List[str]                       # dimension ids, in GROUP BY order
+    operands: Dict[str, _Operand]               # dimension id -> operand
+    where: Optional[Predicate]
+    order: List[Tuple[str, bool, bool]]         # (output name / dim id, desc, nulls_first)
+    limit: Optional[int]
+    offset: int = 0
+    # derive_totals_sql() wrapper: [(output name, "sum" column | None for COUNT(*))]
+    totals: Optional[List[Tuple[str, Optional[str]]]] = None
+    grouped: bool = True
+    # Rollup fields the plan reads; groups are projected onto these first
+    fields: FrozenSet[str] = frozenset()
+
+
+class _Scope:
+    """Table aliases of one SELECT, resolved against a rollup spec."""
+
+    def __init__(self, select: exp.Select):
+        from_clause = select.args.get("from_") or select.args.get("from")
+        if from_clause is None or not isinstance(from_clause.this, exp.Table):
+            raise _Ineligible("FROM is not a plain table")
+        base = from_clause.this
+        self.spec: RollupSpec = ROLLUP_SPECS.get(base.name.lower())
+        if self.spec is None:
+            raise _Ineligible(f"no rollup for {base.name}")
+
+        self.tables = {base.alias_or_name.lower(): self.spec.table}
+        self.fields_used = set()
+        joined = set()
+        for join in select.args.get("joins") or []:
+            table = join.this
+            if not isinstance(table, exp.Table) or (join.args.get("side") or "").upper() != "LEFT":
+                raise _Ineligible("only LEFT JOINs to dimension tables")
+            name = table.name.lower()
+            if name not in _JOIN_KEYS or name in joined or join.args.get("using"):
+                raise _Ineligible(f"unsupported join {name}")
+            self.tables[table.alias_or_name.lower()] = name
+            joined.add(name)
+
+            on = join.args.get("on")
+            if not isinstance(on, exp.EQ) or not all(isinstance(s, exp.Column) for s in (on.this, on.expression)):
+                raise _Ineligible("join condition is not a key equality")
+            sides = {self._qualify(on.this), self._qualify(on.expression)}
+            if sides != _JOIN_KEYS[name](self.spec.table):
+                raise _Ineligible(f"non-standard join condition for {name}")
+        if "corporate" in joined and "company" not in joined:
+            raise _Ineligible("corporate joined without company")
+
+    def _qualify(self, column: exp.Column) -> Tuple[str, str]:
+        table = self.tables.get((column.table or "").lower())
+        if table is None:
+            raise _Ineligible(f"unknown or missing table qualifier on {column.sql()}")
+        return table, column.name.lower()
+
+    def dimension(self, node: exp.Expression) -> Tuple[str, _Operand]:
+        """(dimension id, operand) for a groupable expression."""
+        if isinstance(node, exp.Left):
+            length = node.expression
+            if not (isinstance(node.this, exp.Column) and isinstance(length, exp.Literal) and not length.is_string):
+                raise _Ineligible("unsupported LEFT()")
+            n = int(length.this)
+            if not self.is_date(node.this) or not 0 < n <= _MAX_DATE_PREFIX:
+                raise _Ineligible("LEFT() is only exact on the date column up to the month")
+            self.fields_used.add("DateKey")
+            return f"left{n}", _left_operand(n)
+
+        if isinstance(node, exp.Column):
+            field_name = self.field(node)
+            if field_name is None:
+                raise _Ineligible(f"{node.sql()} is not a rollup dimension")
+            self.fields_used.add(field_name)
+            return field_name, _field_operand(field_name)
+
+        raise _Ineligible(f"unsupported expression {node.sql()}")
+
+    def field(self, column: exp.Column) -> Optional[str]:
+        table, name = self._qualify(column)
+        for (source, source_column), field_name in self.spec.dimensions:
+            if source == table and source_column.lower() == name:
+                return field_name
+        return None
+
+    def is_date(self, node: exp.Expression) -> bool:
+        return isinstance(node, exp.Column) and self._qualify(node) == (
+            self.spec.table, self.spec.date_column.lower()
+        )
+
+    def measure(self, node: exp.Expression) -> Optional[str]:
+        """Rollup measure for a COUNT(), None if `node` isn't an aggregate."""
+        if not isinstance(node, exp.Count):
+            if node.find(exp.AggFunc):
+                raise _Ineligible(f"unsupported aggregate {node.sql()}")
+            return None
+        arg = node.this
+        if isinstance(arg, exp.Star):
+            return "RowCount"
+        if isinstance(arg, exp.Column):
+            table, name = self._qualify(arg)
+            if table == self.spec.table and name == "ticketid":
+                return "Tickets"
+            if table == self.spec.table and name == "id":
+                return "RowCount"
+        raise _Ineligible(f"unsupported COUNT({arg.sql() if arg else ''})")
+
+    # ------------------------------------------------------------------
+    # WHERE
+    # ------------------------------------------------------------------
+
+    def predicate(self, node: exp.Expression) -> Predicate:
+        if isinstance(node, exp.Paren):
+            return self.predicate(node.this)
+        if isinstance(node, exp.And):
+            left, right = self.predicate(node.this), self.predicate(node.expression)
+            return lambda row: _and(left(row), right(row))
+        if isinstance(node, exp.Or):
+            left, right = self.predicate(node.this), self.predicate(node.expression)
+            return lambda row: _or(left(row), right(row))
+        if isinstance(node, exp.Not):
+            inner = self.predicate(node.this)
+            return lambda row: _not(inner(row))
+        return self.leaf(node)
+
+    def operand(self, node: exp.Expression) -> Tuple[str, _Operand]:
+        if self.is_date(node):
+            self.fields_used.update(("DateKey", "DateIsMonth"))
+            return "date", _DATE_OPERAND
+        return self.dimension(node)
+
+    def leaf(self, node: exp.Expression) -> Predicate:
+        if isinstance(node, exp.Is) and isinstance(node.expression, exp.Null):
+            _, operand = self.operand(node.this)
+            return _memoised(node, lambda value: value is None, operand)
+
+        if isinstance(node, exp.In):
+            if node.args.get("query") or not node.expressions:
+                raise _Ineligible("IN with a subquery")
+            _, operand = self.operand(node.this)
+            options = {_ci(_string_literal(e)) for e in node.expressions}
+            return _memoised(node, lambda value: None if value is None else _ci(_as_text(value)) in options, operand)
+
+        if isinstance(node, (exp.Like, exp.ILike)):
+            if node.args.get("escape"):
+                raise _Ineligible("LIKE ... ESCAPE")
+            pattern = _string_literal(node.expression)
+            if "\\" in pattern:
+                raise _Ineligible("escaped LIKE pattern")
+            regex = _like_regex(pattern)
+            _, operand = self.operand(node.this)
+            return _memoised(node, lambda value: None if value is None else bool(regex.fullmatch(_as_text(value))), operand)
+
+        comparisons = {
+            exp.EQ: lambda a, b: a == b,
+            exp.NEQ: lambda a, b: a != b,
+            exp.GT: lambda a, b: a > b,
+            exp.GTE: lambda a, b: a >= b,
+            exp.LT: lambda a, b: a < b,
+            exp.LTE: lambda a, b: a <= b,
+        }
+        compare = comparisons.get(type(node))
+        if compare is not None:
+            column, literal = node.this, node.expression
+            if isinstance(column, exp.Literal):
+                raise _Ineligible("literal on the left of a comparison")
+            dim_id, operand = self.operand(column)
+            if not isinstance(node, (exp.EQ, exp.NEQ)) and dim_id != "date":
+                raise _Ineligible("range comparison outside the date column")
+            target = _ci(_string_literal(literal))
+            return _memoised(
+                node,
+                lambda value: None if value is None else compare(_ci(_as_text(value)).rstrip(" "), target.rstrip(" ")),
+                operand,
+            )
+
+        raise _Ineligible(f"unsupported predicate {node.sql()}")
+
+
+def _string_literal(node: exp.Expression) -> str:
+    if isinstance(node, exp.Literal) and node.is_string:
+        return node.this
+    raise _Ineligible(f"expected a string literal, got {node.sql()}")
+
+
+def _as_text(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    # MySQL would compare a non-string column numerically against a string literal.
+    raise _Ineligible("non-string column value")
+
+
+def _memoised(node: exp.Expression, test: Callable[[Any], bool], operand: _Operand) -> Predicate:
+    """Leaf predicate cached per operand key. All candidate values must agree."""
+    cache: Dict[Any, Optional[bool]] = {}
+    read_key = operand.key
+
+    def evaluate(row: Dict[str, Any]) -> Optional[bool]:
+        key = read_key(row)
+        try:
+            return cache[key]
+        except KeyError:
+            pass
+        results = {test(value) for value in operand.expand(key)}
+        if len(results) != 1:
+            raise _Ineligible(f"{node.sql()} splits a month-grain group")
+        cache[key] = result = results.pop()
+        return result
+
+    return evaluate
+
+
+def _and(a: Optional[bool], b: Optional[bool]) -> Optional[bool]:
+    if a is False or b is False:
+        return False
+    return None if a is None or b is None else True
+
+
+def _or(a: Optional[bool], b: Optional[bool]) -> Optional[bool]:
+    if a is True or b is True:
+        return True
+    return None if a is None or b is None else False
+
+
+def _not(a: Optional[bool]) -> Optional[bool]:
+    return None if a is None else not a
+
+
+# ---------------------------------------------------------------------------
+# PLANNING
+# ---------------------------------------------------------------------------
+
+def _int_literal(node: Optional[exp.Expression]) -> Optional[int]:
+    if node is None:
+        return None
+    value = node.expression if isinstance(node, (exp.Limit, exp.Offset)) else node
+    if isinstance(value, exp.Literal) and not value.is_string:
+        return int(value.this)
+    raise _Ineligible("non-literal LIMIT / OFFSET")
+
+
+def _plan_select(select: exp.Select) -> RollupPlan:
+    if not isinstance(select, exp.Select):
+        raise _Ineligible("not a SELECT")
+    for unsupported in ("distinct", "having", "with", "qualify", "windows"):
+        if select.args.get(unsupported):
+            raise _Ineligible(unsupported.upper())
+    if any(select.find_all(exp.Subquery, exp.Window)):
+        raise _Ineligible("subquery or window function")
+
+    scope = _Scope(select)
+    outputs: List[_Output] = []
+    operands: Dict[str, _Operand] = {}
+    for projection in select.expressions:
+        node = projection.this if isinstance(projection, exp.Alias) else projection
+        if isinstance(node, exp.Star):
+            raise _Ineligible("SELECT *")
+        measure = scope.measure(node)
+        if measure is not None:
+            name = projection.alias if isinstance(projection, exp.Alias) else projection.sql(dialect="mysql")
+            outputs.append(_Output(name, "count", measure))
+            continue
+        dim_id, operand = scope.dimension(node)
+        if isinstance(projection, exp.Alias):
+            name = projection.alias
+        elif isinstance(node, exp.Column):
+            name = node.name
+        else:
+            raise _Ineligible("unaliased expression")  # its MySQL label is the raw text
+        operands[dim_id] = operand
+        outputs.append(_Output(name, "dim", dim_id))
+
+    by_name = {o.name.lower(): o for o in outputs}
+
+    def resolve(node: exp.Expression) -> Tuple[str, Optional[_Operand]]:
+        """GROUP BY / ORDER BY item -> (output name or dim id, operand for dims)."""
+        if isinstance(node, exp.Literal) and not node.is_string:
+            position = int(node.this) - 1
+            if not 0 <= position < len(outputs):
+                raise _Ineligible("positional reference out of range")
+            out = outputs[position]
+            return out.key if out.kind == "dim" else out.name, operands.get(out.key)
+        if isinstance(node, exp.Column) and not node.table and node.name.lower() in by_name:
+            out = by_name[node.name.lower()]
+            return out.key if out.kind == "dim" else out.name, operands.get(out.key)
+        measure = scope.measure(node)
+        if measure is not None:
+            out = next((o for o in outputs if o.kind == "count" and o.key == measure), None)
+            if out is None:
+                raise _Ineligible("ORDER BY an aggregate that isn't selected")
+            return out.name, None
+        return scope.dimension(node)
+
+    group_keys: List[str] = []
+    group = select.args.get("group")
+    for item in (group.expressions if group else []):
+        dim_id, operand = resolve(item)
+        if operand is None:
+            raise _Ineligible("GROUP BY an aggregate")
+        operands.setdefault(dim_id, operand)
+        if dim_id not in group_keys:
+            group_keys.append(dim_id)
+
+    grouped = bool(group_keys)
+    has_counts = any(o.kind == "count" for o in outputs)
+    if not grouped and not has_counts:
+        raise _Ineligible("not an aggregate query")
+    for out in outputs:
+        if out.kind == "dim" and out.key not in group_keys:
+            raise _Ineligible(f"{out.name} is selected but not grouped")
+
+    order: List[Tuple[str, bool, bool]] = []
+    order_clause = select.args.get("order")
+    for ordered in (order_clause.expressions if order_clause else []):
+        key, operand = resolve(ordered.this)
+        if operand is not None and key not in group_keys:
+            raise _Ineligible("ORDER BY a column that isn't grouped")
+        desc = bool(ordered.args.get("desc"))
+        nulls_first = ordered.args.get("nulls_first")
+        order.append((key, desc, (not desc) if nulls_first is None else bool(nulls_first)))
+
+    where = select.args.get("where")
+    predicate = scope.predicate(where.this) if where else None
+    return RollupPlan(
+        domain=scope.spec.domain,
+        outputs=outputs,
+        group_keys=group_keys,
+        operands=operands,
+        where=predicate,
+        order=order,
+        limit=_int_literal(select.args.get("limit")),
+        offset=_int_literal(select.args.get("offset")) or 0,
+        grouped=grouped,
+        fields=frozenset(scope.fields_used),
+    )
+
+
+def _plan_totals(select: exp.Select) -> RollupPlan:
+    """The derive_totals_sql() wrapper: SUM()/COUNT(*) over a grouped subquery."""
+    from_clause = select.args.get("from_") or select.args.get("from")
+    inner = from_clause.this.this
+    for unsupported in ("joins", "where", "group", "having", "order", "distinct"):
+        if select.args.get(unsupported):
+            raise _Ineligible(f"totals wrapper with {unsupported.upper()}")
+
+    plan = _plan_select(inner)
+    inner_names = {o.name.lower(): o for o in plan.outputs}
+    totals: List[Tuple[str, Optional[str]]] = []
+    for projection in select.expressions:
+        node = projection.this if isinstance(projection, exp.Alias) else projection
+        name = projection.alias_or_name if isinstance(projection, exp.Alias) else projection.sql(dialect="mysql")
+        if isinstance(node, exp.Count) and isinstance(node.this, exp.Star):
+            totals.append((name, None))
+        elif isinstance(node, exp.Sum) and isinstance(node.this, exp.Column) and node.this.name.lower() in inner_names:
+            source = inner_names[node.this.name.lower()]
+            if source.kind != "count":
+                raise _Ineligible("SUM over a non-count column")
+            totals.append((name, source.name))
+        else:
+            raise _Ineligible(f"unsupported totals expression {node.sql()}")
+    plan.totals = totals
+    return plan
+
+
+@lru_cache(maxsize=256)
+def plan_rollup_query(sql_query: str) -> Optional[RollupPlan]:
+    """Rollup plan for a validated query, or None if it must go to MySQL."""
+    try:
+        parsed = sqlglot.parse_one(sql_query, read="mysql")
+        if not isinstance(parsed, exp.Select):
+            raise _Ineligible("not a SELECT")
+        from_clause = parsed.args.get("from_") or parsed.args.get("from")
+        if from_clause is not None and isinstance(from_clause.this, exp.Subquery):
+            return _plan_totals(parsed)
+        return _plan_select(parsed)
+    except _Ineligible as e:
+        print(f"Rollup planner: not eligible ({e}).")
+        return None
+    except Exception as e:
+        print(f"Rollup planner: could not plan query ({e}).")
+        return None
+
+
+# ---------------------------------------------------------------------------
+# EXECUTION
+# ---------------------------------------------------------------------------
+
+def _sort_key(value: Any, nulls_first: bool, desc: bool) -> tuple:
+    # Sorted descending means reversed: flip the null flag so NULL lands where MySQL puts it.
+    null_rank = (0 if nulls_first else 1) if not desc else (1 if nulls_first else 0)
+    return (null_rank if value is None else 1 - null_rank, _ci(value) if value is not None else 0)
+
+
+def run_plan(plan: RollupPlan, groups: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Evaluates a plan over rollup groups. Raises _Ineligible if a predicate is undecidable."""
+    measures = [o.key for o in plan.outputs if o.kind == "count"]
+    dims = [(dim, plan.operands[dim]) for dim in plan.group_keys]
+    # operand key -> (display value, case-insensitive grouping value), per dimension
+    value_caches: List[Dict[Any, Tuple[Any, Any]]] = [{} for _ in dims]
+    results: Dict[tuple, Dict[str, Any]] = {}
+    where = plan.where
+
+    for group in groups:
+        if where is not None and where(group) is not True:
+            continue
+        values = []
+        for (dim, operand), cache in zip(dims, value_caches):
+            raw = operand.key(group)
+            value = cache.get(raw)
+            if value is None:
+                shown = operand.expand(raw)[0]
+                value = cache[raw] = (shown, _ci(shown))
+            values.append(value)
+        key = tuple(v[1] for v in values)
+        bucket = results.get(key)
+        if bucket is None:
+            # Case-insensitive grouping keeps the first spelling seen, like MySQL.
+            bucket = results[key] = {
+                "dims": {dim: v[0] for (dim, _), v in zip(dims, values)},
+                "counts": dict.fromkeys(measures, 0),
+            }
+        counts = bucket["counts"]
+        for measure in measures:
+            counts[measure] += group[measure]
+
+    if not plan.grouped and not results:
+        results[()] = {"dims": {}, "counts": dict.fromkeys(measures, 0)}
+
+    rows = []
+    for bucket in results.values():
+        row = {}
+        for out in plan.outputs:
+            row[out.name] = bucket["dims"][out.key] if out.kind == "dim" else bucket["counts"][out.key]
+        row["__dims"] = bucket["dims"]
+        rows.append(row)
+
+    for key, desc, nulls_first in reversed(plan.order):
+        rows.sort(
+            key=lambda r: _sort_key(r[key] if key in r else r["__dims"][key], nulls_first, desc),
+            reverse=desc,
+        )
+    for row in rows:
+        del row["__dims"]
+
+    if plan.offset:
+        rows = rows[plan.offset:]
+    if plan.limit is not None:
+        rows = rows[:plan.limit]
+
+    if plan.totals is not None:
+        totals = {}
+        for name, source in plan.totals:
+            totals[name] = len(rows) if source is None else (sum(r[source] for r in rows) if rows else None)
+        return [totals]
+    return rows[:MAX_ROWS_HARD_CAP]
+
+
+def answer_from_rollups(sql_query: str) -> Optional[Tuple[List[Dict[str, Any]], float]]:
+    """(rows, data age in seconds) if the rollups can answer `sql_query` exactly, else None."""
+    plan = plan_rollup_query(sql_query)
+    if plan is None:
+        rollup_store.count("declined")
+        return None
+    table = rollup_store.current(plan.domain)
+    if table is None:
+        return None
+    try:
+        rows = run_plan(plan, table.project(plan.fields))
+    except _Ineligible as e:
+        print(f"Rollup planner: falling back to MySQL ({e}).")
+        rollup_store.count("declined")
+        return None
+    rollup_store.count("hits")
+    # Age from the full build: updates since then may not be reflected.
+    return rows, max(0.0, time.time() - table.built_at)
+
+
+def execute_summary_query(sql_query: str) -> Tuple[bool, List[Dict[str, Any]], str, float]:
+    """
+    Drop-in for cached_execute_query() on the summary path: rollups when
+    eligible and in sync, otherwise the result cache, the local snapshot
+    (within SNAPSHOT_MAX_STALENESS_SECONDS) and finally MySQL.
+    """
+    if settings.ROLLUPS_ENABLED:
+        answer = answer_from_rollups(sql_query)
+        if answer is not None:
+            rows, age = answer
+            return True, rows, "", age
+    return cached_execute_query(sql_query, summary_snapshot_query)
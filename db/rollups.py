@@ -0,0 +1,426 @@
+"""
+db/rollups.py
+
+In-process rollups of ticket counts, kept in step with the table watermarks.
+
+Nearly every summary question is COUNT(TicketID) grouped by some mix of
+company, branch, status, type/service and month over one ticket table. Each
+one scans the whole table. A rollup holds those counts pre-aggregated, per
+domain, at the grain
+
+    (CompanyName, CorporateName, BranchSite, BranchCity, BranchState,
+     Status, Priority, Type, Service, month)
+
+so db/rollup_planner.py can answer an eligible query by scanning groups
+instead of tickets. Latency then tracks the number of groups, not the table size.
+
+Dates are VARCHAR and come in two formats, so the month grain is kept
+exactly: a well-formed YYYY-MM-DD date is stored as its month ('2025-12')
+with DateIsMonth set, and anything else keeps its raw string.
+
+Refresh (background thread, driven by db/result_cache.watermarks):
+  - MAX(ID) moved and nothing else changed: only tickets with a higher ID
+    are aggregated and merged in (incremental).
+  - The row count moved without new IDs (deletes), or ROLLUP_REBUILD_SECONDS
+    passed: full rebuild, at most once per ROLLUP_MIN_REBUILD_SECONDS.
+
+Freshness of a served rollup:
+  - inserts: merged within one watermark poll;
+  - deletes: the rollup is not served from the poll that sees the count
+    drop (within WATERMARK_COUNT_POLL_SECONDS) until the rebuild lands;
+  - in-place UPDATEs (Status, Priority, Type, Service, a renamed company):
+    the watermarks can't see them, and the rollup can't subtract a ticket
+    from its old group. They show up at the next full rebuild, and a rollup
+    whose full build is older than ROLLUP_MAX_AGE_SECONDS (by default the
+    result cache TTL) is not served. Corporate status changes are included:
+    the status history table is deliberately not watched, because every
+    status change would force a full rebuild and the incremental refresh
+    would almost never run.
+Otherwise the planner falls back to MySQL. The age reported with a rollup
+answer is measured from the full build, the oldest data it may contain.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from config import settings
+from db.query_executor import execute_internal_aggregate
+from db.result_cache import TableWatermarks, watermarks as table_watermarks
+
+# Well-formed ISO dates are folded to their month; everything else stays raw.
+_ISO_DATE_REGEXP = "^[0-9]{4}-[0-9]{2}-[0-9]{2}$"
+
+MEASURES = ("Tickets", "RowCount")
+
+# Projections of one rollup onto the fields a query touches, kept per rollup version.
+_MAX_PROJECTIONS = 32
+
+
+@dataclass(frozen=True)
+class RollupSpec:
+    domain: str
+    table: str
+    alias: str
+    date_column: str
+    # (source table, column) -> rollup field. Source is the ticket table or
+    # one of the dimension tables joined the way build_sql_prompt() joins them.
+    dimensions: Tuple[Tuple[Tuple[str, str], str], ...]
+    # Tables whose watermark must match for the rollup to be served. The
+    # first is the ticket table itself; any others force a rebuild when they move.
+    watch_tables: Tuple[str, ...]
+
+    @property
+    def dimension_map(self) -> Dict[Tuple[str, str], str]:
+        return dict(self.dimensions)
+
+    @property
+    def fields(self) -> List[str]:
+        return [name for _, name in self.dimensions] + ["DateKey", "DateIsMonth"]
+
+
+_SHARED_DIMENSIONS = (
+    (("company", "CompanyName"), "CompanyName"),
+    (("corporate", "CorporateName"), "CorporateName"),
+    (("branch", "BranchSite"), "BranchSite"),
+    (("branch", "BranchCity"), "BranchCity"),
+    (("branch", "BranchState"), "BranchState"),
+)
+
+ROLLUP_SPECS = {
+    "corporate_tickets": RollupSpec(
+        domain="corporate_tickets",
+        table="corporate_tickets",
+        alias="ct",
+        date_column="CreatedDate",
+        dimensions=_SHARED_DIMENSIONS + (
+            (("corporate_tickets", "Status"), "Status"),
+            (("corporate_tickets", "Priority"), "Priority"),
+            (("corporate_tickets", "Type"), "Type"),
+            (("corporate_tickets", "Service"), "Service"),
+        ),
+        # Not corporate_ticket_status_history: status updates are bounded by
+        # ROLLUP_MAX_AGE_SECONDS like every other in-place update.
+        watch_tables=("corporate_tickets",),
+    ),
+    "ppm_tickets": RollupSpec(
+        domain="ppm_tickets",
+        table="ppm_tickets",
+        alias="pt",
+        date_column="PPMDate",
+        dimensions=_SHARED_DIMENSIONS + (
+            (("ppm_tickets", "Status"), "Status"),
+        ),
+        watch_tables=("ppm_tickets",),
+    ),
+}
+
+
+def build_rollup_sql(spec: RollupSpec, since_id: Optional[int] = None) -> str:
+    """Aggregate SQL for a full build, or for tickets with ID > since_id."""
+    a = spec.alias
+    date = f"{a}.{spec.date_column}"
+    columns = []
+    for (source, column), name in spec.dimensions:
+        qualifier = a if source == spec.table else source
+        columns.append(f"{qualifier}.{column} AS {name}")
+    columns += [
+        f"CASE WHEN {date} REGEXP '{_ISO_DATE_REGEXP}' THEN LEFT({date}, 7) ELSE {date} END AS DateKey",
+        f"({date} REGEXP '{_ISO_DATE_REGEXP}') AS DateIsMonth",
+        f"COUNT({a}.TicketID) AS Tickets",
+        "COUNT(*) AS RowCount",
+        f"MAX({a}.ID) AS MaxID",
+    ]
+    sql = (
+        f"SELECT {', '.join(columns)} FROM {spec.table} {a} "
+        f"LEFT JOIN company ON {a}.CorporateID = company.ID "
+        f"LEFT JOIN corporate ON company.CorporateName = corporate.ID "
+        f"LEFT JOIN branch ON {a}.BranchID = branch.ID"
+    )
+    if since_id is not None:
+        sql += f" WHERE {a}.ID > {int(since_id)}"
+    # Positional: MySQL resolves GROUP BY names against the FROM tables first,
+    # and CorporateName exists in both company and corporate.
+    return sql + f" GROUP BY {', '.join(str(i) for i in range(1, len(spec.fields) + 1))}"
+
+
+@dataclass
+class RollupTable:
+    domain: str
+    rows: List[Dict[str, Any]]
+    max_id: Optional[int]
+    row_total: int
+    built_at: float
+    # Watermarks of the watched tables this rollup is known to match
+    marks: Dict[str, Any] = field(default_factory=dict)
+    synced_at: float = 0.0
+
+    def __post_init__(self):
+        self._projections: "OrderedDict[FrozenSet[str], List[Dict[str, Any]]]" = OrderedDict()
+        self._projection_lock = threading.Lock()
+
+    def matches(self, base_mark: Any) -> bool:
+        return base_mark is not None and tuple(base_mark) == (self.max_id, self.row_total)
+
+    def project(self, fields: FrozenSet[str]) -> List[Dict[str, Any]]:
+        """
+        The groups re-aggregated onto `fields` only. A status-by-month question
+        then scans a few hundred groups instead of the full grain. Cached per
+        field set for the lifetime of this rollup version (a refresh builds a
+        new RollupTable).
+        """
+        with self._projection_lock:
+            cached = self._projections.get(fields)
+            if cached is not None:
+                self._projections.move_to_end(fields)
+                return cached
+
+        names = sorted(fields)
+        merged: Dict[tuple, Dict[str, Any]] = {}
+        for row in self.rows:
+            key = tuple(row[name] for name in names)
+            target = merged.get(key)
+            if target is None:
+                target = merged[key] = {name: row[name] for name in names}
+                target.update(dict.fromkeys(MEASURES, 0))
+            for measure in MEASURES:
+                target[measure] += row[measure]
+        projected = list(merged.values())
+
+        with self._projection_lock:
+            self._projections[fields] = projected
+            while len(self._projections) > _MAX_PROJECTIONS:
+                self._projections.popitem(last=False)
+        return projected
+
+
+def _group_key(spec: RollupSpec, row: Dict[str, Any]) -> tuple:
+    return tuple(row.get(name) for name in spec.fields)
+
+
+def _normalise(rows: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Optional[int], int]:
+    """Strips MaxID off the fetched groups; returns (rows, max_id, row_total)."""
+    max_id = None
+    total = 0
+    for row in rows:
+        mark = row.pop("MaxID", None)
+        if mark is not None and (max_id is None or mark > max_id):
+            max_id = mark
+        row["DateIsMonth"] = bool(row.get("DateIsMonth"))
+        row["Tickets"] = int(row.get("Tickets") or 0)
+        row["RowCount"] = int(row.get("RowCount") or 0)
+        total += row["RowCount"]
+    return rows, max_id, total
+
+
+# ---------------------------------------------------------------------------
+# ROLLUP STORE
+# ---------------------------------------------------------------------------
+
+class RollupStore:
+    """Per-domain rollups plus the background refresher that keeps them in sync."""
+
+    def __init__(self, specs: Dict[str, RollupSpec], watermarks: TableWatermarks):
+        self.specs = specs
+        self.watermarks = watermarks
+        self._tables: Dict[str, RollupTable] = {}
+        self._last_build_attempt: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._metrics: Dict[str, int] = {
+            "hits": 0, "declined": 0, "stale": 0,
+            "builds": 0, "incremental_merges": 0, "refresh_errors": 0,
+        }
+
+    def current(self, domain: str) -> Optional[RollupTable]:
+        """
+        The domain's rollup, only if it matches the latest watermark of every
+        watched table and its last full build is within ROLLUP_MAX_AGE_SECONDS.
+        """
+        spec = self.specs.get(domain)
+        if spec is None:
+            return None
+        with self._lock:
+            table = self._tables.get(domain)
+        if table is None:
+            return None
+        latest = self.watermarks.current(frozenset(spec.watch_tables))
+        if len(latest) < len(spec.watch_tables) or latest != table.marks:
+            self.count("stale")
+            return None
+        # In-place updates are invisible to the watermarks: bound them by age.
+        if time.time() - table.built_at > settings.ROLLUP_MAX_AGE_SECONDS:
+            self.count("stale")
+            return None
+        return table
+
+    def count(self, metric: str) -> None:
+        with self._lock:
+            self._metrics[metric] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot: Dict[str, Any] = dict(self._metrics)
+            tables = dict(self._tables)
+        now = time.time()
+        snapshot["domains"] = {
+            domain: {
+                "groups": len(table.rows),
+                "tickets": table.row_total,
+                "age_seconds": round(now - table.built_at, 1),
+            }
+            for domain, table in tables.items()
+        }
+        return snapshot
+
+    # ------------------------------------------------------------------
+    # REFRESH
+    # ------------------------------------------------------------------
+
+    def refresh_once(self) -> None:
+        # Serialised: the startup warm-up and the refresher thread can overlap.
+        with self._refresh_lock:
+            self._refresh_all()
+
+    def _refresh_all(self) -> None:
+        for spec in self.specs.values():
+            try:
+                self._refresh(spec)
+            except Exception as e:
+                print(f" Rollup refresh failed for {spec.domain}: {e}")
+                self.count("refresh_errors")
+
+    def _refresh(self, spec: RollupSpec) -> None:
+        latest = self.watermarks.current(frozenset(spec.watch_tables))
+        base_mark = latest.get(spec.table)
+        if base_mark is None:
+            return  # watermark poller hasn't reached this table yet
+
+        with self._lock:
+            table = self._tables.get(spec.domain)
+        now = time.time()
+
+        needs_rebuild = (
+            table is None
+            or now - table.built_at > min(settings.ROLLUP_REBUILD_SECONDS, settings.ROLLUP_MAX_AGE_SECONDS)
+            or any(latest.get(t) != table.marks.get(t) for t in spec.watch_tables[1:])
+        )
+        if not needs_rebuild:
+            if table.matches(base_mark):
+                self._mark_synced(spec.domain, latest)
+                return
+            max_id = base_mark[0]
+            if max_id is not None and (table.max_id is None or max_id > table.max_id):
+                self._merge_increment(spec, table, latest)
+                return
+            needs_rebuild = True  # count moved without new IDs: deletes
+
+        last_attempt = self._last_build_attempt.get(spec.domain, 0.0)
+        if table is not None and now - last_attempt < settings.ROLLUP_MIN_REBUILD_SECONDS:
+            return  # throttled; the planner falls back to MySQL until then
+        self._last_build_attempt[spec.domain] = now
+        self._build(spec, latest)
+
+    def _build(self, spec: RollupSpec, latest: Dict[str, Any]) -> None:
+        started = time.time()
+        is_success, rows, error = execute_internal_aggregate(
+            build_rollup_sql(spec), settings.ROLLUP_BUILD_TIMEOUT_SECONDS
+        )
+        if not is_success:
+            print(f" Rollup build failed for {spec.domain}: {error}")
+            self.count("refresh_errors")
+            return
+        if len(rows) > settings.ROLLUP_MAX_GROUPS:
+            print(f" Rollup for {spec.domain} has {len(rows)} groups (> ROLLUP_MAX_GROUPS); not serving it.")
+            with self._lock:
+                self._tables.pop(spec.domain, None)
+            return
+
+        rows, max_id, total = _normalise(rows)
+        table = RollupTable(spec.domain, rows, max_id, total, built_at=started)
+        # Secondary marks are recorded even if the ticket table moved during
+        # the build; the next refresh then only needs an increment.
+        table.marks = {t: latest.get(t) for t in spec.watch_tables[1:]}
+        if table.matches(latest.get(spec.table)):
+            table.marks, table.synced_at = dict(latest), time.time()
+        with self._lock:
+            self._tables[spec.domain] = table
+            self._metrics["builds"] += 1
+        print(f" Rollup built for {spec.domain}: {len(rows)} groups, {total} tickets in {time.time() - started:.2f}s")
+
+    def _merge_increment(self, spec: RollupSpec, table: RollupTable, latest: Dict[str, Any]) -> None:
+        is_success, delta, error = execute_internal_aggregate(
+            build_rollup_sql(spec, since_id=table.max_id or 0), settings.ROLLUP_BUILD_TIMEOUT_SECONDS
+        )
+        if not is_success:
+            print(f" Rollup increment failed for {spec.domain}: {error}")
+            self.count("refresh_errors")
+            return
+
+        delta, delta_max, delta_total = _normalise(delta)
+        # Copy-on-write: readers keep iterating the old list untouched.
+        rows = list(table.rows)
+        index = {_group_key(spec, row): i for i, row in enumerate(rows)}
+        for group in delta:
+            key = _group_key(spec, group)
+            if key in index:
+                merged = dict(rows[index[key]])
+                for measure in MEASURES:
+                    merged[measure] += group[measure]
+                rows[index[key]] = merged
+            else:
+                index[key] = len(rows)
+                rows.append(group)
+
+        if len(rows) > settings.ROLLUP_MAX_GROUPS:
+            with self._lock:
+                self._tables.pop(spec.domain, None)
+            return
+
+        merged_table = RollupTable(
+            spec.domain,
+            rows,
+            max(filter(None, (table.max_id, delta_max)), default=None),
+            table.row_total + delta_total,
+            built_at=table.built_at,
+            marks=dict(table.marks),
+            synced_at=table.synced_at,
+        )
+        if merged_table.matches(latest.get(spec.table)):
+            merged_table.marks, merged_table.synced_at = dict(latest), time.time()
+        with self._lock:
+            self._tables[spec.domain] = merged_table
+            self._metrics["incremental_merges"] += 1
+
+    def _mark_synced(self, domain: str, latest: Dict[str, Any]) -> None:
+        with self._lock:
+            table = self._tables.get(domain)
+            if table is not None:
+                table.marks, table.synced_at = dict(latest), time.time()
+
+    # ------------------------------------------------------------------
+    # BACKGROUND THREAD
+    # ------------------------------------------------------------------
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="rollup-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.refresh_once()
+            self._stop.wait(self.watermarks.poll_seconds)
+
+
+rollup_store = RollupStore(ROLLUP_SPECS, table_watermarks)
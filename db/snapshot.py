@@ -0,0 +1,361 @@
+"""
+db/snapshot.py
+
+Optional local columnar snapshot of the allowed tables, queried with DuckDB.
+
+Every analytics question currently runs against the production MySQL the
+ticketing app writes to. With SNAPSHOT_ENABLED, a background worker
+periodically exports each table in ALLOWED_TABLES to Parquet and an
+embedded DuckDB connection exposes each file as a view under its original
+table name. The export runs over the export pool, through the same
+streaming cursor as CSV exports, writing each chunk to the file as it
+arrives. Like a user export it holds one of the EXPORT_MAX_CONCURRENT
+export slots per table, so the refresh never takes a pool connection an
+admitted export is owed.
+
+Validated SELECTs are transpiled MySQL -> DuckDB with sqlglot and answered
+from the snapshot, so heavy GROUP BYs stop touching the OLTP primary and
+read capacity grows with API nodes rather than replicas.
+
+MySQL stays the source of truth. A query falls back to it when:
+  - duckdb / pyarrow aren't installed, or no snapshot has been built yet;
+  - sqlglot can't transpile the query or DuckDB rejects it at runtime
+    (unsupported syntax, STRPTIME on a malformed date, ...);
+  - the snapshot is older than the caller's staleness budget AND the table
+    watermarks show the tables it reads have changed since the export.
+    Summary/dashboard panels accept SNAPSHOT_MAX_STALENESS_SECONDS; detail
+    rows and pages are freshness-critical and only use a snapshot whose
+    watermarks still match the live tables exactly.
+
+MySQL semantics the snapshot reproduces: the default collation is
+case-insensitive (DuckDB `default_collation = 'nocase'`, and LIKE is
+rewritten to ILIKE), and NULLs sort first ascending (sqlglot emits
+explicit NULLS FIRST/LAST when transpiling).
+
+Generations are written to SNAPSHOT_DIR/<generation>/<table>.parquet and
+swapped in atomically. The previous generation is kept on disk so queries
+still running against it can finish; older ones are deleted.
+"""
+
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import sqlglot
+from sqlglot import exp
+
+from config import settings
+from core.cancellation import RequestCancelled, cancel_requested, cancellable
+from core.deadline import remaining_budget
+from db.query_executor import MAX_ROWS_HARD_CAP, stream_query
+from db.query_exporter import acquire_export_slot
+from db.result_cache import referenced_tables, watermarks
+
+try:
+    import duckdb
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Snapshot mode is optional — every query goes to MySQL without it
+    duckdb = None
+    pa = None
+    pq = None
+
+
+@dataclass
+class Snapshot:
+    generation: str
+    path: str
+    connection: Any  # duckdb.DuckDBPyConnection
+    built_at: float
+    tables: List[str]
+    # Table watermarks (MAX(ID), COUNT(*)) read just before the export began
+    marks: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def age_seconds(self) -> float:
+        return time.time() - self.built_at
+
+
+def snapshot_available() -> bool:
+    return settings.SNAPSHOT_ENABLED and duckdb is not None and pa is not None
+
+
+# ---------------------------------------------------------------------------
+# MYSQL -> DUCKDB
+# ---------------------------------------------------------------------------
+
+def _case_insensitive_like(node: exp.Expression) -> exp.Expression:
+    # MySQL's default collation makes LIKE case-insensitive; DuckDB's doesn't.
+    if isinstance(node, exp.Like):
+        return exp.ILike(this=node.this, expression=node.expression)
+    return node
+
+
+@lru_cache(maxsize=512)
+def to_duckdb_sql(sql_query: str) -> Optional[str]:
+    """Transpiled DuckDB SQL for a validated MySQL SELECT, or None if unsupported."""
+    try:
+        parsed = sqlglot.parse_one(sql_query, read="mysql")
+        return parsed.transform(_case_insensitive_like).sql(dialect="duckdb")
+    except Exception as e:
+        print(f"Snapshot: cannot transpile query ({e}).")
+        return None
+
+
+# ---------------------------------------------------------------------------
+# EXPORT
+# ---------------------------------------------------------------------------
+
+# Chunks held back while some column is still NULL in every row seen so far
+_MAX_HELD_CHUNKS = 5
+
+
+def _writer_schema(held: List[Any], final: bool) -> Optional[Any]:
+    """
+    The file schema once every column has a type, or None to keep holding.
+    A column that is NULL in every row is inferred as the null type, which
+    a ParquetWriter can't widen later. After _MAX_HELD_CHUNKS chunks (or at
+    the end of the table) such a column is written as strings.
+    """
+    schema = pa.unify_schemas([batch.schema for batch in held], promote_options="default")
+    untyped = [i for i, column in enumerate(schema) if pa.types.is_null(column.type)]
+    if untyped and not final and len(held) < _MAX_HELD_CHUNKS:
+        return None
+    for i in untyped:
+        schema = schema.set(i, schema.field(i).with_type(pa.string()))
+    return schema
+
+
+def _export_table(table: str, target: str) -> int:
+    """
+    Streams one table to a Parquet file, one row group per chunk, so memory
+    stays bounded by a few chunks. Returns the row count (0 = nothing written).
+    """
+    writer = None
+    held: List[Any] = []
+    rows_written = 0
+    try:
+        for keys, chunk in stream_query(
+            f"SELECT * FROM {table}",
+            timeout_seconds=settings.SNAPSHOT_EXPORT_TIMEOUT_SECONDS,
+            chunk_rows=settings.SNAPSHOT_EXPORT_CHUNK_ROWS,
+        ):
+            columns = list(zip(*chunk))
+            batch = pa.table({key: list(values) for key, values in zip(keys, columns)})
+            rows_written += len(chunk)
+            if writer is None:
+                held.append(batch)
+                schema = _writer_schema(held, final=False)
+                if schema is None:
+                    continue
+                writer = pq.ParquetWriter(target, schema)
+                batches, held = held, []
+            else:
+                batches = [batch]
+            for pending in batches:
+                writer.write_table(pending.cast(writer.schema))
+
+        if writer is None and held:
+            writer = pq.ParquetWriter(target, _writer_schema(held, final=True))
+            for pending in held:
+                writer.write_table(pending.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows_written
+
+
+# ---------------------------------------------------------------------------
+# SNAPSHOT STORE
+# ---------------------------------------------------------------------------
+
+class SnapshotStore:
+    """Owns the current snapshot generation and the background refresher."""
+
+    def __init__(self, tables: List[str], directory: str, refresh_seconds: int):
+        self.tables = [t.lower() for t in tables]
+        self.directory = directory
+        self.refresh_seconds = max(60, refresh_seconds)
+        self._current: Optional[Snapshot] = None
+        self._previous: Optional[Snapshot] = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._sequence = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._metrics: Dict[str, int] = {
+            "hits": 0, "stale_declined": 0, "unsupported": 0, "errors": 0, "builds": 0, "build_failures": 0,
+        }
+
+    def current(self) -> Optional[Snapshot]:
+        with self._lock:
+            return self._current
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self.current()
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._metrics)
+        stats["available"] = snapshot_available()
+        stats["generation"] = snapshot.generation if snapshot else None
+        stats["age_seconds"] = round(snapshot.age_seconds, 1) if snapshot else None
+        return stats
+
+    def _count(self, metric: str) -> None:
+        with self._lock:
+            self._metrics[metric] += 1
+
+    # --- Building ---
+
+    def refresh_once(self) -> bool:
+        if not snapshot_available():
+            return False
+        with self._refresh_lock:
+            self._sequence += 1
+            generation = f"{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}-{self._sequence}"
+            path = os.path.join(self.directory, generation)
+            # Marks first: a row written during the export makes the snapshot
+            # look older than it is, never newer.
+            marks = watermarks.current(frozenset(self.tables))
+            started = time.time()
+            try:
+                os.makedirs(path, exist_ok=True)
+                connection = duckdb.connect(database=":memory:")
+                connection.execute("SET default_collation = 'nocase'")
+                total_rows = 0
+                exported = []
+                for table in self.tables:
+                    target = os.path.join(path, f"{table}.parquet")
+                    slot = acquire_export_slot(settings.SNAPSHOT_EXPORT_TIMEOUT_SECONDS)
+                    if slot is None:
+                        raise RuntimeError(f"no export slot freed up for {table}")
+                    try:
+                        table_rows = _export_table(table, target)
+                    finally:
+                        slot.release()
+                    if not table_rows:
+                        continue  # no file to bind a view to; queries on it stay on MySQL
+                    total_rows += table_rows
+                    exported.append(table)
+                    escaped = target.replace("'", "''")
+                    connection.execute(f"CREATE VIEW {table} AS SELECT * FROM read_parquet('{escaped}')")
+            except Exception as e:
+                self._count("build_failures")
+                print(f"Snapshot build failed: {e}")
+                shutil.rmtree(path, ignore_errors=True)
+                return False
+
+            snapshot = Snapshot(generation, path, connection, started, exported, marks)
+            with self._lock:
+                retired, self._previous, self._current = self._previous, self._current, snapshot
+                self._metrics["builds"] += 1
+            if retired is not None:
+                retired.connection.close()
+                shutil.rmtree(retired.path, ignore_errors=True)
+            print(
+                f"Snapshot {generation} built: {len(exported)} tables, {total_rows} rows "
+                f"in {time.time() - started:.1f}s."
+            )
+            return True
+
+    # --- Serving ---
+
+    def _is_fresh_enough(self, snapshot: Snapshot, tables, max_staleness: float) -> bool:
+        if snapshot.age_seconds <= max_staleness:
+            return True
+        # Older than the budget, but still exact if nothing it reads has moved.
+        # Tables without a watermark can't be checked, so they never qualify.
+        latest = watermarks.current(tables)
+        return set(latest) == set(tables) and all(
+            table in snapshot.marks and snapshot.marks[table] == mark for table, mark in latest.items()
+        )
+
+    def query(self, sql_query: str, max_staleness: float) -> Optional[Tuple[List[Dict[str, Any]], float]]:
+        """
+        (rows, snapshot_age_seconds) from the snapshot, or None when the
+        query must go to MySQL.
+        """
+        if not snapshot_available():
+            return None
+        snapshot = self.current()
+        if snapshot is None:
+            return None
+
+        tables = referenced_tables(sql_query)
+        if not tables or not tables <= set(snapshot.tables):
+            self._count("unsupported")
+            return None
+        if not self._is_fresh_enough(snapshot, tables, max_staleness):
+            self._count("stale_declined")
+            return None
+
+        duck_sql = to_duckdb_sql(sql_query)
+        if duck_sql is None:
+            self._count("unsupported")
+            return None
+
+        # A cursor is a per-thread handle onto the shared in-memory database.
+        cursor = snapshot.connection.cursor()
+        timer = threading.Timer(remaining_budget(settings.QUERY_TIMEOUT_SECONDS), cursor.interrupt)
+        timer.start()
+        try:
+            with cancellable(sql_query, cursor.interrupt):
+                cursor.execute(duck_sql)
+                keys = [column[0] for column in cursor.description]
+                rows = [dict(zip(keys, row)) for row in cursor.fetchmany(MAX_ROWS_HARD_CAP)]
+        except RequestCancelled:
+            return None  # MySQL declines it the same way; not a snapshot error
+        except Exception as e:
+            if cancel_requested():
+                return None  # interrupted on client disconnect
+            self._count("errors")
+            print(f"Snapshot query failed, falling back to MySQL: {e}")
+            return None
+        finally:
+            timer.cancel()
+            cursor.close()
+
+        self._count("hits")
+        return rows, snapshot.age_seconds
+
+    # --- Background refresher ---
+
+    def start(self) -> None:
+        if not snapshot_available():
+            if settings.SNAPSHOT_ENABLED:
+                print("Snapshot mode is enabled but duckdb/pyarrow are not installed; using MySQL only.")
+            return
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="snapshot-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.refresh_once()
+            self._stop.wait(self.refresh_seconds)
+
+
+snapshot_store = SnapshotStore(
+    settings.ALLOWED_TABLES,
+    settings.SNAPSHOT_DIR,
+    settings.SNAPSHOT_REFRESH_SECONDS,
+)
+
+
+def snapshot_query_for(max_staleness: float) -> Callable[[str], Optional[Tuple[List[Dict[str, Any]], float]]]:
+    """An `alternate` source for cached_execute_query() with the given staleness budget."""
+    return lambda sql_query: snapshot_store.query(sql_query, max_staleness)
+
+
+# Summary/dashboard panels tolerate a bounded lag; detail rows don't.
+summary_snapshot_query = snapshot_query_for(settings.SNAPSHOT_MAX_STALENESS_SECONDS)
+detail_snapshot_query = snapshot_query_for(0)
@@ -0,0 +1,35 @@
+"""
+db/summary_totals.py
+
+True grand totals for summary results that hit the MAX_ROWS_LIMIT cap.
+
+A company breakdown can have more groups than the 500-row cap. Summing the
+rows that survived the cap under-reports the total without any warning. When
+the cap is hit, the companion aggregate from derive_totals_sql() runs over
+the same FROM / JOIN / WHERE, so KPI totals and the chart's "Other" bucket
+reflect every group.
+"""
+
+from typing import Any, Dict, Optional
+
+from db.rollup_planner import execute_summary_query
+from rules.sql_validator import derive_totals_sql
+
+
+def fetch_true_totals(safe_sql: str) -> Optional[Dict[str, Any]]:
+    """
+    Runs the companion totals query for a grouped summary query.
+
+    Returns {column: grand_total, ..., "GroupCount": n}, or None if the query
+    isn't grouped or the totals query failed (callers then fall back to the
+    capped rows).
+    """
+    totals_sql = derive_totals_sql(safe_sql)
+    if totals_sql is None:
+        return None
+
+    is_success, rows, error, _ = execute_summary_query(totals_sql)
+    if not is_success or not rows:
+        print(f"Summary totals query failed, totals limited to capped rows: {error}")
+        return None
+    return rows[0]
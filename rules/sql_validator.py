@@ -15,17 +15,19 @@ from typing import Dict, Any, Optional
 # Summary queries get the full MAX_ROWS_LIMIT.
 #
 # DETAIL queries are raw ticket rows. These CAN be huge (10k+ rows). Cap at
-# MAX_ROWS_LIMIT (500) to protect the DB and the frontend. pipeline.py then
-# further slices to DETAIL_PREVIEW_LIMIT (50) for the API response, while
-# reporting the true total count in the summary text.
+# MAX_ROWS_LIMIT (500) to protect the DB and the frontend. At execution time
+# the detail path derives a DETAIL_PREVIEW_LIMIT (50) preview and an exact
+# COUNT(*) from the validated SQL (see derive_preview_sql / derive_count_sql)
+# and reports the true total count in the summary text.
 # ---------------------------------------------------------------------------
 SUMMARY_LIMIT = settings.MAX_ROWS_LIMIT  # 500 — full grouped result, never hide companies
-DETAIL_LIMIT  = settings.MAX_ROWS_LIMIT  # 500 — DB-level cap; pipeline slices to 50 for display
+DETAIL_LIMIT  = settings.MAX_ROWS_LIMIT  # 500 — DB-level cap; the detail path fetches a 50-row preview
 
 
 def validate_and_format_sql(
     sql_query: str,
-    intent: Optional[str] = None
+    intent: Optional[str] = None,
+    max_rows: Optional[int] = None
 ) -> Dict[str, Any]:
     """
     Parses the LLM-generated SQL using an Abstract Syntax Tree (AST).
@@ -35,6 +37,8 @@ def validate_and_format_sql(
         sql_query: Raw SQL string from the LLM.
         intent:    'summary' or 'detail' — used to enforce the correct LIMIT cap.
                    Defaults to 'detail' (more permissive) if not provided.
+        max_rows:  Overrides the intent cap. Only the export path uses this,
+                   with its own separate EXPORT_MAX_ROWS budget.
 
     Returns a dict:
         {
@@ -45,6 +49,8 @@ def validate_and_format_sql(
     """
     # Resolve the correct row cap for this intent so we can enforce it below.
     effective_limit = SUMMARY_LIMIT if intent == "summary" else DETAIL_LIMIT
+    if max_rows is not None:
+        effective_limit = max_rows
 
     # ------------------------------------------------------------------
     # STEP 1 — Parse
@@ -193,6 +199,263 @@ def validate_and_format_sql(
     }
 
 
+# ---------------------------------------------------------------------------
+# DERIVED QUERIES
+# Built from an already-validated safe_sql by rewriting its AST, so the
+# FROM / JOIN / WHERE clauses — i.e. the filters — are guaranteed identical
+# to the query the user's answer is based on.
+# ---------------------------------------------------------------------------
+
+def derive_preview_sql(safe_sql: str, preview_limit: int) -> Optional[str]:
+    """
+    Returns safe_sql with its LIMIT lowered to `preview_limit` (never raised).
+    Returns None if the SQL cannot be parsed.
+    """
+    try:
+        parsed = sqlglot.parse_one(safe_sql, read="mysql")
+    except Exception:
+        return None
+
+    current = _limit_value(parsed)
+    if current is None or current > preview_limit:
+        parsed.set("limit", exp.Limit(expression=exp.Literal.number(preview_limit)))
+    return parsed.sql(dialect="mysql")
+
+
+def derive_count_sql(safe_sql: str) -> Optional[str]:
+    """
+    Builds a `SELECT COUNT(*) AS TotalCount` query that counts every row the
+    validated query matches, ignoring the DB-level MAX_ROWS_LIMIT cap.
+
+      - Plain row selects: the select list is swapped for COUNT(*) and
+        ORDER BY / LIMIT are dropped — MySQL can then count off an index.
+      - GROUP BY / DISTINCT / HAVING / aggregate selects: the query is
+        wrapped as a derived table so the count is of result rows, not of
+        underlying tickets.
+      - A LIMIT the LLM wrote on purpose (below the cap, e.g. "top 10") is
+        kept, via the wrapped form, so the total never exceeds it.
+
+    Returns None if the SQL cannot be parsed.
+    """
+    try:
+        parsed = sqlglot.parse_one(safe_sql, read="mysql")
+    except Exception:
+        return None
+
+    if not isinstance(parsed, exp.Select):
+        return None
+
+    user_limit = _limit_value(parsed)
+    keep_limit = user_limit is not None and user_limit < DETAIL_LIMIT
+
+    parsed.set("order", None)
+    if not keep_limit:
+        parsed.set("limit", None)
+
+    is_grouped = bool(
+        parsed.args.get("group")
+        or parsed.args.get("distinct")
+        or parsed.args.get("having")
+        or any(e.find(exp.AggFunc) for e in parsed.expressions)
+    )
+
+    count_expr = exp.alias_(exp.Count(this=exp.Star()), "TotalCount")
+
+    if is_grouped:
+        counted = exp.select(count_expr).from_(parsed.subquery("_counted"))
+    elif keep_limit:
+        # Only the row count matters — selecting a constant also avoids
+        # "duplicate column name" errors on the derived table.
+        inner = parsed.select(exp.Literal.number(1), append=False)
+        counted = exp.select(count_expr).from_(inner.subquery("_counted"))
+    else:
+        counted = parsed.select(count_expr, append=False)
+
+    return counted.sql(dialect="mysql")
+
+
+# Column holding the number of groups in a derive_totals_sql() result.
+TOTALS_GROUP_COUNT_COLUMN = "GroupCount"
+
+
+def derive_totals_sql(safe_sql: str) -> Optional[str]:
+    """
+    Builds the companion aggregate for a grouped summary query: the grand
+    total of every additive column (an aliased COUNT(...) or SUM(...)) across
+    ALL groups, plus the number of groups, ignoring the MAX_ROWS_LIMIT cap.
+
+      SELECT SUM(_grouped.Count) AS Count, COUNT(*) AS GroupCount
+      FROM (<safe_sql without ORDER BY / LIMIT>) AS _grouped
+
+    A LIMIT the LLM wrote on purpose ("top 10") is kept, as in
+    derive_count_sql. Non-additive columns (AVG, MIN, ...) are left out.
+    Returns None if the query is not grouped or cannot be parsed.
+    """
+    try:
+        parsed = sqlglot.parse_one(safe_sql, read="mysql")
+    except Exception:
+        return None
+
+    if not isinstance(parsed, exp.Select) or not parsed.args.get("group"):
+        return None
+
+    user_limit = _limit_value(parsed)
+    parsed.set("order", None)
+    if user_limit is None or user_limit >= SUMMARY_LIMIT:
+        parsed.set("limit", None)
+
+    totals = [
+        exp.alias_(exp.Sum(this=exp.column(e.alias, table="_grouped")), e.alias)
+        for e in parsed.expressions
+        if isinstance(e, exp.Alias) and isinstance(e.this, (exp.Count, exp.Sum))
+    ]
+    totals.append(exp.alias_(exp.Count(this=exp.Star()), TOTALS_GROUP_COUNT_COLUMN))
+
+    return exp.select(*totals).from_(parsed.subquery("_grouped")).sql(dialect="mysql")
+
+
+# Keyset columns appended to paginated detail queries and stripped from rows
+# before they reach the client.
+CURSOR_DATE_COLUMN = "_cursor_date"
+CURSOR_ID_COLUMN = "_cursor_id"
+
+# Ticket table -> the date column detail results are ordered by (mirrors
+# the DETAIL MODE rule in prompt_builder.py).
+KEYSET_DATE_COLUMNS = {
+    "corporate_tickets": "CreatedDate",
+    "ppm_tickets": "PPMDate",
+}
+
+
+def derive_keyset_page_sql(
+    safe_sql: str,
+    page_size: int,
+    after: Optional[tuple] = None,
+) -> Optional[str]:
+    """
+    Rewrites a validated detail query into one page of a keyset scan on
+    (date_col DESC, ID DESC) of its base ticket table.
+
+      - The select list gets `date_col AS _cursor_date, ID AS _cursor_id`.
+      - `after` = (date_value, id) of the last row already served adds the
+        seek predicate. MySQL sorts NULL dates last in DESC order, so once
+        the cursor reaches a NULL date only NULL-dated rows remain.
+      - LIMIT is page_size + 1 so the caller can tell whether another page
+        exists without a second query.
+
+    Returns None if the query is not a plain row select on corporate_tickets
+    or ppm_tickets, or if it is ordered by something other than the date
+    column (keyset order would silently change the result order).
+    """
+    try:
+        parsed = sqlglot.parse_one(safe_sql, read="mysql")
+    except Exception:
+        return None
+
+    if not isinstance(parsed, exp.Select):
+        return None
+    if parsed.args.get("group") or parsed.args.get("distinct") or parsed.args.get("having"):
+        return None
+    if any(e.find(exp.AggFunc) for e in parsed.expressions):
+        return None
+
+    from_clause = parsed.find(exp.From)
+    base = from_clause.this if from_clause else None
+    if not isinstance(base, exp.Table) or base.name.lower() not in KEYSET_DATE_COLUMNS:
+        return None
+
+    alias = base.alias_or_name
+    date_name = KEYSET_DATE_COLUMNS[base.name.lower()]
+
+    def date_col() -> exp.Column:
+        return exp.column(date_name, table=alias)
+
+    def id_col() -> exp.Column:
+        return exp.column("ID", table=alias)
+
+    # Existing ORDER BY must already lead with the date column, descending.
+    order = parsed.args.get("order")
+    if order and order.expressions:
+        first = order.expressions[0]
+        leading = first.this
+        if not (
+            first.args.get("desc")
+            and isinstance(leading, exp.Column)
+            and leading.name.lower() == date_name.lower()
+            and leading.table.lower() in ("", alias.lower())
+        ):
+            return None
+
+    parsed = parsed.select(
+        exp.alias_(date_col(), CURSOR_DATE_COLUMN),
+        exp.alias_(id_col(), CURSOR_ID_COLUMN),
+    )
+    parsed = parsed.order_by(
+        exp.Ordered(this=date_col(), desc=True),
+        exp.Ordered(this=id_col(), desc=True),
+        append=False,
+    )
+
+    if after is not None:
+        after_date, after_id = after
+        id_before = exp.LT(this=id_col(), expression=exp.Literal.number(int(after_id)))
+        if after_date is None:
+            seek = exp.and_(exp.Is(this=date_col(), expression=exp.Null()), id_before)
+        else:
+            date_value = exp.Literal.string(str(after_date))
+            seek = exp.or_(
+                exp.LT(this=date_col(), expression=date_value.copy()),
+                exp.and_(exp.EQ(this=date_col(), expression=date_value.copy()), id_before),
+                exp.Is(this=date_col(), expression=exp.Null()),
+            )
+        parsed = parsed.where(exp.paren(seek), append=True)
+
+    parsed.set("limit", exp.Limit(expression=exp.Literal.number(page_size + 1)))
+    return parsed.sql(dialect="mysql")
+
+
+def derive_export_sql(safe_sql: str, intent: str, export_limit: int) -> Dict[str, Any]:
+    """
+    Re-validates a stored safe_sql for a full export: the MAX_ROWS_LIMIT cap
+    the validator injected is replaced by `export_limit`, while a smaller
+    LIMIT the user asked for is kept. Returns the usual validator dict.
+    """
+    try:
+        parsed = sqlglot.parse_one(safe_sql, read="mysql")
+    except Exception as e:
+        return _fail(f"The stored SQL could not be parsed: {str(e)}")
+
+    limit = _limit_value(parsed)
+    if limit is not None and limit >= DETAIL_LIMIT:
+        parsed.set("limit", None)
+
+    return validate_and_format_sql(parsed.sql(dialect="mysql"), intent=intent, max_rows=export_limit)
+
+
+def user_row_limit(safe_sql: str) -> Optional[int]:
+    """
+    LIMIT the LLM wrote on purpose (below the MAX_ROWS_LIMIT cap, e.g. "top 10"),
+    or None when the only LIMIT is the validator's cap.
+    """
+    try:
+        parsed = sqlglot.parse_one(safe_sql, read="mysql")
+    except Exception:
+        return None
+    limit = _limit_value(parsed)
+    return limit if limit is not None and limit < DETAIL_LIMIT else None
+
+
+def _limit_value(parsed: exp.Expression) -> Optional[int]:
+    """Integer LIMIT of a parsed query, or None if absent / not a literal."""
+    limit_clause = parsed.args.get("limit")
+    if not limit_clause:
+        return None
+    try:
+        return int(limit_clause.expression.name)
+    except (ValueError, AttributeError):
+        return None
+
+
 def _fail(message: str) -> Dict[str, Any]:
     """Convenience constructor for rejection responses."""
     return {
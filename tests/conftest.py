@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The ai/ modules build their LLM clients at import time; tests never call them.
+os.environ.setdefault("LLM_API_KEY", "test-key")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
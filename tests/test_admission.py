@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from core.admission import OverloadedError, ResourceLimiter, background_work
+
+
+def test_background_work_takes_a_free_slot():
+    limiter = ResourceLimiter("test", limit=1, max_queue=4, max_wait_seconds=1)
+
+    async def main():
+        with background_work():
+            async with limiter.slot():
+                return limiter.stats()["in_use"]
+
+    assert asyncio.run(main()) == 1
+
+
+def test_background_work_never_queues():
+    limiter = ResourceLimiter("test", limit=1, max_queue=4, max_wait_seconds=1)
+
+    async def main():
+        async with limiter.slot():
+            with background_work():
+                with pytest.raises(OverloadedError):
+                    async with limiter.slot():
+                        pass
+        return limiter.stats()
+
+    stats = asyncio.run(main())
+    assert stats["shed_background"] == 1 and stats["queued"] == 0
+
+
+def test_interactive_caller_queues_then_sheds_past_the_queue():
+    limiter = ResourceLimiter("test", limit=1, max_queue=1, max_wait_seconds=1)
+
+    async def hold(event):
+        async with limiter.slot():
+            await event.wait()
+
+    async def main():
+        event = asyncio.Event()
+        holder = asyncio.create_task(hold(event))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(hold(event))
+        await asyncio.sleep(0)
+        with pytest.raises(OverloadedError):
+            async with limiter.slot():
+                pass
+        event.set()
+        await asyncio.gather(holder, waiter)
+        return limiter.stats()
+
+    stats = asyncio.run(main())
+    assert stats["shed_queue_full"] == 1 and stats["admitted"] == 2
@@ -0,0 +1,52 @@
+import json
+
+from db.audit_logger import AUDIT_COLUMNS, AuditSink
+
+
+def _sink(tmp_path):
+    sink = AuditSink(max_queue=10, batch_size=2, flush_interval_ms=50, spill_path=str(tmp_path / "spill.jsonl"))
+    written = []
+    sink._write_batch = written.extend
+    return sink, written
+
+
+def _line(user_query):
+    return json.dumps({col: (user_query if col == "UserQuery" else None) for col in AUDIT_COLUMNS}) + "\n"
+
+
+def test_replay_skips_torn_lines(tmp_path):
+    sink, written = _sink(tmp_path)
+    (tmp_path / "spill.jsonl").write_text(_line("a") + '{"SessionID": "x", "UserQu\n' + _line("b"))
+
+    sink._replay_spill()
+
+    assert [event[AUDIT_COLUMNS.index("UserQuery")] for event in written] == ["a", "b"]
+    assert sink.metrics()["dropped"] == 1
+    assert not (tmp_path / "spill.jsonl.replay").exists()
+
+
+def test_replay_keeps_orphaned_replay_file(tmp_path):
+    sink, written = _sink(tmp_path)
+    (tmp_path / "spill.jsonl.replay").write_text(_line("old") + '{"torn')
+    (tmp_path / "spill.jsonl").write_text(_line("new"))
+
+    sink._replay_spill()
+
+    assert [event[AUDIT_COLUMNS.index("UserQuery")] for event in written] == ["old", "new"]
+    assert not (tmp_path / "spill.jsonl").exists()
+    assert not (tmp_path / "spill.jsonl.replay").exists()
+
+
+def test_failed_replay_respills_remaining_events(tmp_path):
+    sink, _ = _sink(tmp_path)
+
+    def unreachable(batch):
+        raise RuntimeError("MySQL down")
+
+    sink._write_batch = unreachable
+    (tmp_path / "spill.jsonl").write_text(_line("a") + _line("b") + _line("c"))
+
+    sink._replay_spill()
+
+    assert sink.metrics()["spill_backlog"] == 3
+    assert not (tmp_path / "spill.jsonl.replay").exists()
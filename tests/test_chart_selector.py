@@ -0,0 +1,13 @@
+import pytest
+
+from aggregator.chart_selector import _is_additive
+
+
+@pytest.mark.parametrize("column", ["CorporateTickets", "TerminalCount", "MinutesOpen", "Count", "Tickets"])
+def test_counts_are_additive(column):
+    assert _is_additive(column)
+
+
+@pytest.mark.parametrize("column", ["AvgDaysToClose", "avg_resolution_days", "SLAPct", "MaxTAT", "ResolutionRate"])
+def test_averages_and_rates_are_not_additive(column):
+    assert not _is_additive(column)
@@ -0,0 +1,92 @@
+import pytest
+
+from ai.context_answerer import ChartDigest, ResultDigest, answer_context_question
+from ai.prefetcher import state_fingerprint
+
+STATE = {"domain": "corporate_tickets", "intent": "detail", "company_name": "Tata", "timeframe": "2024"}
+
+
+def _digest(state=STATE, **overrides):
+    fields = dict(
+        state_fingerprint=state_fingerprint(state),
+        intent=state["intent"],
+        domain=state["domain"],
+        filters={"company_name": "Tata", "timeframe": "2024"},
+        row_count=50,
+        total_count=312,
+    )
+    fields.update(overrides)
+    return ResultDigest(**fields)
+
+
+@pytest.mark.parametrize("question", [
+    "how many did you just fetch?",
+    "how many tickets did you find",
+    "how many rows are in this list?",
+    "how many are there in this table?",
+    "how many records are shown?",
+])
+def test_strict_count_about_the_view(question):
+    answer = answer_context_question(question, _digest(), STATE, strict=True)
+    assert answer is not None and "**312**" in answer
+
+
+@pytest.mark.parametrize("question", [
+    "how many records are there for reliance this month?",
+    "how many entries are in mumbai branch this year",
+    "how many results are on hold in this quarter",
+    "how many tickets did you fetch for reliance?",
+    "how many are in this list for 2023?",
+])
+def test_strict_count_declines_new_data_questions(question):
+    assert answer_context_question(question, _digest(), STATE, strict=True) is None
+
+
+@pytest.mark.parametrize("question", [
+    "which status are these tickets in?",
+    "which priority are these?",
+    "what filters are applied for reliance?",
+    "which branch is selected?",
+])
+def test_strict_filters_declines_unfiltered_dimensions(question):
+    assert answer_context_question(question, _digest(), STATE, strict=True) is None
+
+
+@pytest.mark.parametrize("question", [
+    "what filters are applied?",
+    "which filters are active on this view",
+    "which company is filtered?",
+])
+def test_strict_filters_question(question):
+    answer = answer_context_question(question, _digest(), STATE, strict=True)
+    assert answer is not None and "Company: Tata" in answer
+
+
+def test_is_this_compares_the_period():
+    assert answer_context_question("is this from 2024?", _digest(), STATE).startswith("Yes")
+    assert answer_context_question("is this from 2023?", _digest(), STATE).startswith("No")
+
+
+def test_digest_for_another_state_is_ignored():
+    moved = {**STATE, "status": "Open"}
+    assert answer_context_question("how many did you just fetch?", _digest(), moved) is None
+
+
+def test_summary_without_ticket_total_states_no_count():
+    state = {**STATE, "intent": "summary"}
+    digest = _digest(state, total_count=None, row_count=7)
+    assert answer_context_question("how many tickets are there?", digest, state, strict=False) is None
+
+
+def test_top_answered_only_for_the_charts_dimension():
+    state = {**STATE, "intent": "summary"}
+    chart = ChartDigest(
+        title="Tickets by Company", type="bar", x_key="CompanyName",
+        labels=["Tata", "Reliance"], values=[40.0, 25.0],
+    )
+    digest = _digest(state, charts=[chart])
+    answer = answer_context_question("which company has the most?", digest, state, strict=False)
+    assert "**Tata**" in answer
+    assert answer_context_question("which company has the most?", digest, state, strict=True) is None
+    assert answer_context_question("which branch has the most?", digest, state, strict=False) is None
+    assert answer_context_question("which company has the most this month?", digest, state, strict=False) is None
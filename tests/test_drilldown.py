@@ -0,0 +1,82 @@
+import pytest
+
+from ai.drilldown import _build_predicate, _is_narrowing, _like_regex
+
+CORPORATE_COLUMNS = {
+    "TicketID", "CompanyName", "CorporateName", "BranchSite", "BranchCity", "BranchState",
+    "Status", "Priority", "Type", "Service", "CreatedDate",
+}
+
+BASE = {"intent": "detail", "domain": "corporate_tickets", "company_name": "Reliance"}
+
+
+@pytest.mark.parametrize("new, expected", [
+    ({**BASE, "status": "Open"}, ["status"]),
+    ({**BASE, "status": "Open", "timeframe": "March 2025"}, ["timeframe", "status"]),
+    ({**BASE, "branch_name": ["Mumbai"]}, ["branch_name"]),
+])
+def test_adding_filters_is_narrowing(new, expected):
+    assert _is_narrowing(BASE, new) == expected
+
+
+def test_branch_subset_is_narrowing():
+    previous = {**BASE, "branch_name": ["Mumbai", "Pune"]}
+    assert _is_narrowing(previous, {**BASE, "branch_name": ["Pune"]}) == ["branch_name"]
+
+
+@pytest.mark.parametrize("previous, new", [
+    (BASE, BASE),                                                        # nothing changed
+    (BASE, {**BASE, "company_name": None}),                              # filter removed
+    (BASE, {**BASE, "company_name": "Tata"}),                            # filter replaced
+    ({**BASE, "branch_name": ["Pune"]}, {**BASE, "branch_name": ["Pune", "Mumbai"]}),
+    ({**BASE, "status": "Open"}, {**BASE, "status": ["Open", "Closed"]}),
+    (BASE, {**BASE, "status": "Open", "intent": "summary"}),             # not a detail list
+    (BASE, {**BASE, "status": "Open", "domain": "ppm_tickets"}),         # other table
+])
+def test_widening_or_sideways_moves_are_not_narrowing(previous, new):
+    assert _is_narrowing(previous, new) is None
+
+
+@pytest.mark.parametrize("key, value, is_ppm, expected", [
+    ("status", "Closed", False, (["Status"], ["Closed"])),
+    ("priority", ["High", "Critical"], False, (["Priority"], ["High", "Critical"])),
+    ("service_type", "AMC", False, (["Type"], ["%AMC%"])),
+    ("service_type", "Plumbing", False, (["Service"], ["%Plumbing%"])),
+    ("timeframe", "March 2025", False, (["CreatedDate"], ["2025-03-%", "%-03-2025"])),
+    ("branch_name", "Mumbai", False, (["BranchSite", "BranchCity", "BranchState"], ["%Mumba%"])),
+    ("company_name", "Reliance", False, (["CompanyName", "CorporateName"], ["%Reliance%"])),
+])
+def test_build_predicate_mirrors_the_prompt_rules(key, value, is_ppm, expected):
+    assert _build_predicate(key, value, CORPORATE_COLUMNS, is_ppm) == expected
+
+
+def test_status_falls_back_to_current_status():
+    assert _build_predicate("status", "Open", {"CurrentStatus"}, False) == (["CurrentStatus"], ["Open"])
+
+
+@pytest.mark.parametrize("key, value, columns, is_ppm", [
+    ("status", "Open", {"TicketID"}, False),                              # column not in the rows
+    ("priority", "High", CORPORATE_COLUMNS, True),                        # PPM has no priority column
+    ("service_type", "AMC", CORPORATE_COLUMNS, True),                     # PPM service goes via report tables
+    ("timeframe", "last quarter", CORPORATE_COLUMNS, False),              # not templatable
+    ("timeframe", "March 2025", CORPORATE_COLUMNS, True),                 # PPMDate missing
+    ("branch_name", "Mumbai", {"BranchSite", "BranchCity"}, False),       # partial location columns
+    ("company_name", "Reliance", {"CompanyName"}, False),
+    ("unknown_key", "x", CORPORATE_COLUMNS, False),
+])
+def test_build_predicate_declines_what_it_cannot_evaluate_exactly(key, value, columns, is_ppm):
+    assert _build_predicate(key, value, columns, is_ppm) is None
+
+
+@pytest.mark.parametrize("pattern, text, matches", [
+    ("%Mumba%", "Navi Mumbai", True),
+    ("Closed", "closed", True),
+    ("Closed", "Closed - Verified", False),
+    ("2025-03-%", "2025-03-14", True),
+    ("%-03-2025", "14-03-2025", True),
+    ("2025-03-%", "2025-13-03", False),
+    ("a_c", "abc", True),
+    ("50.0%", "5000", False),
+])
+def test_like_regex_follows_mysql_like(pattern, text, matches):
+    assert bool(_like_regex(pattern).fullmatch(text)) is matches
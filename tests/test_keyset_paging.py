@@ -0,0 +1,127 @@
+import base64
+import json
+import sqlite3
+
+import pytest
+import sqlglot
+
+from db.detail_query import InvalidCursorError, decode_cursor, encode_cursor
+from rules.sql_validator import CURSOR_DATE_COLUMN, CURSOR_ID_COLUMN, derive_keyset_page_sql
+
+# Duplicate dates, NULL dates, and IDs that don't follow date order.
+TICKETS = [
+    (1, "2025-01-03", "Acme"),
+    (2, "2025-01-03", "Acme"),
+    (3, None, "Acme"),
+    (4, "2025-01-01", "Beta"),
+    (5, "2025-01-03", "Beta"),
+    (6, None, "Beta"),
+    (7, "2025-01-02", "Acme"),
+    (8, "2025-01-01", "Acme"),
+    (9, None, "Acme"),
+    (10, "2025-01-02", "Beta"),
+]
+
+BASE_SQL = "SELECT TicketID, CompanyName, CreatedDate FROM corporate_tickets ORDER BY CreatedDate DESC"
+
+
+@pytest.fixture
+def db():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.execute("CREATE TABLE corporate_tickets (ID INTEGER, TicketID TEXT, CreatedDate TEXT, CompanyName TEXT)")
+    conn.executemany(
+        "INSERT INTO corporate_tickets VALUES (?, ?, ?, ?)",
+        [(i, f"T{i}", date, company) for i, date, company in TICKETS],
+    )
+    yield conn
+    conn.close()
+
+
+def _run(conn, mysql_sql):
+    return [dict(row) for row in conn.execute(sqlglot.transpile(mysql_sql, read="mysql", write="sqlite")[0])]
+
+
+def _page_through(conn, base_sql, page_size):
+    """Follows encoded cursors page by page, as the paging endpoint does."""
+    ids, cursor = [], None
+    while True:
+        after = None
+        if cursor is not None:
+            last_date, last_id, _ = decode_cursor(cursor)
+            after = (last_date, last_id)
+        rows = _run(conn, derive_keyset_page_sql(base_sql, page_size, after))
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        ids += [row[CURSOR_ID_COLUMN] for row in rows]
+        if not has_more:
+            return ids
+        last = rows[-1]
+        cursor = encode_cursor(last[CURSOR_DATE_COLUMN], last[CURSOR_ID_COLUMN], len(ids))
+
+
+# Date DESC (NULL dates last, as in MySQL), then ID DESC.
+EXPECTED = [5, 2, 1, 10, 7, 8, 4, 9, 6, 3]
+
+
+@pytest.mark.parametrize("page_size", [1, 2, 3, 4, 10, 50])
+def test_keyset_pages_cover_every_row_once_in_order(db, page_size):
+    assert _page_through(db, BASE_SQL, page_size) == EXPECTED
+
+
+def test_keyset_pages_keep_the_user_filter(db):
+    sql = "SELECT TicketID FROM corporate_tickets WHERE CompanyName = 'Acme' ORDER BY CreatedDate DESC"
+    assert _page_through(db, sql, 2) == [2, 1, 7, 8, 9, 3]
+
+
+def test_seek_after_a_null_date_only_returns_older_null_rows(db):
+    rows = _run(db, derive_keyset_page_sql(BASE_SQL, 10, after=(None, 9)))
+    assert [row[CURSOR_ID_COLUMN] for row in rows] == [6, 3]
+
+
+def test_seek_within_duplicate_dates_uses_the_id(db):
+    rows = _run(db, derive_keyset_page_sql(BASE_SQL, 10, after=("2025-01-03", 2)))
+    assert [row[CURSOR_ID_COLUMN] for row in rows] == [1, 10, 7, 8, 4, 9, 6, 3]
+
+
+def test_cursor_date_is_quoted_as_a_literal(db):
+    # Compared as one string, so it sorts just after '2025-01-02': the
+    # 2025-01-03 rows stay excluded instead of the OR matching everything.
+    rows = _run(db, derive_keyset_page_sql(BASE_SQL, 10, after=("2025-01-02' OR '1'='1", 0)))
+    assert [row[CURSOR_ID_COLUMN] for row in rows] == [10, 7, 8, 4, 9, 6, 3]
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT CompanyName, COUNT(*) FROM corporate_tickets GROUP BY CompanyName",
+    "SELECT TicketID FROM corporate_tickets ORDER BY CompanyName",
+    "SELECT TicketID FROM corporate_tickets ORDER BY CreatedDate ASC",
+    "SELECT * FROM corporate_users",
+])
+def test_keyset_declines_queries_it_would_reorder(sql):
+    assert derive_keyset_page_sql(sql, 10) is None
+
+
+@pytest.mark.parametrize("last_date", ["2025-01-03", None])
+def test_cursor_round_trip(last_date):
+    assert decode_cursor(encode_cursor(last_date, 42, 100)) == (last_date, 42, 100)
+
+
+def _b64(payload: str) -> str:
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "!!not-base64!!",
+    _b64("not json"),
+    _b64(json.dumps({"date": "2025-01-01", "id": 1})),
+    _b64(json.dumps(["2025-01-01", 1])),
+    _b64(json.dumps(["2025-01-01", "1; DROP TABLE x", 0])),
+    _b64(json.dumps([None, None, 0])),
+    _b64(json.dumps([["2025-01-01"], 1, 0])),
+    _b64(json.dumps("a12")),
+    encode_cursor("2025-01-01", 1, 5)[:-3],
+])
+def test_tampered_cursors_are_rejected(cursor):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor)
@@ -0,0 +1,19 @@
+from ai.panel_templates import compile_panel_sql
+
+
+def test_multi_valued_filters_keep_every_value():
+    sql = compile_panel_sql("status", {
+        "status": ["Open", "Closed"], "priority": ["High", "Low"], "service_type": ["AMC", "CCTV"],
+    })
+    assert "ct.Status IN ('Open', 'Closed')" in sql
+    assert "ct.Priority IN ('High', 'Low')" in sql
+    assert "(ct.Type LIKE '%AMC%' OR ct.Service LIKE '%CCTV%')" in sql
+
+
+def test_single_value_filter_is_an_equality():
+    sql = compile_panel_sql("company", {"status": "Open"})
+    assert "ct.Status = 'Open'" in sql
+
+
+def test_ppm_priority_needs_the_llm():
+    assert compile_panel_sql("status", {"domain": "ppm_tickets", "priority": "High"}) is None
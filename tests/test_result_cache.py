@@ -0,0 +1,50 @@
+from db import result_cache
+from db.result_cache import TableWatermarks
+
+
+class FakeTable:
+    def __init__(self):
+        self.max_id, self.rows = 10, 10
+        self.queries = []
+
+    def execute_query(self, sql):
+        self.queries.append(sql)
+        if "COUNT(*)" in sql:
+            return True, [{"MaxID": self.max_id, "RowCount": self.rows}], ""
+        return True, [{"MaxID": self.max_id}], ""
+
+
+def _poller(monkeypatch, count_poll_seconds=300):
+    table = FakeTable()
+    monkeypatch.setattr(result_cache, "execute_query", table.execute_query)
+    return table, TableWatermarks(["tickets"], poll_seconds=10, count_poll_seconds=count_poll_seconds)
+
+
+def _counts(table):
+    return sum("COUNT(*)" in sql for sql in table.queries)
+
+
+def test_count_only_runs_when_max_id_moves(monkeypatch):
+    table, poller = _poller(monkeypatch)
+    poller.poll_once()
+    poller.poll_once()
+    poller.poll_once()
+    assert _counts(table) == 1
+    assert poller.current(frozenset(["tickets"])) == {"tickets": (10, 10)}
+
+    table.max_id, table.rows = 12, 12
+    poller.poll_once()
+    assert _counts(table) == 2
+    assert poller.current(frozenset(["tickets"])) == {"tickets": (12, 12)}
+
+
+def test_deletes_are_seen_on_the_count_schedule(monkeypatch):
+    table, poller = _poller(monkeypatch)
+    poller.poll_once()
+    table.rows = 8
+    poller.poll_once()
+    assert poller.current(frozenset(["tickets"])) == {"tickets": (10, 10)}
+
+    poller._counted_at["tickets"] -= 300
+    poller.poll_once()
+    assert poller.current(frozenset(["tickets"])) == {"tickets": (10, 8)}
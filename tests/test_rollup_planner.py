@@ -0,0 +1,169 @@
+import pytest
+
+from db.rollup_planner import _Ineligible, plan_rollup_query, run_plan
+from db.rollups import ROLLUP_SPECS, RollupTable
+from rules.sql_validator import derive_totals_sql
+
+SPEC = ROLLUP_SPECS["corporate_tickets"]
+JOINS = (
+    "FROM corporate_tickets AS ct "
+    "LEFT JOIN company ON ct.CorporateID = company.ID "
+    "LEFT JOIN corporate ON company.CorporateName = corporate.ID "
+    "LEFT JOIN branch ON ct.BranchID = branch.ID"
+)
+
+
+def _group(company, city, status, date_key, tickets, is_month=True, rows=None):
+    group = dict.fromkeys(SPEC.fields)
+    group.update(
+        CompanyName=company, CorporateName=company and f"{company} Group", BranchSite=city and f"{city} Site",
+        BranchCity=city, BranchState=city and "MH", Status=status, Priority="High", Type="AMC",
+        Service="CCTV", DateKey=date_key, DateIsMonth=is_month,
+        Tickets=tickets, RowCount=tickets if rows is None else rows,
+    )
+    return group
+
+
+FIXTURE = RollupTable("corporate_tickets", [
+    _group("Tata", "Mumbai", "Open", "2025-01", 5),
+    _group("Tata", "Pune", "Closed", "2025-01", 3),
+    _group("Reliance", "Mumbai", "Open", "2025-02", 4),
+    _group("Reliance", None, "Closed", "2025-02", 2),
+    _group("Tata", "Mumbai", "Open", "15/01/2025", 1, is_month=False),
+    _group(None, "Mumbai", "open", "2025-03", 0, rows=1),  # NULL TicketID, lower-case status
+], max_id=100, row_total=16, built_at=0.0)
+
+
+def _run(sql):
+    plan = plan_rollup_query(sql)
+    assert plan is not None, sql
+    return run_plan(plan, FIXTURE.project(plan.fields))
+
+
+# ---------------------------------------------------------------------------
+# ELIGIBILITY
+# ---------------------------------------------------------------------------
+
+@pytest.mark.parametrize("sql", [
+    "SELECT ct.Status AS CurrentStatus, COUNT(ct.TicketID) AS Count FROM corporate_tickets AS ct "
+    "GROUP BY ct.Status ORDER BY Count DESC LIMIT 500",
+    f"SELECT company.CompanyName, COUNT(*) AS Count {JOINS} WHERE branch.BranchCity LIKE '%mum%' "
+    "GROUP BY company.CompanyName ORDER BY Count DESC LIMIT 10",
+    "SELECT LEFT(ct.CreatedDate, 7) AS TimePeriod, COUNT(ct.TicketID) AS Count FROM corporate_tickets AS ct "
+    "WHERE ct.Status IN ('Open', 'Closed') GROUP BY TimePeriod ORDER BY TimePeriod ASC LIMIT 500",
+])
+def test_eligible_queries_are_planned(sql):
+    assert plan_rollup_query(sql) is not None
+
+
+@pytest.mark.parametrize("sql", [
+    # table outside the rollup
+    "SELECT s.Status, COUNT(*) AS Count FROM corporate_tickets AS ct "
+    "LEFT JOIN ppm_ticket_status AS s ON ct.Status = s.ID GROUP BY s.Status",
+    # HAVING, DISTINCT, other aggregates
+    "SELECT ct.Status, COUNT(ct.TicketID) AS Count FROM corporate_tickets AS ct GROUP BY ct.Status HAVING Count > 2",
+    "SELECT ct.Status, COUNT(DISTINCT ct.TicketID) AS Count FROM corporate_tickets AS ct GROUP BY ct.Status",
+    "SELECT ct.Status, SUM(ct.Price) AS Total FROM corporate_tickets AS ct GROUP BY ct.Status",
+    # column that isn't a rollup dimension
+    "SELECT ct.CreatedBy, COUNT(*) AS Count FROM corporate_tickets AS ct GROUP BY ct.CreatedBy",
+    # LEFT() finer than the month grain
+    "SELECT LEFT(ct.CreatedDate, 10) AS Day, COUNT(*) AS Count FROM corporate_tickets AS ct GROUP BY Day",
+    # INNER JOIN changes which tickets are counted
+    "SELECT company.CompanyName, COUNT(*) AS Count FROM corporate_tickets AS ct "
+    "JOIN company ON ct.CorporateID = company.ID GROUP BY company.CompanyName",
+    # subquery in WHERE
+    "SELECT ct.Status, COUNT(*) AS Count FROM corporate_tickets AS ct "
+    "WHERE ct.BranchID IN (SELECT ID FROM branch) GROUP BY ct.Status",
+])
+def test_ineligible_queries_go_to_mysql(sql):
+    assert plan_rollup_query(sql) is None
+
+
+# ---------------------------------------------------------------------------
+# RESULTS
+# ---------------------------------------------------------------------------
+
+def test_group_by_status_is_case_insensitive_and_counts_ticket_ids():
+    rows = _run(
+        "SELECT ct.Status AS CurrentStatus, COUNT(ct.TicketID) AS Count FROM corporate_tickets AS ct "
+        "GROUP BY ct.Status ORDER BY Count DESC LIMIT 500"
+    )
+    # 'open' folds into 'Open' like the default collation; its NULL TicketID isn't counted.
+    assert [(r["CurrentStatus"].lower(), r["Count"]) for r in rows] == [("open", 10), ("closed", 5)]
+
+
+def test_count_star_counts_every_row():
+    rows = _run("SELECT COUNT(*) AS Count FROM corporate_tickets AS ct WHERE ct.Status = 'OPEN'")
+    assert rows == [{"Count": 11}]
+
+
+def test_like_is_case_insensitive():
+    rows = _run(
+        f"SELECT company.CompanyName, COUNT(ct.TicketID) AS Count {JOINS} "
+        "WHERE company.CompanyName LIKE '%TATA%' GROUP BY company.CompanyName"
+    )
+    assert rows == [{"CompanyName": "Tata", "Count": 9}]
+
+
+def test_null_follows_three_valued_logic():
+    rows = _run(
+        f"SELECT COUNT(ct.TicketID) AS Count {JOINS} WHERE branch.BranchCity <> 'Mumbai'"
+    )
+    assert rows == [{"Count": 3}]  # Pune only; the NULL city is neither = nor <>
+    rows = _run(
+        f"SELECT COUNT(ct.TicketID) AS Count {JOINS} WHERE NOT (branch.BranchCity = 'Mumbai')"
+    )
+    assert rows == [{"Count": 3}]
+    rows = _run(f"SELECT COUNT(ct.TicketID) AS Count {JOINS} WHERE branch.BranchCity IS NULL")
+    assert rows == [{"Count": 2}]
+
+
+def test_nulls_sort_first_ascending():
+    rows = _run(
+        f"SELECT company.CompanyName, COUNT(*) AS Count {JOINS} "
+        "GROUP BY company.CompanyName ORDER BY company.CompanyName ASC"
+    )
+    assert [r["CompanyName"] for r in rows] == [None, "Reliance", "Tata"]
+
+
+def test_month_prefix_grouping_keeps_raw_dates_apart():
+    rows = _run(
+        "SELECT LEFT(ct.CreatedDate, 7) AS TimePeriod, COUNT(ct.TicketID) AS Count FROM corporate_tickets AS ct "
+        "GROUP BY TimePeriod ORDER BY TimePeriod ASC LIMIT 500"
+    )
+    assert [(r["TimePeriod"], r["Count"]) for r in rows] == [
+        ("15/01/2", 1), ("2025-01", 8), ("2025-02", 6), ("2025-03", 0),
+    ]
+
+
+def test_whole_month_date_filter_is_answered():
+    rows = _run(
+        "SELECT COUNT(ct.TicketID) AS Count FROM corporate_tickets AS ct "
+        "WHERE ct.CreatedDate >= '2025-02-01' AND ct.CreatedDate < '2025-03-01'"
+    )
+    assert rows == [{"Count": 6}]
+
+
+def test_date_filter_splitting_a_month_is_refused():
+    plan = plan_rollup_query(
+        "SELECT COUNT(ct.TicketID) AS Count FROM corporate_tickets AS ct WHERE ct.CreatedDate >= '2025-01-15'"
+    )
+    assert plan is not None
+    with pytest.raises(_Ineligible):
+        run_plan(plan, FIXTURE.project(plan.fields))
+
+
+def test_limit_applies_after_ordering():
+    rows = _run(
+        f"SELECT company.CompanyName, COUNT(ct.TicketID) AS Count {JOINS} "
+        "GROUP BY company.CompanyName ORDER BY Count DESC LIMIT 1"
+    )
+    assert rows == [{"CompanyName": "Tata", "Count": 9}]
+
+
+def test_totals_wrapper_sums_across_all_groups():
+    grouped = (
+        "SELECT ct.Status AS CurrentStatus, COUNT(ct.TicketID) AS Count FROM corporate_tickets AS ct "
+        "GROUP BY ct.Status ORDER BY Count DESC LIMIT 500"
+    )
+    assert _run(derive_totals_sql(grouped)) == [{"Count": 15, "GroupCount": 2}]
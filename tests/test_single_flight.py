@@ -0,0 +1,60 @@
+import asyncio
+
+from config import settings
+from core.deadline import current_deadline, deadline_scope
+from core.single_flight import SingleFlight
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_identical_calls_share_one_computation():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "rows"
+
+    async def main():
+        return await asyncio.gather(*(flight.do("sql", work) for _ in range(5)))
+
+    assert _run(main()) == ["rows"] * 5
+    assert len(calls) == 1
+
+
+def test_short_client_deadline_does_not_lead_default_requests():
+    flight = SingleFlight("test")
+    budgets = []
+
+    async def work():
+        budgets.append(current_deadline.get().budget_seconds)
+        await asyncio.sleep(0.01)
+        return "rows"
+
+    async def request(deadline_ms=None):
+        with deadline_scope(deadline_ms):
+            return await flight.do("sql", work)
+
+    async def main():
+        return await asyncio.gather(request(500), request(), request())
+
+    assert _run(main()) == ["rows"] * 3
+    assert sorted(budgets) == [0.5, float(settings.REQUEST_DEADLINE_SECONDS)]
+
+
+def test_copy_result_gives_each_waiter_its_own_copy():
+    flight = SingleFlight("test", copy_result=True)
+
+    async def work():
+        await asyncio.sleep(0.01)
+        return {"state": []}
+
+    async def main():
+        return await asyncio.gather(flight.do("k", work), flight.do("k", work))
+
+    first, second = _run(main())
+    first["state"].append("x")
+    assert second == {"state": []}
@@ -0,0 +1,17 @@
+from decimal import Decimal
+
+from ai.sql_generator import template_summary
+
+
+def test_template_summary_treats_decimal_averages_as_metrics():
+    rows = [
+        {"CurrentStatus": "Open", "AvgDaysToClose": Decimal("4.5")},
+        {"CurrentStatus": "Closed", "AvgDaysToClose": Decimal("12.0")},
+    ]
+    summary = template_summary(rows, {"domain": "corporate_tickets", "intent": "summary"})
+    assert "AvgDaysToClose" in summary and "**Closed**" in summary
+
+
+def test_template_summary_single_kpi():
+    summary = template_summary([{"Count": 42}], {"domain": "ppm_tickets", "intent": "summary"})
+    assert "**42**" in summary and "PPM tickets" in summary